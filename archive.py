@@ -0,0 +1,211 @@
+# MIT license
+#
+# Skimibowi - SKiDL Microcontroller Board Wizard
+# Copyright (C) 2019  Jussi Vestman
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Batch output to a single zip archive instead of a file per program. Programs are stored once
+per content hash under objects/, and index.json maps the hash of the settings of every variant,
+and its settings filename, to the member holding its program:
+
+    {"format": 1,
+     "variants": {"<settings hash>": "objects/<content hash>.py"},
+     "names": {"boards/esp12.yml": "<settings hash>"}}
+
+Members are written as they are generated, so memory use does not grow with the batch, and one
+variant is read through the central directory of the zip file without unpacking the others"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import zipfile
+
+from batch import BatchResult
+from controller import load_settings_file
+from generator import generate
+from settings_schema import check_settings_files
+
+ARCHIVE_FORMAT = 1
+INDEX = 'index.json'
+
+
+class ArchiveError(LookupError):
+    """Archive has no such variant, or is not an archive of generated programs"""
+
+
+def settings_hash(settings):
+    """Return hex hash of settings dict, equal for settings that differ only in key order"""
+    data = json.dumps(settings, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class ArchiveWriter:
+    """Writes programs to a zip archive that replaces filename atomically when closed"""
+
+    def __init__(self, filename, compression=zipfile.ZIP_DEFLATED):
+        self.filename = filename
+        self.variants = {}
+        self.names = {}
+        self._members = set()
+        self._temporary = f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+        self._zip = zipfile.ZipFile(self._temporary, 'w', compression=compression)
+
+    def add(self, name, settings, code):
+        """Add program generated from settings under name, e.g. the settings filename. The
+        program is stored only if no other variant has the same content. Returns settings hash"""
+        data = code.encode('utf-8')
+        member = f"objects/{hashlib.blake2b(data, digest_size=16).hexdigest()}.py"
+        if member not in self._members:
+            self._zip.writestr(member, data)
+            self._members.add(member)
+        key = settings_hash(settings)
+        self.variants[key] = member
+        self.names[name] = key
+        return key
+
+    def close(self):
+        """Write index and move the archive in place"""
+        index = {'format': ARCHIVE_FORMAT, 'variants': self.variants, 'names': self.names}
+        self._zip.writestr(INDEX, json.dumps(index, indent=1, sort_keys=True))
+        self._zip.close()
+        os.replace(self._temporary, self.filename)
+
+    def abort(self):
+        """Discard the archive being written"""
+        self._zip.close()
+        os.remove(self._temporary)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class ArchiveReader:
+    """Reads single programs of an archive written by ArchiveWriter"""
+
+    def __init__(self, filename):
+        self._zip = zipfile.ZipFile(filename)
+        try:
+            index = json.loads(self._zip.read(INDEX))
+        except (KeyError, ValueError) as error:
+            self._zip.close()
+            raise ArchiveError(f"{filename} has no index of generated programs") from error
+        if not isinstance(index, dict) or index.get('format') != ARCHIVE_FORMAT:
+            self._zip.close()
+            raise ArchiveError(f"{filename} is not an archive of format {ARCHIVE_FORMAT}")
+        self.variants = index['variants']
+        self.names = index['names']
+
+    def member(self, key):
+        """Return archive member of variant, key being its settings hash, settings filename or
+        settings dict"""
+        if isinstance(key, dict):
+            key = settings_hash(key)
+        member = self.variants.get(self.names.get(key, key))
+        if member is None:
+            raise ArchiveError(f"No variant {key!r} in archive")
+        return member
+
+    def read(self, key):
+        """Return program of variant, see member"""
+        return self._zip.read(self.member(key)).decode('utf-8')
+
+    def extract(self, key, filename):
+        """Write program of variant to filename"""
+        with self._zip.open(self.member(key)) as source, open(filename, 'wb') as target:
+            target.write(source.read())
+
+    def __contains__(self, key):
+        try:
+            self.member(key)
+        except ArchiveError:
+            return False
+        return True
+
+    def __len__(self):
+        return len(self.variants)
+
+    def close(self):
+        """Close archive file"""
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def render_file(settings_filename):
+    """Generate program of settings file. Returns (settings filename, settings, program, error
+    message or None)"""
+    try:
+        settings = load_settings_file(settings_filename) or {}
+        return settings_filename, settings, generate(settings), None
+    except Exception as error:  # pylint: disable=broad-except
+        return settings_filename, None, None, f"{type(error).__name__}: {error}"
+
+
+def generate_archive(settings_filenames, filename, jobs=None, chunksize=16, validate=False):
+    """Generate SKiDL programs of all settings files in a process pool to a zip archive, see
+    ArchiveWriter. Failing and, with validate, invalid files are recorded in the result. If the
+    pool fails, the programs generated so far are kept in the archive and the other files are
+    recorded as errors"""
+    result = BatchResult()
+    settings_filenames = list(settings_filenames)
+    directory = os.path.dirname(filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    start = time.perf_counter()
+    if validate:
+        for settings_filename, errors in check_settings_files(settings_filenames).items():
+            result.errors[settings_filename] = "invalid settings: " + "; ".join(str(error) for error in errors)
+        settings_filenames = [name for name in settings_filenames if name not in result.errors]
+    with ArchiveWriter(filename) as writer:
+        try:
+            if jobs == 1:
+                _collect(result, writer, map(render_file, settings_filenames))
+            else:
+                from concurrent.futures import ProcessPoolExecutor  # pylint: disable=import-outside-toplevel
+                with ProcessPoolExecutor(max_workers=jobs) as executor:
+                    _collect(result, writer, executor.map(render_file, settings_filenames, chunksize=chunksize))
+        except Exception as error:  # pylint: disable=broad-except
+            for settings_filename in settings_filenames:
+                if settings_filename not in result.errors and settings_filename not in writer.names:
+                    result.errors[settings_filename] = f"Not generated, {type(error).__name__}: {error}"
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def _collect(result, writer, outcomes):
+    for settings_filename, settings, code, error in outcomes:
+        if error is None:
+            writer.add(settings_filename, settings, code)
+            result.generated.append(settings_filename)
+        else:
+            result.errors[settings_filename] = error
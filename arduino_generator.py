@@ -23,15 +23,13 @@
 
 """Generates ATMega / Arduino compatible boards"""
 
-from generator_functions import requirements
+from collections import ChainMap
+
+from templates import Template, renders
 from passives_generator import generate_r, generate_c
 
 
-def generate_atmega328p(args):
-    """Generate ATmega328P subsystem to circuit"""
-    args['crystal'] = generate_atmega_crystal(args)
-    requirements.add(generate_r)
-    return '''
+@renders('''
 U1 = Part('MCU_Microchip_ATmega', '{mcu}', footprint='{mcu_footprint}')
 
 # Power networks
@@ -47,19 +45,21 @@ U1['PD0'] += Net.fetch('rx')
 # I2C
 U1['PC4'] += Net.fetch('SDA')
 U1['PC5'] += Net.fetch('SCL')
-'''.format(**args)
+''')
+def generate_atmega328p(args, context):
+    """Generate ATmega328P subsystem to circuit"""
+    crystal = generate_atmega_crystal(args, context)
+    context.requirements.add(generate_r)
+    return ChainMap({'crystal': crystal}, args)
 
-def generate_atmega_crystal(args):
-    """Generate crystal for ATmega328P"""
-    if args['crystal_footprint'] == 'HC-49':
-        requirements.add(generate_c)
-        return '''
+
+HC49_CRYSTAL = Template('''
 # Crystal
 ATMEGA_XTAL = Part('Device','Crystal', value="{crystal_frequency}",footprint='Crystal:Crystal_HC49-4H_Vertical')
 U1['XTAL1/PB6'] & C('18pF') & ATMEGA_XTAL & C('18pF') & U1['XTAL2/PB7']
-'''.format(**args)
-    if args['crystal_footprint'] == 'CST':
-        return '''
+''')
+
+CST_RESONATOR = Template('''
 # Crystal
 ATMEGA_XTAL = Part('Device','Resonator', footprint='Resonator_SMD_Murata_CSTxExxV-3Pin_3.0x1.1mm')
 U1['XTAL1/PB6'] += ATMEGA_XTAL[1]
@@ -69,21 +69,30 @@ ATMEGA_XTAL[2] += Net.fetch('GND')
 ATMEGA_XTAL_R = Part('Device', 'R', value='1M', footprint='{resistor_footprint}')
 U1['XTAL1/PB6'] += ATMEGA_XTAL_R[1]
 U1['XTAL2/PB7'] += ATMEGA_XTAL_R[2]
-'''.format(**args)
+''')
 
 
-def generate_attiny85(args):
-    """Generate ATtiny85"""
-    return '''
+def generate_atmega_crystal(args, context):
+    """Generate crystal for ATmega328P"""
+    if args['crystal_footprint'] == 'HC-49':
+        context.requirements.add(generate_c)
+        return HC49_CRYSTAL.render(args)
+    if args['crystal_footprint'] == 'CST':
+        return CST_RESONATOR.render(args)
+
+
+@renders('''
 U1 = Part('MCU_Microchip_ATtiny', '{mcu}', footprint='{mcu_footprint}')
 
 # Power networks
 U1['VCC'] += Net.fetch('{mcurail}')
 U1['GND'] += Net.fetch('GND')
-'''.format(**args)
+''')
+def generate_attiny85(args, context):
+    """Generate ATtiny85"""
 
 
-def generate_arduino_nano(args):
+def generate_arduino_nano(args, context):
     """Generate Arduino nano footprint"""
     return '''
 nano = Part('MCU_module', 'Arduino_Nano_v3.x', footprint='Module:Arduino_Nano')
@@ -101,7 +110,7 @@ nano['D4'] += Net.fetch('RXD2')
 '''
 
 
-def generate_icsp():
+def generate_icsp(args, context):
     """Generate In Circuit Serial Programmer header"""
     return '''
 ICSP_CONN = Part('Connector_Generic', 'Conn_02x03_Odd_Even', footprint='Connector_PinHeader_2.54mm:PinHeader_2x03_P2.54mm_Vertical')
@@ -114,7 +123,7 @@ ICSP_CONN[6] += Net.fetch('GND')
 '''
 
 
-def generate_arduino_reset_button():
+def generate_arduino_reset_button(args, context):
     """Generate reset button"""
     return '''
 SW_RESET = Part('Switch', 'SW_Push', footprint="Button_Switch_SMD:SW_SPST_B3U-1000P")
@@ -122,15 +131,16 @@ SW_RESET[1] += U1['~{RESET}/PC6']
 SW_RESET[2] += Net.fetch('GND')
 '''
 
-def generate_arduino_ftdi_reset(args):
+
+@renders('''
+U1['~{{RESET}}/PC6'] & C('100nF') & Net.fetch('RTS')
+''')
+def generate_arduino_ftdi_reset(args, context):
     """Generate connection to FTDI header reset"""
-    requirements.add(generate_c)
-    return '''
-U1['~{RESET}/PC6'] & C('100nF') & Net.fetch('RTS')
-'''.format(**args)
+    context.requirements.add(generate_c)
 
 
-def generate_arduino_uno_r3_board_footprint():
+def generate_arduino_uno_r3_board_footprint(args, context):
     """Generate Arduino Uno R3 board layout footprint"""
     return '''
 BOARD = Part('MCU_Module', 'Arduino_Uno_R3', footprint='Module:Arduino_UNO_R3_WithMountingHoles')
@@ -149,7 +159,7 @@ BOARD['D1/TX'] += Net.fetch('tx')
 '''
 
 
-def generate_arduino_nano_v3_board_footprint():
+def generate_arduino_nano_v3_board_footprint(args, context):
     """Generate Arduino Nano V3 board layout footprint"""
     return '''
 BOARD = Part('MCU_Module', 'Arduino_Nano_v3.x', footprint='Module:Arduino_Nano')
@@ -167,7 +177,7 @@ BOARD['D1/TX'] += Net.fetch('tx')
 '''
 
 
-def generate_atmega_arduino_board_connections():
+def generate_atmega_arduino_board_connections(args, context):
     """Generate connections from ATmega mcu to Arduino headers"""
     return '''
 BOARD['D2'] += U1['PD2']
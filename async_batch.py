@@ -0,0 +1,165 @@
+# MIT license
+#
+# Skimibowi - SKiDL Microcontroller Board Wizard
+# Copyright (C) 2019  Jussi Vestman
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Asynchronous batch generation for asyncio applications, e.g.
+
+    result = await generate_many(find_settings_files('boards/'), 'out/', concurrency=4,
+                                 progress=lambda item: print(item.settings, item.error))
+
+Settings files are read, generated and written in an executor, so the event loop is never blocked
+by file I/O or generation. At most concurrency items are generated at once and the settings
+iterable, which may be an async iterable, is consumed only as fast as items are completed, so
+unbounded sources are generated in bounded memory. Cancelling generate_many stops taking new items
+and cancels the queued ones, also those waiting in the executor; items already running in the
+executor complete"""
+
+import asyncio
+import inspect
+import os
+import time
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+
+from batch import BatchResult, output_filename, write_chunks
+from controller import load_settings_file
+from generator import generate_chunks
+
+_DONE = object()
+
+
+class ItemProgress:
+    """Outcome of one item: number of items completed so far and total number of items, or None if
+    the settings iterable has no length, settings filename or name, output file, error message or
+    None, and seconds spent on the item"""
+
+    __slots__ = ('completed', 'total', 'settings', 'output', 'error', 'elapsed')
+
+    def __init__(self, completed, total, settings, output, error, elapsed):
+        self.completed = completed
+        self.total = total
+        self.settings = settings
+        self.output = output
+        self.error = error
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return f"ItemProgress({self.completed}/{self.total}, {self.settings!r}, error={self.error!r})"
+
+
+def generate_item(job):
+    """Generate SKiDL program of settings filename or dict to output file. Returns error message
+    or None"""
+    settings, filename = job
+    try:
+        if not isinstance(settings, Mapping):
+            settings = load_settings_file(settings)
+        write_chunks(filename, generate_chunks(settings))
+    except Exception as error:  # pylint: disable=broad-except
+        return f"{type(error).__name__}: {error}"
+    return None
+
+
+def item_job(item, out_dir=None):
+    """Return (name, (settings, output filename)) of settings filename or (name, settings dict) item"""
+    if isinstance(item, (str, os.PathLike)):
+        name = os.fspath(item)
+        return name, (name, output_filename(name, out_dir))
+    if isinstance(item, tuple) and len(item) == 2 and isinstance(item[1], Mapping):
+        name, settings = item
+        return name, (settings, os.path.join(out_dir if out_dir is not None else '.', f"{name}.py"))
+    raise TypeError(f"Expected settings filename or (name, settings) pair, got {type(item).__name__}")
+
+
+async def generate_many(settings_iter, out_dir=None, concurrency=4, progress=None, executor=None):
+    """Generate SKiDL programs of settings filenames or (name, settings dict) pairs of iterable or
+    async iterable, concurrency at a time, and return BatchResult. Programs of settings files are
+    written next to them or to out_dir, and programs of pairs to out_dir as name.py. progress is
+    called, or awaited if it is a coroutine function, with ItemProgress of each completed item.
+    Generation runs in executor, by default a thread pool of concurrency threads; pass a
+    ProcessPoolExecutor to generate in parallel"""
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+    loop = asyncio.get_running_loop()
+    if out_dir is not None:
+        await loop.run_in_executor(executor, _make_dirs, out_dir)
+    total = len(settings_iter) if hasattr(settings_iter, '__len__') else None
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='skimibowi')
+    queue = asyncio.Queue(maxsize=concurrency)
+    result = BatchResult()
+    submitted = set()
+
+    async def produce():
+        if hasattr(settings_iter, '__aiter__'):
+            async for item in settings_iter:
+                await queue.put(item_job(item, out_dir))
+        else:
+            for item in settings_iter:
+                await queue.put(item_job(item, out_dir))
+        for _ in range(concurrency):
+            await queue.put(_DONE)
+
+    async def work():
+        while True:
+            job = await queue.get()
+            if job is _DONE:
+                return
+            name, (settings, filename) = job
+            start = time.perf_counter()
+            future = executor.submit(generate_item, (settings, filename))
+            submitted.add(future)
+            try:
+                error = await asyncio.wrap_future(future)
+            finally:
+                submitted.discard(future)
+            if error is None:
+                result.generated.append(name)
+            else:
+                result.errors[name] = error
+            if progress is not None:
+                reported = progress(ItemProgress(result.total, total, name, filename, error,
+                                                 time.perf_counter() - start))
+                if inspect.isawaitable(reported):
+                    await reported
+
+    start = time.perf_counter()
+    tasks = [asyncio.ensure_future(produce())] + [asyncio.ensure_future(work()) for _ in range(concurrency)]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for future in list(submitted):
+            future.cancel()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    finally:
+        if own_executor:
+            executor.shutdown(wait=False)
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def _make_dirs(directory):
+    os.makedirs(directory, exist_ok=True)
@@ -0,0 +1,139 @@
+# MIT license
+#
+# Skimibowi - SKiDL Microcontroller Board Wizard
+# Copyright (C) 2019  Jussi Vestman
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Batch generation of SKiDL programs from a directory or glob of settings files"""
+
+import glob
+import os
+import time
+
+from controller import load_settings_file
+from generator import generate_chunks
+from settings_schema import check_settings_files
+
+IOV_MAX = os.sysconf('SC_IOV_MAX') if hasattr(os, 'sysconf') and 'SC_IOV_MAX' in os.sysconf_names else 16
+
+
+def find_settings_files(pattern):
+    """Return sorted settings filenames of a directory or a glob pattern"""
+    if os.path.isdir(pattern):
+        filenames = glob.glob(os.path.join(pattern, '*.yml')) + glob.glob(os.path.join(pattern, '*.yaml'))
+    else:
+        filenames = glob.glob(pattern, recursive=True)
+    return sorted(filenames)
+
+
+def output_filename(settings_filename, output_dir=None):
+    """Map settings file to the SKiDL program generated from it, e.g. boards/esp12.yml -> boards/esp12.py"""
+    directory, basename = os.path.split(settings_filename)
+    filename = os.path.splitext(basename)[0] + '.py'
+    return os.path.join(output_dir if output_dir is not None else directory, filename)
+
+
+def generate_file(job):
+    """Generate one SKiDL program. Returns (settings filename, error message or None)"""
+    settings_filename, filename = job
+    try:
+        write_chunks(filename, generate_chunks(load_settings_file(settings_filename)))
+    except Exception as error:  # pylint: disable=broad-except
+        return settings_filename, f"{type(error).__name__}: {error}"
+    return settings_filename, None
+
+
+def write_chunks(filename, chunks):
+    """Write pieces of text to file, with a single vectored write where the platform has one"""
+    buffers = [chunk.encode('utf-8') for chunk in chunks if chunk]
+    if not hasattr(os, 'writev'):
+        with open(filename, 'wb') as file:
+            file.writelines(buffers)
+        return
+
+    descriptor = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    try:
+        index = 0
+        while index < len(buffers):
+            written = os.writev(descriptor, buffers[index:index + IOV_MAX])
+            while index < len(buffers) and written >= len(buffers[index]):
+                written -= len(buffers[index])
+                index += 1
+            if written:
+                buffers[index] = buffers[index][written:]
+    finally:
+        os.close(descriptor)
+
+
+class BatchResult:
+    """Outcome of a batch run"""
+
+    def __init__(self):
+        self.generated = []
+        self.errors = {}
+        self.elapsed = 0.0
+
+    @property
+    def total(self):
+        """Number of settings files processed"""
+        return len(self.generated) + len(self.errors)
+
+    def summary(self):
+        """Human readable summary of throughput and errors"""
+        rate = self.total / self.elapsed if self.elapsed else 0.0
+        lines = [f"Generated {len(self.generated)}/{self.total} files in {self.elapsed:.2f} s "
+                 f"({rate:.1f} files/s), {len(self.errors)} errors"]
+        for settings_filename, error in sorted(self.errors.items()):
+            lines.append(f"  {settings_filename}: {error}")
+        return "\n".join(lines)
+
+
+def generate_batch(settings_filenames, output_dir=None, jobs=None, chunksize=16, validate=False):
+    """Generate SKiDL programs for all settings files in a process pool. A failing file is
+    recorded in the result and does not abort the run. With validate, settings files are checked
+    against the settings schema first and files with errors are not generated"""
+    result = BatchResult()
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    if validate:
+        settings_filenames = list(settings_filenames)
+        for settings_filename, errors in check_settings_files(settings_filenames).items():
+            result.errors[settings_filename] = "invalid settings: " + "; ".join(str(error) for error in errors)
+        settings_filenames = [filename for filename in settings_filenames if filename not in result.errors]
+    work = [(settings_filename, output_filename(settings_filename, output_dir))
+            for settings_filename in settings_filenames]
+    if jobs == 1:
+        _collect(result, map(generate_file, work))
+    else:
+        from concurrent.futures import ProcessPoolExecutor  # pylint: disable=import-outside-toplevel
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            _collect(result, executor.map(generate_file, work, chunksize=chunksize))
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def _collect(result, outcomes):
+    for settings_filename, error in outcomes:
+        if error is None:
+            result.generated.append(settings_filename)
+        else:
+            result.errors[settings_filename] = error
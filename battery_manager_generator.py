@@ -23,11 +23,12 @@
 
 """Module for generating battery management IC nets"""
 
-from generator_functions import requirements, generate_subcircuit, generate_subcircuit_without_call
+from generator_functions import generate_subcircuit, generate_subcircuit_without_call
+from templates import renders
 from passives_generator import generate_r, generate_c
 
 
-def led_pull_up(args):
+def led_pull_up(args, context):
     """Led pulled up to +VBus"""
     return f"""
 BM_LED = Part('Device', 'LED', footprint='{args['led_footprint']}')
@@ -35,7 +36,7 @@ return R('1k') & BM_LED & Net.fetch('+VBus')
 """
 
 
-def mcp73871_leds(args):
+def mcp73871_leds(args, context):
     """MCP73871 Status leds"""
     return f"""
 BATTERYMANAGER['STAT1'] & led_pull_up()
@@ -44,13 +45,13 @@ BATTERYMANAGER['PG'] & led_pull_up()
 """
 
 
-def mcp73871(args):
+def mcp73871(args, context):
     """MCP73871-2AA battery management IC"""
 
-    requirements.add(generate_r)
+    context.requirements.add(generate_r)
 
     return f"""
-{generate_subcircuit_without_call(led_pull_up, args)}
+{generate_subcircuit_without_call(led_pull_up, args, context)}
 
 BATTERYMANAGER = Part('Battery_Management', 'MCP73871-2AA', footprint='Package_DFN_QFN:QFN-20-1EP_4x4mm_P0.5mm_EP2.5x2.5mm')
 BATTERYMANAGER['IN'] += Net.fetch('+VBus')
@@ -66,7 +67,7 @@ BATTERYMANAGER['Vbat_SENSE'] += Net.fetch('+VLipo')
 Net.fetch('GND') & R('2k') & BATTERYMANAGER['PROG1']
 Net.fetch('GND') & R('100k') & BATTERYMANAGER['PROG3']
 
-{generate_subcircuit(mcp73871_leds, args)}
+{generate_subcircuit(mcp73871_leds, args, context)}
 
 Net.fetch('+VLipo') & C('10uF') & Net.fetch('GND')
 
@@ -80,13 +81,7 @@ BATTERYMANAGER['THERM'] & R('10k') & Net.fetch('GND')
 """
 
 
-def generate_mcp73831(args):
-    """Generate MCP73831 battery management IC"""
-
-    requirements.add(generate_r)
-    requirements.add(generate_c)
-
-    return '''
+@renders('''
 BATTERYMANAGER = Part('Battery_Management', 'MCP73831-2-OT', footprint='Package_TO_SOT_SMD:SOT-23-5')
 
 BM_LED = Part('Device', 'LED', footprint='{led_footprint}')
@@ -95,4 +90,8 @@ BATTERYMANAGER['STAT'] & R('1k') & BM_LED & Net.fetch('+VBus')
 BATTERYMANAGER['VSS'] += Net.fetch('GND')
 Net.fetch('GND') & R('2k') & BATTERYMANAGER['PROG']
 Net.fetch('+VLipo') & C('10uF') & Net.fetch('GND')
-'''.format(**args)
+''')
+def generate_mcp73831(args, context):
+    """Generate MCP73831 battery management IC"""
+    context.requirements.add(generate_r)
+    context.requirements.add(generate_c)
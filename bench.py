@@ -0,0 +1,217 @@
+# MIT license
+#
+# Skimibowi - SKiDL Microcontroller Board Wizard
+# Copyright (C) 2019  Jussi Vestman
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Benchmarks of SKiDL generation over the test fixtures and a synthetic set of settings that
+generates every fragment. Reports p50/p99 latency, calls per second and peak allocation of each
+benchmark, and compares them with a baseline file saved by an earlier run. Timings depend on the
+machine, so no baseline is shipped: save one with --save-baseline and pass it with --baseline, e.g.
+
+    python -m bench --save-baseline bench-baseline.json
+    python -m bench --baseline bench-baseline.json"""
+
+import argparse
+import glob
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from controller import generate_from_settings, load_settings_file
+from generator import generate
+from profiling import reset_peak
+from settings_cache import dump_settings, parse_settings
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tests', '*.yml')
+SYNTHETIC_BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tests',
+                              'esp-12-mcp73831-ap2112k-cp2104-feather.yml')
+
+# Changes to SYNTHETIC_BASE that together generate every registered fragment
+SYNTHETIC_OVERRIDES = (
+    {},
+    {'hc12': True, 'sh1106': True, 'si5351': True, 'ina219': True, 'DS18B20': True, 'DS18B20U': True,
+     'onewire_connector': '1x3 Pin Header', 'switch': True, 'fuse': 'SMD 1812', 'autoselect': True,
+     'battery_management': 'MCP73871-2AA', 'usb_uart': 'FT232RL', 'title': 'Synthetic board', 'author': 'Skimibowi'},
+    {'mcu': 'ESP-07', 'usb_uart': 'CP2102N-A01-GQFN24', 'powersource': '2xAA - Keystone 2462'},
+    {'mcu': 'ESP-07', 'usb_uart': 'FT231'},
+    {'mcu': 'ESP-01', 'usb_uart': 'FT231'},
+    {'mcu': 'ESP8266EX', 'board_footprint': 'No board', 'generate_labels': False},
+    {'mcu': 'WeMos D1 mini', 'usb_uart': 'No USB UART', 'powersource': 'Barrel Jack 2.0/5.5mm',
+     'regulator_data': None},
+    {'mcu': 'ATmega328P-A', 'board_footprint': 'Arduino Uno R3', 'icsp': True, 'FTDI header': True,
+     'usb_uart': 'VUSB-AVR', 'mcurail': '+5V'},
+    {'mcu': 'ATmega328P-P', 'board_footprint': 'Arduino Nano', 'usb_uart': 'FT231', 'mcurail': '+5V',
+     'Reset button': True},
+    {'mcu': 'ATtiny85-20P', 'usb_uart': 'VUSB-AVR', 'board_footprint': 'No board', 'mcurail': '+5V'},
+    {'mcu': 'Arduino Nano', 'usb_uart': 'No USB UART', 'board_footprint': 'No board', 'mcurail': '+5V'},
+)
+
+TOLERANCE = 0.25
+
+
+def synthetic_settings():
+    """Return list of settings dicts that together generate every fragment"""
+    base = load_settings_file(SYNTHETIC_BASE)
+    base.update(crystal_footprint='HC-49', crystal_frequency='16MHz')
+    return [dict(base, **overrides) for overrides in SYNTHETIC_OVERRIDES]
+
+
+def write_corpus(directory, pattern=FIXTURES):
+    """Write settings files of the fixtures and the synthetic set to directory. Returns list of
+    (settings filename, settings) tuples"""
+    corpus = []
+    for filename in sorted(glob.glob(pattern)):
+        corpus.append((filename, load_settings_file(filename)))
+    for index, settings in enumerate(synthetic_settings()):
+        filename = os.path.join(directory, f"synthetic-{index}.yml")
+        with open(filename, 'w') as settings_file:
+            settings_file.write(dump_settings(settings))
+        corpus.append((filename, settings))
+    return corpus
+
+
+def benchmarks(corpus, directory):
+    """Return dict of benchmark names to (function, arguments of each call)"""
+    output = os.path.join(directory, 'bench.py')
+    contents = []
+    for filename, _ in corpus:
+        with open(filename, 'rb') as settings_file:
+            contents.append(settings_file.read())
+    return {
+        'generate': (generate, [(settings,) for _, settings in corpus]),
+        'generate_uncached': (lambda settings: generate(settings, cache=None), [(settings,) for _, settings in corpus]),
+        'generate_from_settings': (generate_from_settings, [(output, filename) for filename, _ in corpus]),
+        'load_settings_file': (load_settings_file, [(filename,) for filename, _ in corpus]),
+        'parse_settings': (parse_settings, [(content,) for content in contents]),
+    }
+
+
+def percentile(values, fraction):
+    """Return nearest-rank percentile of sorted values"""
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def run_benchmark(function, calls, rounds):
+    """Time function over calls for rounds passes, then measure its peak allocation on one pass.
+    Returns dict of statistics"""
+    for arguments in calls:
+        function(*arguments)
+    durations = []
+    clock = time.perf_counter_ns
+    for _ in range(rounds):
+        for arguments in calls:
+            start = clock()
+            function(*arguments)
+            durations.append(clock() - start)
+    durations.sort()
+
+    peak = 0
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    try:
+        for arguments in calls:
+            reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            function(*arguments)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+
+    total = sum(durations)
+    return {
+        'calls': len(durations),
+        'p50_us': percentile(durations, 0.50) / 1000,
+        'p99_us': percentile(durations, 0.99) / 1000,
+        'per_second': len(durations) * 1e9 / total if total else 0.0,
+        'peak_kib': peak / 1024,
+    }
+
+
+def run(rounds=20, pattern=FIXTURES, names=None):
+    """Run benchmarks over fixtures matching pattern and the synthetic set. Returns dict of
+    benchmark names to statistics"""
+    with tempfile.TemporaryDirectory(prefix='skimibowi-bench-') as directory:
+        corpus = write_corpus(directory, pattern)
+        results = {}
+        for name, (function, calls) in benchmarks(corpus, directory).items():
+            if names is None or name in names:
+                results[name] = run_benchmark(function, calls, rounds)
+        return results
+
+
+def regressions(results, baseline, tolerance=TOLERANCE):
+    """Return names of benchmarks whose p50 latency is more than tolerance slower than baseline"""
+    return [name for name, stats in results.items()
+            if name in baseline and stats['p50_us'] > baseline[name]['p50_us'] * (1 + tolerance)]
+
+
+def format_report(results, baseline=None, tolerance=TOLERANCE):
+    """Return text table of results, with p50 relative to baseline when given"""
+    slow = set(regressions(results, baseline, tolerance)) if baseline else set()
+    lines = [f"{'benchmark':24} {'calls':>7} {'p50 us':>10} {'p99 us':>10} {'calls/s':>10} {'peak KiB':>9}"
+             + (f" {'vs base':>8}" if baseline else "")]
+    for name, stats in results.items():
+        line = (f"{name:24} {stats['calls']:7d} {stats['p50_us']:10.1f} {stats['p99_us']:10.1f} "
+                f"{stats['per_second']:10.0f} {stats['peak_kib']:9.1f}")
+        if baseline and name in baseline:
+            line += f" {stats['p50_us'] / baseline[name]['p50_us']:7.2f}x"
+            if name in slow:
+                line += " REGRESSION"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    """Run benchmarks, print report and return 1 if a benchmark regressed against the baseline"""
+    parser = argparse.ArgumentParser(prog='bench', description='Benchmark Skimibowi SKiDL generation')
+    parser.add_argument('--rounds', type=int, default=20, help='Passes over the settings of each benchmark')
+    parser.add_argument('--fixtures', default=FIXTURES, help='Glob of settings fixtures (default: tests/*.yml)')
+    parser.add_argument('--baseline', metavar='FILE', help='Compare with baseline results saved earlier')
+    parser.add_argument('--save-baseline', metavar='FILE', help='Save results as baseline')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='Allowed relative p50 slowdown before a benchmark is a regression (default: 0.25)')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    parser.add_argument('benchmarks', nargs='*', help='Benchmarks to run (default: all)')
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    results = run(args.rounds, args.fixtures, args.benchmarks or None)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+    if args.json:
+        print(json.dumps(results, indent=2, sort_keys=True))
+    else:
+        print(format_report(results, baseline, args.tolerance))
+    return 1 if baseline and regressions(results, baseline, args.tolerance) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+# MIT license
+#
+# Skimibowi - SKiDL Microcontroller Board Wizard
+# Copyright (C) 2019  Jussi Vestman
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Block tree of generated subcircuit functions
+
+A subcircuit function nested in another one is not indented as text when it is generated. It is
+kept as a Block and referred to from the code of its parent by a marker, and the outermost block
+is serialized once, indenting every line by its depth in the tree. The output is the same as
+indenting each function body with templates.indent_body, but every line is written once
+whatever the depth of nesting.
+
+Like indent_body, and the generator before block trees, serialization treats code as lines. A
+multi-line string literal in a nested function would get its continuation lines indented, and
+trailing spaces would be trimmed. Generated fragments contain neither, and changing this would
+change the generated programs, so it is deliberately not handled here."""
+
+import re
+
+from templates import INDENT
+
+_MARKER = re.compile('\0b([0-9]+)\0')
+
+
+class Block:
+    """Code of header at the depth of the block, such as decorator, def line and docstring, and
+    body one level deeper. Both may contain markers of nested blocks"""
+
+    __slots__ = ('header', 'body')
+
+    def __init__(self, header, body):
+        self.header = header
+        self.body = body
+
+
+class BlockTree:
+    """Nested blocks waiting for the outermost block to be serialized"""
+
+    __slots__ = ('blocks', 'depth')
+
+    def __init__(self):
+        self.blocks = []
+        self.depth = 0
+
+    def marker(self, block):
+        """Return marker standing for nested block in the code of its parent"""
+        self.blocks.append(block)
+        return f'\0b{len(self.blocks) - 1}\0'
+
+    def serialize(self, block):
+        """Return code of outermost block with its nested blocks, and forget the nested blocks"""
+        chunks = []
+        self._write_block(block, 0, chunks)
+        self.blocks.clear()
+        return ''.join(chunks)
+
+    def _write_block(self, block, depth, chunks):
+        self._write(block.header, depth, chunks)
+        if block.body:
+            self._write('\n' + block.body, depth + 1, chunks)
+        else:
+            chunks.append('\n' + INDENT)
+
+    def _write(self, code, depth, chunks):
+        """Append code whose lines after the first are at depth to chunks. The first line of code
+        continues the last line written"""
+        if '\0' not in code:
+            chunks.append(_indented(code, depth, False))
+            return
+        parts = _MARKER.split(code)
+        for position, part in enumerate(parts):
+            if position % 2:
+                self._write_block(self.blocks[int(part)], depth, chunks)
+            elif part:
+                chunks.append(_indented(part, depth, position < len(parts) - 1))
+
+
+def _indented(code, depth, continued):
+    """Return code with the lines after its first indented by depth the way indent_body indents
+    them depth times: lines of only spaces are kept, and one level of trailing spaces is dropped
+    at every level. A continued last line is followed by a nested block"""
+    if not depth or '\n' not in code:
+        return code
+    prefix = INDENT * depth
+    if ' \n' not in code and code[-1] != ' ':
+        return code.replace('\n', '\n' + prefix).replace(prefix + '\n', '\n')
+    lines = code.split('\n')
+    last = len(lines) - 1
+    for index in range(1, len(lines)):
+        line = lines[index]
+        if index == last and continued:
+            lines[index] = prefix + line
+        elif line.strip(' '):
+            if line[-1] == ' ':
+                trailing = len(line) - len(line.rstrip(' '))
+                line = line[:len(line) - min(depth, trailing // len(INDENT)) * len(INDENT)]
+            lines[index] = prefix + line
+    return '\n'.join(lines)
@@ -0,0 +1,59 @@
+# MIT license
+#
+# Skimibowi - SKiDL Microcontroller Board Wizard
+# Copyright (C) 2019  Jussi Vestman
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Bill of materials of a circuit"""
+
+import csv
+import io
+
+BOM_FIELDS = ('References', 'Quantity', 'Value', 'Footprint', 'Library', 'Symbol')
+
+
+def bom_rows(circuit):
+    """Return BOM rows: parts with the same symbol, value and footprint are grouped on one row,
+    labels and other parts without a footprint are left out"""
+    groups = {}
+    for part in circuit.parts:
+        if part.footprint and part.ref.strip():
+            groups.setdefault((part.value, part.footprint, part.lib, part.name), []).append(part.ref)
+    rows = []
+    for (value, footprint, lib, name), refs in groups.items():
+        refs.sort(key=_ref_key)
+        rows.append((' '.join(refs), len(refs), value, footprint, lib, name))
+    rows.sort(key=lambda row: _ref_key(row[0].split()[0]))
+    return rows
+
+
+def render_bom(circuit):
+    """Return BOM of circuit as CSV"""
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator='\n')
+    writer.writerow(BOM_FIELDS)
+    writer.writerows(bom_rows(circuit))
+    return output.getvalue()
+
+
+def _ref_key(ref):
+    prefix = ref.rstrip('0123456789')
+    number = ref[len(prefix):]
+    return prefix, int(number) if number else 0
@@ -0,0 +1,267 @@
+# MIT license
+#
+# Skimibowi - SKiDL Microcontroller Board Wizard
+# Copyright (C) 2019  Jussi Vestman
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Make-style builds from a manifest, e.g. build.yml:
+
+    targets:
+      - settings: boards/esp12.yml
+        output: out/esp12.py
+      - settings: boards/esp12.yml
+        output: out/esp12.net
+
+The format of an output is given with 'format' (skidl, netlist or bom) or inferred from its
+extension. Paths are relative to the manifest. Hashes of the settings, the generator sources and
+each output are recorded in a JSON lock file next to the manifest, and only targets whose inputs,
+generator or output changed are built again, in parallel. Outputs are replaced atomically and only
+when their content changes, so downstream steps keyed on file timestamps are not invalidated"""
+
+import hashlib
+import importlib
+import json
+import os
+import threading
+import time
+
+from bom import render_bom
+from controller import load_settings_file
+from generator import generate_chunks
+from netlist import build_circuit, render_netlist
+from registry import discover_fragments, fragments
+from settings_cache import parse_settings
+
+LOCK_FORMAT = 1
+
+GENERATOR_MODULES = ('generator', 'generator_functions', 'templates', 'registry', 'fragment_cache',
+                     'netlist', 'circuit', 'symbols', 'sexpr', 'bom', 'build')
+
+FORMATS = ('skidl', 'netlist', 'bom')
+EXTENSION_FORMATS = {'.net': 'netlist', '.csv': 'bom'}
+
+
+class ManifestError(ValueError):
+    """Manifest is not valid"""
+
+
+class Target:
+    """Output built from a settings file. name is the output path as given in the manifest"""
+
+    __slots__ = ('name', 'settings', 'output', 'format')
+
+    def __init__(self, name, settings, output, output_format=None):
+        self.name = name
+        self.settings = settings
+        self.output = output
+        self.format = output_format or EXTENSION_FORMATS.get(os.path.splitext(output)[1], 'skidl')
+        if self.format not in FORMATS:
+            raise ManifestError(f"Unknown format '{self.format}' of {output}")
+
+    def __repr__(self):
+        return f"Target({self.name!r}, {self.format!r})"
+
+
+def load_manifest(manifest_filename):
+    """Return targets of manifest file, with paths relative to the manifest directory resolved"""
+    with open(manifest_filename, 'rb') as manifest_file:
+        manifest = parse_settings(manifest_file.read())
+    if not isinstance(manifest, dict) or not isinstance(manifest.get('targets'), list):
+        raise ManifestError(f"{manifest_filename}: 'targets' list is missing")
+
+    directory = os.path.dirname(manifest_filename)
+    targets = []
+    outputs = set()
+    for index, entry in enumerate(manifest['targets']):
+        if not isinstance(entry, dict) or 'settings' not in entry or 'output' not in entry:
+            raise ManifestError(f"{manifest_filename}: target {index + 1} needs 'settings' and 'output'")
+        target = Target(entry['output'], os.path.join(directory, entry['settings']),
+                        os.path.join(directory, entry['output']), entry.get('format'))
+        if target.name in outputs:
+            raise ManifestError(f"{manifest_filename}: {target.name} is built more than once")
+        outputs.add(target.name)
+        targets.append(target)
+    return targets
+
+
+def lock_filename(manifest_filename):
+    """Return lock file of manifest, e.g. build.yml -> build.lock"""
+    return os.path.splitext(manifest_filename)[0] + '.lock'
+
+
+def file_digest(filename):
+    """Return hex content hash of file, or None if it does not exist"""
+    try:
+        with open(filename, 'rb') as file:
+            return hashlib.blake2b(file.read(), digest_size=16).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def generator_version():
+    """Return hash of the sources of the generator modules and of modules registering fragments.
+    Every output is built again when it changes"""
+    discover_fragments()
+    names = sorted(set(GENERATOR_MODULES) | {fragment.function.__module__ for fragment in fragments.values()})
+    digest = hashlib.blake2b(f"{LOCK_FORMAT}".encode(), digest_size=16)
+    for name in names:
+        filename = getattr(importlib.import_module(name), '__file__', None)
+        if filename:
+            digest.update(name.encode('utf-8'))
+            with open(filename, 'rb') as source:
+                digest.update(hashlib.blake2b(source.read(), digest_size=16).digest())
+    return digest.hexdigest()
+
+
+def render_target(target):
+    """Return pieces of text of target output"""
+    return render_settings(load_settings_file(target.settings), target.format, target.settings)
+
+
+def render_settings(settings, output_format='skidl', source=''):
+    """Return pieces of text of output format of board described by settings"""
+    if output_format == 'netlist':
+        return [render_netlist(build_circuit(settings), source=source)]
+    if output_format == 'bom':
+        return [render_bom(build_circuit(settings))]
+    return generate_chunks(settings)
+
+
+def replace_file(filename, data):
+    """Replace file with data atomically through a temporary file in the same directory"""
+    temporary = f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temporary, 'wb') as file:
+            file.write(data)
+        os.replace(temporary, filename)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+def build_target(target):
+    """Build target. The output is replaced atomically, and only if its content changes.
+    Returns (target, output digest, True if written, error message or None)"""
+    try:
+        data = "".join(render_target(target)).encode('utf-8')
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        if file_digest(target.output) == digest:
+            return target, digest, False, None
+        directory = os.path.dirname(target.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        replace_file(target.output, data)
+    except Exception as error:  # pylint: disable=broad-except
+        return target, None, False, f"{type(error).__name__}: {error}"
+    return target, digest, True, None
+
+
+class BuildResult:
+    """Outcome of a build"""
+
+    def __init__(self):
+        self.written = []
+        self.unchanged = []
+        self.up_to_date = []
+        self.errors = {}
+        self.elapsed = 0.0
+
+    def summary(self):
+        """Human readable summary of the build"""
+        lines = [f"Built {len(self.written) + len(self.unchanged)} targets ({len(self.written)} written, "
+                 f"{len(self.unchanged)} unchanged), {len(self.up_to_date)} up to date, "
+                 f"{len(self.errors)} errors in {self.elapsed:.2f} s"]
+        for output, error in sorted(self.errors.items()):
+            lines.append(f"  {output}: {error}")
+        return "\n".join(lines)
+
+
+def read_lock(filename):
+    """Return lock file contents, or an empty lock if it is missing or from another format"""
+    try:
+        with open(filename, 'r', encoding='utf-8') as lock_file:
+            lock = json.load(lock_file)
+    except (OSError, ValueError):
+        return {'format': LOCK_FORMAT, 'generator': None, 'targets': {}}
+    if not isinstance(lock, dict) or lock.get('format') != LOCK_FORMAT or not isinstance(lock.get('targets'), dict):
+        return {'format': LOCK_FORMAT, 'generator': None, 'targets': {}}
+    return lock
+
+
+def write_lock(filename, lock):
+    """Write lock file atomically if its content changes"""
+    data = (json.dumps(lock, indent=2, sort_keys=True) + "\n").encode('utf-8')
+    if file_digest(filename) == hashlib.blake2b(data, digest_size=16).hexdigest():
+        return
+    replace_file(filename, data)
+
+
+def is_stale(target, entry, generator, settings_digest):
+    """Return True if target must be built again"""
+    return not entry or entry.get('generator') != generator or entry.get('format') != target.format or \
+        entry.get('settings') != settings_digest or file_digest(target.output) != entry.get('output')
+
+
+def build(manifest_filename, jobs=None, force=False):
+    """Build stale targets of manifest in a process pool and update its lock file. Targets are
+    named in the result by their output path in the manifest. force builds every target, e.g. after
+    the KiCad symbol libraries netlists are built from changed"""
+    result = BuildResult()
+    start = time.perf_counter()
+    targets = load_manifest(manifest_filename)
+    lock_file = lock_filename(manifest_filename)
+    lock = read_lock(lock_file)
+    generator = generator_version()
+
+    entries = {}
+    stale = []
+    for target in targets:
+        settings_digest = file_digest(target.settings)
+        entry = lock['targets'].get(target.name)
+        if settings_digest is None:
+            result.errors[target.name] = f"FileNotFoundError: {target.settings}"
+        elif force or is_stale(target, entry, generator, settings_digest):
+            entries[target.name] = {'settings': settings_digest, 'format': target.format, 'generator': generator}
+            stale.append(target)
+        else:
+            entries[target.name] = entry
+            result.up_to_date.append(target.name)
+
+    if jobs == 1 or len(stale) <= 1:
+        _collect(result, entries, map(build_target, stale))
+    else:
+        from concurrent.futures import ProcessPoolExecutor  # pylint: disable=import-outside-toplevel
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            _collect(result, entries, executor.map(build_target, stale))
+
+    write_lock(lock_file, {'format': LOCK_FORMAT, 'generator': generator, 'targets': entries})
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def _collect(result, entries, outcomes):
+    for target, digest, written, error in outcomes:
+        if error is not None:
+            del entries[target.name]
+            result.errors[target.name] = error
+            continue
+        entries[target.name]['output'] = digest
+        (result.written if written else result.unchanged).append(target.name)
@@ -0,0 +1,424 @@
+# MIT license
+#
+# Skimibowi - SKiDL Microcontroller Board Wizard
+# Copyright (C) 2019  Jussi Vestman
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""In-memory circuit representation of generated boards
+
+A Circuit is populated by interpreting the program the fragment generators produce with stand-ins
+of the SKiDL classes it uses, and netlist, BOM and flat SKiDL renderers traverse it. The program is
+never compiled or executed as Python, see program.py. Parts and nets are compact slotted records; pins are rows
+of parallel arrays, with the net of each pin in an array of net indices. Nets merge through a
+union-find array, and net names are interned."""
+
+import itertools
+import sys
+import types
+from array import array
+from dataclasses import dataclass
+
+from program import run_program
+from symbols import symbol_libraries
+
+NET_PREFIX = 'N$'
+
+NO_NET = -1
+
+# Builtins generated programs call; programs are interpreted with no other builtins
+PROGRAM_BUILTINS = {'len': len, 'list': list}
+
+
+@dataclass
+class PartRecord:
+    """Part instantiated from a library symbol, with pins first_pin .. first_pin + pin_count - 1"""
+
+    __slots__ = ('ref', 'lib', 'name', 'value', 'footprint', 'hierarchy', 'first_pin', 'pin_count')
+
+    ref: str
+    lib: str
+    name: str
+    value: str
+    footprint: str
+    hierarchy: tuple
+    first_pin: int
+    pin_count: int
+
+
+@dataclass
+class NetRecord:
+    """Net name; implicit nets are named with NET_PREFIX"""
+
+    __slots__ = ('name', 'implicit')
+
+    name: str
+    implicit: bool
+
+
+class Circuit:
+    """Parts, pins and nets of a board"""
+
+    def __init__(self, libraries=None):
+        self.libraries = symbol_libraries if libraries is None else libraries
+        self.parts = []
+        self.pin_part = array('i')
+        self.pin_net = array('i')
+        self.pin_numbers = []
+        self.pin_names = []
+        self.nets = []
+        self.net_parent = array('i')
+        self.named_nets = {}
+        self.refs = set()
+        self.ref_counts = {}
+        self.implicit_nets = 0
+        self.hierarchy = []
+
+    def add_part(self, lib, name, value=None, footprint=None, ref=None):
+        """Add part of library symbol and return its index"""
+        symbol = self.libraries.symbol(lib, name)
+        first_pin = len(self.pin_numbers)
+        index = len(self.parts)
+        for number, pin_name, _ in symbol.pins:
+            self.pin_part.append(index)
+            self.pin_net.append(NO_NET)
+            self.pin_numbers.append(sys.intern(number))
+            self.pin_names.append(sys.intern(pin_name))
+        self.parts.append(PartRecord(self.unique_ref(symbol.reference.rstrip('?#') or 'U', ref), lib, name,
+                                     symbol.value if value is None else str(value),
+                                     symbol.footprint if footprint is None else footprint,
+                                     tuple(self.hierarchy), first_pin, len(symbol.pins)))
+        return index
+
+    def add_net(self, name=None):
+        """Add net and return its index. Unnamed nets get the next implicit name"""
+        implicit = name is None
+        if implicit:
+            self.implicit_nets += 1
+            name = f"{NET_PREFIX}{self.implicit_nets}"
+        index = len(self.nets)
+        self.nets.append(NetRecord(sys.intern(name), implicit))
+        self.net_parent.append(index)
+        if not implicit:
+            self.named_nets[name] = index
+        return index
+
+    def unique_ref(self, prefix, ref=None):
+        """Return ref, or next free reference with prefix, that no other part has"""
+        if ref is None:
+            number = self.ref_counts.get(prefix, 0) + 1
+            while f"{prefix}{number}" in self.refs:
+                number += 1
+            self.ref_counts[prefix] = number
+            ref = f"{prefix}{number}"
+        elif ref in self.refs:
+            number = 1
+            while f"{ref}_{number}" in self.refs:
+                number += 1
+            ref = f"{ref}_{number}"
+        self.refs.add(ref)
+        return ref
+
+    def fetch_net(self, name):
+        """Return index of net with name, adding the net if it does not exist"""
+        index = self.named_nets.get(name)
+        return self.add_net(name) if index is None else self.find(index)
+
+    def find(self, net):
+        """Return index of the net that net has been merged to"""
+        parent = self.net_parent
+        while parent[net] != net:
+            parent[net] = parent[parent[net]]
+            net = parent[net]
+        return net
+
+    def net_of_pin(self, pin):
+        """Return net index of pin, or NO_NET"""
+        net = self.pin_net[pin]
+        return net if net == NO_NET else self.find(net)
+
+    def connect_pins(self, first, second):
+        """Connect two pins"""
+        first_net, second_net = self.net_of_pin(first), self.net_of_pin(second)
+        if first_net == NO_NET and second_net == NO_NET:
+            self.pin_net[first] = self.pin_net[second] = self.add_net()
+        elif first_net == NO_NET:
+            self.pin_net[first] = second_net
+        elif second_net == NO_NET:
+            self.pin_net[second] = first_net
+        else:
+            self.merge_nets(first_net, second_net)
+
+    def connect_pin_to_net(self, pin, net):
+        """Connect pin to net"""
+        pin_net = self.net_of_pin(pin)
+        if pin_net == NO_NET:
+            self.pin_net[pin] = self.find(net)
+        else:
+            self.merge_nets(self.find(net), pin_net)
+
+    def merge_nets(self, first, second):
+        """Merge second net to first. A named net keeps its name over an implicit one"""
+        first, second = self.find(first), self.find(second)
+        if first == second:
+            return
+        self.net_parent[second] = first
+        first_record, second_record = self.nets[first], self.nets[second]
+        if first_record.implicit and not second_record.implicit:
+            first_record.name, first_record.implicit = second_record.name, False
+
+    def pin_index(self, part, pin_id):
+        """Return indices of pins of part matching pin number, or pin name if no number matches"""
+        record = self.parts[part]
+        pins = range(record.first_pin, record.first_pin + record.pin_count)
+        pin_id = str(pin_id)
+        return [pin for pin in pins if self.pin_numbers[pin] == pin_id] or \
+            [pin for pin in pins if self.pin_names[pin] == pin_id]
+
+    def net_pins(self):
+        """Return list of (net record, pin indices) of nets that have pins, sorted by net name"""
+        pins_of_net = {}
+        for pin, net in enumerate(self.pin_net):
+            if net != NO_NET:
+                pins_of_net.setdefault(self.find(net), []).append(pin)
+        return sorted(((self.nets[net], pins) for net, pins in pins_of_net.items()), key=lambda item: item[0].name)
+
+    def net_names(self):
+        """Return sorted names of nets that have pins"""
+        return [net.name for net, _ in self.net_pins()]
+
+    def pin_ref(self, pin):
+        """Return (part ref, pin number) of pin"""
+        return self.parts[self.pin_part[pin]].ref, self.pin_numbers[pin]
+
+    def subcircuit(self, function):
+        """SKiDL @subcircuit: record the function in the hierarchy of parts created by it"""
+        def wrapper(*args, **kwargs):
+            self.hierarchy.append(function.__name__)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.hierarchy.pop()
+        wrapper.__name__ = function.__name__
+        wrapper.__doc__ = function.__doc__
+        return wrapper
+
+    def modules(self):
+        """Return modules generated programs import by name, where 'skidl' is the stand-ins bound
+        to this circuit"""
+        circuit = self
+        module = types.ModuleType('skidl')
+        module.Part = lambda lib, name, value=None, footprint=None, ref=None, **fields: \
+            Part(circuit, circuit.add_part(lib, name, value, footprint, ref))
+        module.Net = types.SimpleNamespace(fetch=lambda name, *args, **kwargs: Net(circuit, circuit.fetch_net(name)))
+        module.subcircuit = circuit.subcircuit
+        module.show = lambda lib, name, *args, **kwargs: _Show(circuit.libraries.symbol(lib, name))
+        module.generate_netlist = lambda *args, **kwargs: None
+        module.set_default_tool = lambda tool: None
+        module.KICAD = module.KICAD7 = module.KICAD8 = 'kicad'
+        return {'skidl': module, 'itertools': itertools}
+
+    def run(self, code, source='<skimibowi>'):
+        """Build the circuit by interpreting generated SKiDL program. Raises ProgramError if the
+        program uses anything beyond the statements, builtins, modules and attributes generated
+        programs use"""
+        run_program(code, self.modules(), PROGRAM_BUILTINS, source)
+        return self
+
+
+class _Show:  # pylint: disable=too-few-public-methods
+    """Result of SKiDL show(): the symbol fields generated programs read"""
+
+    def __init__(self, symbol):
+        self.F2 = symbol.footprint  # pylint: disable=invalid-name
+
+
+class Connectable:
+    """SKiDL connection operators: += connects, & connects in series and | in parallel"""
+
+    __slots__ = ('_circuit', '_index')
+
+    def __init__(self, circuit, index):
+        self._circuit = circuit
+        self._index = index
+
+    def ends(self):
+        """Return (input, output) of object placed in series"""
+        return self, self
+
+    def __iadd__(self, other):
+        for item in _flatten(other):
+            _connect(self, item)
+        return self
+
+    def __and__(self, other):
+        return Network(self) & other
+
+    def __rand__(self, other):
+        return Network(other) & self
+
+    def __or__(self, other):
+        return Network(self) | other
+
+    def __ror__(self, other):
+        return Network(other) | self
+
+
+class Pin(Connectable):
+    """Pin of a part"""
+
+    __slots__ = ()
+
+    @property
+    def name(self):
+        """Pin name"""
+        return self._circuit.pin_names[self._index]
+
+    @property
+    def number(self):
+        """Pin number"""
+        return self._circuit.pin_numbers[self._index]
+
+    def __repr__(self):
+        return "{}/{}".format(*self._circuit.pin_ref(self._index))
+
+
+class PinList(list):
+    """Pins of a part selected with a name many pins share"""
+
+    def __iadd__(self, other):
+        for pin in self:
+            Connectable.__iadd__(pin, other)
+        return self
+
+
+class Net(Connectable):
+    """Net fetched by name"""
+
+    __slots__ = ()
+
+    @property
+    def name(self):
+        """Net name"""
+        return self._circuit.nets[self._circuit.find(self._index)].name
+
+    def __repr__(self):
+        return f"Net({self.name!r})"
+
+
+class Part(Connectable):
+    """Part instantiated from a library symbol"""
+
+    __slots__ = ()
+
+    @property
+    def ref(self):
+        """Part reference"""
+        return self._circuit.parts[self._index].ref
+
+    def pins(self):
+        """Return list of all pins"""
+        record = self._circuit.parts[self._index]
+        return [Pin(self._circuit, pin) for pin in range(record.first_pin, record.first_pin + record.pin_count)]
+
+    def get_pins(self):
+        """Return list of all pins"""
+        return self.pins()
+
+    def ends(self):
+        pins = self.pins()
+        if len(pins) != 2:
+            raise ValueError(f"Part {self.ref} with {len(pins)} pins can't be placed in series")
+        return pins[0], pins[1]
+
+    def __getitem__(self, pin_ids):
+        if isinstance(pin_ids, slice):
+            return PinList(self.pins()[pin_ids])
+        if not isinstance(pin_ids, tuple):
+            pin_ids = (pin_ids,)
+        pins = PinList(Pin(self._circuit, pin)
+                       for pin_id in pin_ids for pin in self._circuit.pin_index(self._index, pin_id))
+        if not pins:
+            record = self._circuit.parts[self._index]
+            raise ValueError(f"No pins found using {record.name}:{record.ref}[{', '.join(map(str, pin_ids))}]")
+        return pins[0] if len(pins) == 1 else pins
+
+    def __setitem__(self, pin_ids, value):
+        """Accept the assignment that augmented assignment part[pin] += net does"""
+
+    def __iadd__(self, other):
+        raise TypeError(f"Can't connect to part {self.ref}, connect to its pins")
+
+    def __repr__(self):
+        record = self._circuit.parts[self._index]
+        return f"Part({record.lib!r}, {record.name!r}, ref={record.ref!r})"
+
+
+class Network:
+    """Pins and nets placed in series or in parallel"""
+
+    __slots__ = ('first', 'last')
+
+    def __init__(self, item):
+        if isinstance(item, Network):
+            self.first, self.last = item.first, item.last
+        elif isinstance(item, Connectable):
+            self.first, self.last = item.ends()
+        else:
+            raise TypeError(f"Can't create a network from {item!r}")
+
+    def __and__(self, other):
+        other = Network(other)
+        _connect(self.last, other.first)
+        network = Network(self)
+        network.last = other.last
+        return network
+
+    def __rand__(self, other):
+        return Network(other) & self
+
+    def __or__(self, other):
+        other = Network(other)
+        _connect(self.first, other.first)
+        _connect(self.last, other.last)
+        return self
+
+    def __ror__(self, other):
+        return Network(other) | self
+
+
+def _connect(first, second):
+    circuit = first._circuit
+    if isinstance(first, Net):
+        if isinstance(second, Net):
+            circuit.merge_nets(first._index, second._index)
+        else:
+            circuit.connect_pin_to_net(second._index, first._index)
+    elif isinstance(second, Net):
+        circuit.connect_pin_to_net(first._index, second._index)
+    else:
+        circuit.connect_pins(first._index, second._index)
+
+
+def _flatten(items):
+    if isinstance(items, (list, tuple)):
+        return [item for sublist in items for item in _flatten(sublist)]
+    if isinstance(items, Network):
+        return [items.first] if items.first is items.last else [items.first, items.last]
+    return [items]
@@ -0,0 +1,140 @@
+# MIT license
+#
+# Skimibowi - SKiDL Microcontroller Board Wizard
+# Copyright (C) 2019  Jussi Vestman
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Command line client of the generation server, e.g.
+
+    python client.py board.py -f board.yml
+    python client.py board.net -f board.yml --netlist --socket /tmp/skimibowi.sock
+
+Only standard library modules are imported, so each invocation starts in milliseconds and the
+generation is done by the server, see server.py"""
+
+import argparse
+import os
+import socket
+import sys
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+TIMEOUT = 60
+TOKEN_VARIABLE = 'SKIMIBOWI_SERVER_TOKEN'
+
+
+class ServerError(Exception):
+    """Server answered with an error status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def request_generation(settings, output_format='skidl', check_pins=False, json_settings=False,
+                       host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None, timeout=TIMEOUT, token=None):
+    """Post settings text or bytes to generation server and return the generated output, with
+    token when the server requires one. The request is a single HTTP/1.1 exchange written directly
+    to the socket, because http.client takes longer to import than the request takes to answer"""
+    if isinstance(settings, str):
+        settings = settings.encode('utf-8')
+    query = []
+    if output_format != 'skidl':
+        query.append(f'format={output_format}')
+    if check_pins:
+        query.append('check_pins=1')
+    path = '/generate' + ('?' + '&'.join(query) if query else '')
+    content_type = 'application/json' if json_settings else 'application/yaml'
+    authorization = f"Authorization: Bearer {token}\r\n" if token else ''
+    request = (f"POST {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: {content_type}\r\n"
+               f"{authorization}Content-Length: {len(settings)}\r\nConnection: close\r\n\r\n").encode('ascii')
+    request += settings
+
+    if socket_path:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.settimeout(timeout)
+        address = socket_path
+    else:
+        connection = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+        connection.settimeout(timeout)
+        address = (host, port)
+    with connection:
+        connection.connect(address)
+        connection.sendall(request)
+        chunks = []
+        while True:
+            chunk = connection.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    head, _, body = b''.join(chunks).partition(b'\r\n\r\n')
+    try:
+        status = int(head.split(b' ', 2)[1])
+    except (IndexError, ValueError):
+        raise ServerError(0, "Invalid response from server") from None
+    text = body.decode('utf-8')
+    if status != 200:
+        raise ServerError(status, text.rstrip('\n'))
+    return text
+
+
+def client_main(argv=None):
+    """Generate output through generation server and return exit code"""
+    parser = argparse.ArgumentParser(prog='skimibowi client',
+                                     description='Generate SKiDL, netlist or BOM through a running skimibowi server')
+    parser.add_argument('output', metavar='FILE', help='Output file, - for standard output')
+    parser.add_argument('-f', metavar='settings.yml', default='settings.yml', help='Settings file, YAML or JSON')
+    output_format = parser.add_mutually_exclusive_group()
+    output_format.add_argument('--netlist', action='store_true', help='Write KiCad netlist')
+    output_format.add_argument('--bom', action='store_true', help='Write bill of materials CSV')
+    parser.add_argument('--check-pins', action='store_true', help='Check pin references before writing FILE')
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f'Server address (default: {DEFAULT_HOST})')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'Server port (default: {DEFAULT_PORT})')
+    parser.add_argument('--socket', metavar='PATH', help='Unix socket of the server')
+    parser.add_argument('--token', default=os.environ.get(TOKEN_VARIABLE),
+                        help=f'Token the server requires (default: ${TOKEN_VARIABLE})')
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    try:
+        with open(args.f, 'rb') as settings_file:
+            settings = settings_file.read()
+    except OSError as error:
+        parser.error(str(error))
+    try:
+        text = request_generation(settings, 'netlist' if args.netlist else 'bom' if args.bom else 'skidl',
+                                  args.check_pins, os.path.splitext(args.f)[1].lower() == '.json',
+                                  args.host, args.port, args.socket, token=args.token)
+    except ServerError as error:
+        print(f"{args.f}: {error}", file=sys.stderr)
+        return 1
+    except OSError as error:
+        server = args.socket or f"{args.host}:{args.port}"
+        print(f"No skimibowi server at {server} ({error}); start one with: skimibowi_gen.py serve", file=sys.stderr)
+        return 2
+    if args.output == '-':
+        sys.stdout.write(text)
+    else:
+        with open(args.output, 'w') as output_file:
+            output_file.write(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(client_main())
@@ -23,8 +23,8 @@
 
 """Controller for Skimibowi. Acts between UI and code generator, maps component selections to footprints"""
 
-from yaml import load, dump, Loader
-from generator import generate
+from settings_cache import settings_cache, parse_settings, dump_settings
+from generator import generate_chunks
 
 footprints = {
     'ESP-01': 'Connector_PinHeader_2.54mm:PinHeader_2x04_P2.54mm_Vertical',
@@ -32,16 +32,26 @@ footprints = {
     'ESP-12E': 'RF_Module:ESP-12E',
     'WeMos D1 mini': 'Module:WEMOS_D1_mini_light',
     'ESP8266EX': 'Package_DFN_QFN:QFN-32-1EP_5x5mm_P0.5mm_EP3.45x3.45mm',
-    'ATtiny85-20PU': 'Package_DIP:DIP-8_W7.62mm',
-    'ATtiny85-20SU': 'Package_SO:SOIJ-8_5.3x5.3mm_P1.27mm',
-    'ATtiny85-20MU': 'Package_DFN_QFN:QFN-20-1EP_4x4mm_P0.5mm_EP2.6x2.6mm',
-    'ATmega328P-PU': 'Package_DIP:DIP-28_W7.62mm',
-    'ATmega328P-AU': 'Package_QFP:TQFP-32_7x7mm_P0.8mm',
-    'ATmega328P-MU': 'Package_DFN_QFN:QFN-32-1EP_5x5mm_P0.5mm_EP3.1x3.1mm',
+    'ATtiny85-20P': 'Package_DIP:DIP-8_W7.62mm',
+    'ATtiny85-20S': 'Package_SO:SOIJ-8_5.3x5.3mm_P1.27mm',
+    'ATtiny85-20M': 'Package_DFN_QFN:QFN-20-1EP_4x4mm_P0.5mm_EP2.6x2.6mm',
+    'ATmega328P-P': 'Package_DIP:DIP-28_W7.62mm',
+    'ATmega328P-A': 'Package_QFP:TQFP-32_7x7mm_P0.8mm',
+    'ATmega328P-M': 'Package_DFN_QFN:QFN-32-1EP_5x5mm_P0.5mm_EP3.1x3.1mm',
     'Arduino Nano': 'Module:Arduino_Nano',
     'No MCU': ''
 }
 
+# MCU names of settings saved by earlier versions of the wizard, which named bare AVRs by order code
+legacy_mcus = {
+    'ATtiny85-20PU': 'ATtiny85-20P',
+    'ATtiny85-20SU': 'ATtiny85-20S',
+    'ATtiny85-20MU': 'ATtiny85-20M',
+    'ATmega328P-PU': 'ATmega328P-P',
+    'ATmega328P-AU': 'ATmega328P-A',
+    'ATmega328P-MU': 'ATmega328P-M',
+}
+
 battery_footprints = {
     'No battery': '',
     '2xAA - Keystone 2462': 'Battery:BatteryHolder_Keystone_2462_2xAA',
@@ -155,72 +165,146 @@ fuse_footprints = {
     'SMD 1812': 'Fuse_1812_4532Metric'
 }
 
+mcu_rails = ['+VBatt', '+3V', '+3V3', '+5V']
+
+battery_management_ics = ['No battery management ic', 'MCP73871-2AA', 'MCP73831']
+
+usb_uarts = ['No USB', 'FT231', 'FT232RL', 'CP2102N-A01-GQFN24', 'CP2104', 'VUSB-AVR']
+
+board_footprints = ['None', 'Arduino Uno R3', 'Arduino Nano', 'Wemos D1 Mini', 'Adafruit Feather']
+
+transistor_footprints = ['THT', 'SOT-223', 'SOT-23']
+
+crystal_footprints = ['HC-49', 'CST']
+
+crystal_frequencies = ['10Mhz', '12MHz', '16MHz', '20MHz']
+
+
+# Wizard fields read by settings_from_fields and generate_skidl
+WIZARD_FIELDS = ('mcu', 'icsp', 'mcurail', 'powersource', 'battery_management', 'fuse', 'switch', 'reset',
+                 'Reset button', 'Flash button', 'led', 'FTDI header', 'usb_connector', 'ina219', 'DS18B20',
+                 'DS18B20U', 'usb_uart', 'board_footprint', 'onewire_connector', 'common_footprint',
+                 'transistor_footprint', 'crystal_footprint', 'crystal_frequency', 'regulator',
+                 'regulator_vin_bypass_cap', 'regulator_vout_bypass_cap', 'autoselect', 'hc12', 'sh1106', 'si5351',
+                 'generate_labels', 'title', 'author', 'filename')
+
 
 def fill_variables(wizard):
     """Fill circuit configuration based on selections made in wizard UI"""
+    return settings_from_fields(wizard.field)
+
+
+def snapshot_fields(wizard):
+    """Return dict of the values of wizard fields, reading each field once. The snapshot can be
+    used outside of the Qt GUI thread, see write_skidl"""
+    return {name: wizard.field(name) for name in WIZARD_FIELDS}
+
+
+def settings_from_fields(field):
+    """Return circuit configuration of wizard field values, field(name) returning the value of a
+    field, with the footprints and part data of the selections filled in"""
     return {
-        'mcu': wizard.field("mcu"),
-        'mcu_footprint': footprints[wizard.field("mcu")],
-        'icsp': wizard.field('icsp'),
-        'mcurail': wizard.field('mcurail'),
-        'powersource': wizard.field('powersource'),
-        'powersource_footprint': battery_footprints[wizard.field('powersource')],
-        'battery_management': wizard.field('battery_management'),
-        'fuse': wizard.field('fuse'),
-        'fuse_footprint': fuse_footprints[wizard.field('fuse')],
-        'switch': wizard.field('switch'),
-        'reset': wizard.field('reset'),
-        'Reset button': wizard.field('Reset button'),
-        'Flash button': wizard.field('Flash button'),
-        'led': wizard.field('led'),
-        'FTDI header': wizard.field('FTDI header'),
-        'usb_connector': wizard.field('usb_connector'),
-        'ina219': wizard.field('ina219'),
-        'DS18B20': wizard.field('DS18B20'),
-        'DS18B20U': wizard.field('DS18B20U'),
-        'usb_uart': wizard.field('usb_uart'),
-        'board_footprint': wizard.field('board_footprint'),
-        'onewire_connector': wizard.field('onewire_connector'),
-        'common_footprint': wizard.field('common_footprint'),
-        'transistor_footprint': wizard.field('transistor_footprint'),
-        'crystal_footprint': wizard.field('crystal_footprint'),
-        'crystal_frequency': wizard.field('crystal_frequency'),
-        'resistor_footprint': resistor_footprints[wizard.field('common_footprint')],
-        'capacitor_footprint': capacitor_footprints[wizard.field('common_footprint')],
-        'led_footprint': led_footprints[wizard.field('common_footprint')],
-        'regulator': wizard.field('regulator'),
-        'regulator_data': regulators[wizard.field('regulator')],
-        'regulator_vin_bypass_cap': wizard.field('regulator_vin_bypass_cap'),
-        'regulator_vout_bypass_cap': wizard.field('regulator_vout_bypass_cap'),
-        'usb_connector_footprint': usb_connector_footprints[wizard.field('usb_connector')],
-        'onewire_connector_footprint': onewire_connector_footprints[wizard.field('onewire_connector')],
-        'autoselect': wizard.field('autoselect'),
-        'hc12': wizard.field('hc12'),
-        'sh1106': wizard.field('sh1106'),
-        'si5351': wizard.field('si5351'),
-        'generate_labels': wizard.field('generate_labels'),
-        'title': wizard.field('title'),
-        'author': wizard.field('author')
+        'mcu': field("mcu"),
+        'mcu_footprint': footprints[field("mcu")],
+        'icsp': field('icsp'),
+        'mcurail': field('mcurail'),
+        'powersource': field('powersource'),
+        'powersource_footprint': battery_footprints[field('powersource')],
+        'battery_management': field('battery_management'),
+        'fuse': field('fuse'),
+        'fuse_footprint': fuse_footprints[field('fuse')],
+        'switch': field('switch'),
+        'reset': field('reset'),
+        'Reset button': field('Reset button'),
+        'Flash button': field('Flash button'),
+        'led': field('led'),
+        'FTDI header': field('FTDI header'),
+        'usb_connector': field('usb_connector'),
+        'ina219': field('ina219'),
+        'DS18B20': field('DS18B20'),
+        'DS18B20U': field('DS18B20U'),
+        'usb_uart': field('usb_uart'),
+        'board_footprint': field('board_footprint'),
+        'onewire_connector': field('onewire_connector'),
+        'common_footprint': field('common_footprint'),
+        'transistor_footprint': field('transistor_footprint'),
+        'crystal_footprint': field('crystal_footprint'),
+        'crystal_frequency': field('crystal_frequency'),
+        'resistor_footprint': resistor_footprints[field('common_footprint')],
+        'capacitor_footprint': capacitor_footprints[field('common_footprint')],
+        'led_footprint': led_footprints[field('common_footprint')],
+        'regulator': field('regulator'),
+        'regulator_data': regulators[field('regulator')],
+        'regulator_vin_bypass_cap': field('regulator_vin_bypass_cap'),
+        'regulator_vout_bypass_cap': field('regulator_vout_bypass_cap'),
+        'usb_connector_footprint': usb_connector_footprints[field('usb_connector')],
+        'onewire_connector_footprint': onewire_connector_footprints[field('onewire_connector')],
+        'autoselect': field('autoselect'),
+        'hc12': field('hc12'),
+        'sh1106': field('sh1106'),
+        'si5351': field('si5351'),
+        'generate_labels': field('generate_labels'),
+        'title': field('title'),
+        'author': field('author')
         }
 
 
+class BackgroundRequests:
+    """Numbers the background requests of the wizard and keeps every started worker referenced
+    until its result has been delivered, so that a worker is never freed while it runs. Only the
+    result of the latest request is current; earlier ones have been superseded"""
+
+    def __init__(self):
+        self.latest = 0
+        self.running = {}
+
+    def start(self, make_worker):
+        """Return worker made by make_worker(number) for a new request, which supersedes the
+        previous requests"""
+        self.latest += 1
+        worker = make_worker(self.latest)
+        self.running[self.latest] = worker
+        return worker
+
+    def cancel_waiting(self, take):
+        """Cancel the latest request if it has not started, take(worker) returning whether the
+        worker was removed from the queue before running"""
+        worker = self.running.get(self.latest)
+        if worker is not None and take(worker):
+            del self.running[self.latest]
+
+    def finish(self, number):
+        """Release worker of request number, whose result has been delivered, and return whether
+        it is the latest request"""
+        self.running.pop(number, None)
+        return number == self.latest
+
+
 def generate_skidl(wizard):
     """Generate SKiDL code based on chosen wizard options and save those settings to settings.yml
     where they are read when the wizard started next time"""
-    with open("settings.yml", 'w') as settings:
-        settings.write(dump(fill_variables(wizard)))
+    write_skidl(snapshot_fields(wizard))
+
 
-    code = generate(fill_variables(wizard))
+def write_skidl(fields, settings_filename="settings.yml"):
+    """Generate SKiDL code of snapshot of wizard fields to the file of its filename field and save
+    the settings to settings file. Returns the name of the SKiDL file"""
+    variables = settings_from_fields(fields.__getitem__)
+    with open(settings_filename, 'w') as settings:
+        settings.write(dump_settings(variables))
 
-    with open(wizard.field('filename'), 'w') as file:
-        file.write(code)
+    chunks = generate_chunks(variables)
+
+    with open(fields['filename'], 'w') as file:
+        file.writelines(chunks)
+    return fields['filename']
 
 
 def load_settings(wizard, settings_filename="settings.yml"):
     """Load chosen wizard settings from the previous time SKiDL code was generated with wizard"""
     try:
         with open(settings_filename, 'r') as settings_file:
-            settings = load(settings_file, Loader=Loader)
+            settings = upgrade_settings(parse_settings(settings_file))
 
             if settings:
                 for field in ['mcu', 'mcurail', 'icsp', 'powersource', 'battery_management', 'fuse',
@@ -234,11 +318,46 @@ def load_settings(wizard, settings_filename="settings.yml"):
         pass
 
 
-def generate_from_settings(filename, settings_filename="settings.yml"):
-    """Generate SKiDL program from settings file"""
+def upgrade_settings(settings):
+    """Return settings with the values saved by earlier versions of the wizard renamed"""
+    if isinstance(settings, dict) and settings.get('mcu') in legacy_mcus:
+        return dict(settings, mcu=legacy_mcus[settings['mcu']])
+    return settings
+
+
+def load_settings_file(settings_filename):
+    """Return settings dict read from settings file"""
+
+    return upgrade_settings(settings_cache.load(settings_filename))
+
+
+def generate_from_settings(filename, settings_filename="settings.yml", check_pins=False):
+    """Generate SKiDL program from settings file. With check_pins, pin references to parts of the
+    symbol libraries are checked and PinReferenceError raised before anything is written"""
+
+    chunks = generate_chunks(load_settings_file(settings_filename))
+    if check_pins:
+        from pin_check import validate_pin_references  # pylint: disable=import-outside-toplevel
+        chunks = list(chunks)
+        validate_pin_references("".join(chunks))
+    with open(filename, 'w') as file:
+        file.writelines(chunks)
+
+
+def netlist_from_settings(filename, settings_filename="settings.yml"):
+    """Generate KiCad netlist from settings file without running the SKiDL program"""
+    from netlist import build_circuit, render_netlist  # pylint: disable=import-outside-toplevel
+
+    text = render_netlist(build_circuit(load_settings_file(settings_filename)), source=settings_filename)
+    with open(filename, 'w') as file:
+        file.write(text)
+
+
+def bom_from_settings(filename, settings_filename="settings.yml"):
+    """Generate bill of materials CSV from settings file"""
+    from netlist import build_circuit  # pylint: disable=import-outside-toplevel
+    from bom import render_bom  # pylint: disable=import-outside-toplevel
 
-    with open(settings_filename, 'r') as settings_file:
-        settings = load(settings_file, Loader=Loader)
-        code = generate(settings)
-        with open(filename, 'w') as file:
-            file.write(code)
+    text = render_bom(build_circuit(load_settings_file(settings_filename)))
+    with open(filename, 'w', newline='') as file:
+        file.write(text)
@@ -23,23 +23,11 @@
 
 """Module for generating ESP8266EX or ESP-module based MCU circuits"""
 
-from generator_functions import generate_subcircuit, generate_ifdef, generate_inline, requirements
+from generator_functions import generate_subcircuit, generate_ifdef, generate_inline
+from templates import Template, renders
 from passives_generator import generate_c, generate_r, generate_l
 
-
-def generate_esp(args):
-    """Generate ESP-module code to circuit"""
-    reset = generate_reset_line(args) if args.get('reset', False) else ''
-    led = generate_ifdef('led', generate_power_led, args)
-    reset_button = generate_inline(generate_reset_button, args) if args.get('Reset button', False) else ''
-    flash_button = generate_inline(generate_flash_button, args) if args.get('Flash button', False) else ''
-    spi_bus = generate_inline(generate_esp_spi, args) if spi_bus_needed(args) else ''
-    if ((args.get('usb_uart', 'No USB') != 'No USB') or args.get('FTDI header', False)):
-        esp_serial = generate_inline(generate_esp_serial, args)
-    else:
-        esp_serial = ''
-    requirements.add(generate_r)
-    return '''
+ESP_MODULE = Template('''
 global U1
 U1 = Part('RF_Module', '{mcu}', footprint='{mcu_footprint}')
 
@@ -47,12 +35,36 @@ U1['VCC'] += Net.fetch('{mcurail}')
 U1['GND'] += Net.fetch('GND')
 U1['EN'] & R('10k') & Net.fetch('{mcurail}')
 U1['GPIO15'] & R('4k7') & Net.fetch('GND')
-'''.format(**args) + ''.join(filter(None, [reset, led, reset_button, flash_button, esp_serial, spi_bus])) + '\n'
+''')
+
+ESP_01 = Template('''
+global U1
+U1 = Part('./library/Skimibowi.lib', 'ESP-01', footprint='{mcu_footprint}')
+
+U1['VCC'] += Net.fetch('{mcurail}')
+U1['GND'] += Net.fetch('GND')
+U1['CH_PD'] & R('10k') & Net.fetch('{mcurail}')
+U1['RST'] += Net.fetch('RST')
+''')
+
+def generate_esp(args, context):
+    """Generate ESP-module code to circuit"""
+    reset = generate_reset_line(args, context) if args.get('reset', False) else ''
+    led = generate_ifdef('led', generate_power_led, args, context)
+    reset_button = generate_inline(generate_reset_button, args, context) if args.get('Reset button', False) else ''
+    flash_button = generate_inline(generate_flash_button, args, context) if args.get('Flash button', False) else ''
+    spi_bus = generate_inline(generate_esp_spi, args, context) if spi_bus_needed(args) else ''
+    if ((args.get('usb_uart', 'No USB') != 'No USB') or args.get('FTDI header', False)):
+        esp_serial = generate_inline(generate_esp_serial, args, context)
+    else:
+        esp_serial = ''
+    context.requirements.add(generate_r)
+    return ESP_MODULE.render(args) + ''.join(filter(None, [reset, led, reset_button, flash_button, esp_serial, spi_bus])) + '\n'
 
 def spi_bus_needed(args):
     return args.get('sh1106', False)
 
-def generate_esp_spi(args):
+def generate_esp_spi(args, context):
     """Generate SPI bus for ESP-12 module"""
     return '''
 U1['MOSI'] += Net.fetch('MOSI')
@@ -62,31 +74,23 @@ U1['SCLK'] += Net.fetch('SCLK')
 '''
 
 
-def generate_esp_01(args):
+def generate_esp_01(args, context):
     """Generate ESP-module code to circuit"""
-    led = generate_ifdef('led', generate_power_led, args)
-    reset_button = generate_inline(generate_reset_button, args) if args.get('Reset button', False) else ''
-    flash_button = generate_inline(generate_flash_button, args) if args.get('Flash button', False) else ''
+    led = generate_ifdef('led', generate_power_led, args, context)
+    reset_button = generate_inline(generate_reset_button, args, context) if args.get('Reset button', False) else ''
+    flash_button = generate_inline(generate_flash_button, args, context) if args.get('Flash button', False) else ''
     if ((args.get('usb_uart', 'No USB') != 'No USB') or args.get('FTDI header', False)):
-        esp_serial = generate_inline(generate_esp_serial, args)
+        esp_serial = generate_inline(generate_esp_serial, args, context)
     else:
         esp_serial = ''
-    requirements.add(generate_r)
-    return '''
-global U1
-U1 = Part('./library/Skimibowi.lib', 'ESP-01', footprint='{mcu_footprint}')
-
-U1['VCC'] += Net.fetch('{mcurail}')
-U1['GND'] += Net.fetch('GND')
-U1['CH_PD'] & R('10k') & Net.fetch('{mcurail}')
-U1['RST'] += Net.fetch('RST')
-'''.format(**args) + ''.join(filter(None, [led, reset_button, flash_button, esp_serial])) + '\n'
+    context.requirements.add(generate_r)
+    return ESP_01.render(args) + ''.join(filter(None, [led, reset_button, flash_button, esp_serial])) + '\n'
 
 
-def generate_esp8266ex_antenna(args):
+def generate_esp8266ex_antenna(args, context):
     """Generate ESP8266EX antenna circuit"""
-    requirements.add(generate_l)
-    requirements.add(generate_c)
+    context.requirements.add(generate_l)
+    context.requirements.add(generate_c)
     return f'''connector = Part('Connector', 'Conn_Coaxial', footprint='Connector_Coaxial:U.FL_Molex_MCRF_73412-0110_Vertical')
 l = L('2.2nH')
 esp8266ex['LNA'] & l & connector & Net.fetch('GND')
@@ -94,7 +98,7 @@ l[1] & C('3.2pF') & Net.fetch('GND')
 l[2] & C('2.4pF') & Net.fetch('GND')'''
 
 
-def generate_esp8266ex_crystal(args):
+def generate_esp8266ex_crystal(args, context):
     """Generate ESP8266EX crystal circuit"""
     return f"""crystal = Part('Device','Crystal_GND24', footprint='Crystal_SMD_Abracon_ABM8G-4Pin_3.2x2.5mm')
 crystal[1] += esp8266ex['XTAL_IN']
@@ -105,7 +109,7 @@ crystal[3] & C('6.8nF') & Net.fetch('GND')
 crystal[4] & C('6.8nF') & crystal[1]"""
 
 
-def generate_esp8266ex_vcc(args):
+def generate_esp8266ex_vcc(args, context):
     """Generate ESP8266EX input voltage circuits"""
     mcurail = args['mcurail']
 
@@ -122,22 +126,22 @@ l[1] & C('0.1uF') & Net.fetch('GND')
 l[2] & C('0.1uF') & Net.fetch('GND')"""
 
 
-def generate_esp8266ex(args):
+def generate_esp8266ex(args, context):
     """Generate ESP8266EX mcu to circuit with its supporting circuits"""
     mcu = args['mcu']
     mcu_footprint = args['mcu_footprint']
     mcurail = args['mcurail']
-    requirements.add(generate_r)
+    context.requirements.add(generate_r)
     return f'''
 esp8266ex = Part('MCU_Espressif', '{mcu}', footprint='{mcu_footprint}')
 
-{generate_subcircuit(generate_esp8266ex_antenna, args).strip()}
-{generate_subcircuit(generate_esp8266ex_vcc, args).strip()}
+{generate_subcircuit(generate_esp8266ex_antenna, args, context).strip()}
+{generate_subcircuit(generate_esp8266ex_vcc, args, context).strip()}
 
 esp8266ex['RES12K'] & R('12k') & Net.fetch('GND')
 esp8266ex['GND'] += Net.fetch('GND')
 
-{generate_subcircuit(generate_esp8266ex_crystal, args).strip()}
+{generate_subcircuit(generate_esp8266ex_crystal, args, context).strip()}
 
 esp8266ex['SDIO_DATA_1'] += Net.fetch('SDI/SD1')
 esp8266ex['SDIO_DATA_0'] += Net.fetch('SDO/SD0')
@@ -159,7 +163,7 @@ w25q32['GND'] += Net.fetch('GND')
 '''
 
 
-def generate_wemos_d1_mini(args):
+def generate_wemos_d1_mini(args, context):
     """Generate Wemos D1 footprint"""
     mcu_footprint = args['mcu_footprint']
     mcurail = args['mcurail']
@@ -176,53 +180,52 @@ U1['GND'] += Net.fetch('GND')
 """
 
 
-def generate_esp_serial(args):
-    """Generate ESP serial networks"""
-
-    return '''
+@renders('''
 U1['TX'] += Net.fetch('tx')
 U1['RX'] += Net.fetch('rx')
-'''.format(**args)
+''')
+def generate_esp_serial(args, context):
+    """Generate ESP serial networks"""
 
 
-def generate_reset_line(args):
-    """Generate reset line from ESP GPIO16 to RST pin"""
-    return '''
+@renders('''
 U1['RST'] += Net.fetch('RST')
 U1['GPIO16'] += Net.fetch('RST')
-'''.format(**args)
+''')
+def generate_reset_line(args, context):
+    """Generate reset line from ESP GPIO16 to RST pin"""
 
 
-def generate_reset_button(args):
-    """Generate button for pulling ESP RST pin to low (e.g. reset)"""
-    return '''
+@renders('''
 sw_reset = Part('Switch', 'SW_Push', footprint="Button_Switch_SMD:SW_SPST_B3U-1000P")
 sw_reset[1] += Net.fetch('RST')
 sw_reset[2] += Net.fetch('GND')
-'''.format(**args)
+''')
+def generate_reset_button(args, context):
+    """Generate button for pulling ESP RST pin to low (e.g. reset)"""
 
 
-def generate_flash_button(args):
-    """Generate button for pulling pulling ESP GPIO0 low (e.g. flash mode when booting)"""
-    return '''
+@renders('''
 sw_flash = Part('Switch', 'SW_Push', footprint="Button_Switch_SMD:SW_SPST_B3U-1000P")
 sw_flash[1] += U1['GPIO0']
 sw_flash[2] += Net.fetch('GND')
-'''.format(**args)
+''')
+def generate_flash_button(args, context):
+    """Generate button for pulling pulling ESP GPIO0 low (e.g. flash mode when booting)"""
 
 
-def generate_power_led(args):
-    """Generate led connected to ESP GPI0 that is on after boot"""
-    return '''
+@renders('''
 led = Part('Device', 'LED', footprint='{led_footprint}')
 U1['GPIO0'] & (R('1k') & led & Net.fetch('{mcurail}'))
-'''.format(**args)
+''')
+def generate_power_led(args, context):
+    """Generate led connected to ESP GPI0 that is on after boot"""
 
 
-def generate_esp_uart_reset(args):
+def generate_esp_uart_reset(args, context):
     """Generate reset circuitry for ESP"""
 
-    requirements.add(generate_r)
+    context.requirements.add(generate_r)
     transistors = {
         'THT': {'library': 'Transistor_BJT', 'part': 'PN2222A', 'footprint': 'Package_TO_SOT_THT:TO-92_Inline'},
         'SOT-223': {'library': 'Transistor_BJT', 'part': 'PZT2222A', 'footprint': 'Package_TO_SOT_SMD:SOT-223'},
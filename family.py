@@ -0,0 +1,307 @@
+# MIT license
+#
+# Skimibowi - SKiDL Microcontroller Board Wizard
+# Copyright (C) 2019  Jussi Vestman
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Board families: SKiDL programs of many variants of a board that share one module. The shared
+module holds every distinct helper and subcircuit function of the family, and each variant
+program imports the functions it uses and keeps only its own top level statements, and the
+functions that assign or read globals of its top level"""
+
+import ast
+import builtins
+import os
+import time
+
+from archive import render_file
+from batch import BatchResult, output_filename
+from generator import HEADER, generate
+from fragment_cache import fragment_cache
+from settings_schema import check_settings_files
+
+DEFAULT_MODULE = 'board_family'
+
+SHARED_DOCSTRING = '"""Helper and subcircuit functions shared by the SKiDL programs of a board family"""'
+
+BUILTINS = frozenset(dir(builtins))
+
+# Defined in the shared module when a subcircuit is renamed: SKiDL names the parts of a subcircuit
+# after its function, so the renamed functions keep the names of the board programs
+NAMED = '''
+
+def named(name):
+    """Name decorated function name"""
+    def decorator(function):
+        function.__name__ = name
+        return function
+    return decorator
+'''
+
+
+class Program:
+    """Generated program split to its import statements, top level function definitions and the
+    rest of its lines. definitions maps function names to (source without decorators, subcircuit)"""
+
+    __slots__ = ('docstring', 'imports', 'definitions', 'body')
+
+    def __init__(self, docstring, imports, definitions, body):
+        self.docstring = docstring
+        self.imports = imports
+        self.definitions = definitions
+        self.body = body
+
+
+def split_program(code):
+    """Split source of generated program, see Program"""
+    lines = code.splitlines(keepends=True)
+    taken = [False] * len(lines)
+    docstring = None
+    imports = []
+    definitions = {}
+    for index, node in enumerate(ast.parse(code).body):
+        segment = "".join(lines[node.lineno - 1:node.end_lineno])
+        if index == 0 and isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant):
+            docstring = segment.strip()
+            first = 0
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            imports.append(segment.strip())
+            first = node.lineno - 1
+        elif isinstance(node, ast.FunctionDef) and _decorators(node) is not None:
+            definitions[node.name] = (segment, _decorators(node))
+            first = node.decorator_list[0].lineno - 1 if node.decorator_list else node.lineno - 1
+        else:
+            continue
+        for line in range(first, node.end_lineno):
+            taken[line] = True
+    body = [line for line, is_taken in zip(lines, taken) if not is_taken]
+    return Program(docstring, imports, definitions, _collapse_blank_lines(body))
+
+
+def _decorators(node):
+    """Return True for a subcircuit, False for a plain function, None for other decorators"""
+    names = [decorator.id for decorator in node.decorator_list if isinstance(decorator, ast.Name)]
+    if len(names) != len(node.decorator_list) or names not in ([], ['subcircuit']):
+        return None
+    return bool(names)
+
+
+def _collapse_blank_lines(lines):
+    text = "".join(lines).strip('\n')
+    while '\n\n\n\n' in text:
+        text = text.replace('\n\n\n\n', '\n\n\n')
+    return text + '\n'
+
+
+def function_globals(source):
+    """Return the global names read by function and the names it assigns with global statements"""
+    function = ast.parse(source).body[0]
+    loaded = set()
+    local = set()
+    assigned = set()
+    for node in ast.walk(function):
+        if isinstance(node, ast.Global):
+            assigned.update(node.names)
+        elif isinstance(node, ast.Name):
+            (loaded if isinstance(node.ctx, ast.Load) else local).add(node.id)
+        elif isinstance(node, ast.arg):
+            local.add(node.arg)
+        elif isinstance(node, ast.FunctionDef) and node is not function:
+            local.add(node.name)
+    return loaded - (local - assigned) - BUILTINS, assigned
+
+
+def local_functions(program):
+    """Return names of the functions of program that must stay in the variant: those reading names
+    its top level or another such function assigns, and those assigning globals they read, as the
+    globals of a shared function are those of the shared module"""
+    body = [node for node in ast.walk(ast.parse(program.body)) if isinstance(node, ast.Name)]
+    body_loaded = {node.id for node in body if isinstance(node.ctx, ast.Load)}
+    body_assigned = {node.id for node in body if not isinstance(node.ctx, ast.Load)}
+    scopes = {name: function_globals(source) for name, (source, _) in program.definitions.items()}
+    local = set()
+    changed = True
+    while changed:
+        changed = False
+        assigned = body_assigned.union(local, *(scopes[name][1] for name in local))
+        loaded = body_loaded.union(*(scopes[name][0] for name in local))
+        for name, (function_loaded, function_assigned) in scopes.items():
+            if name not in local and (function_loaded & assigned or function_assigned & loaded):
+                local.add(name)
+                changed = True
+    return local
+
+
+def rename(source, names):
+    """Return source of function with the function name and the global names it reads replaced as
+    mapped by names"""
+    function = ast.parse(source).body[0]
+    free, _ = function_globals(source)
+    lines = source.splitlines(keepends=True)
+    replacements = [(node.lineno, node.col_offset, node.end_col_offset, names[node.id])
+                    for node in ast.walk(function)
+                    if isinstance(node, ast.Name) and node.id in free and node.id in names]
+    column = lines[function.lineno - 1].index(function.name, len('def'))
+    replacements.append((function.lineno, column, column + len(function.name), names.get(function.name, function.name)))
+    for lineno, start, end, name in sorted(replacements, reverse=True):
+        line = lines[lineno - 1]
+        lines[lineno - 1] = line[:start] + name + line[end:]
+    return "".join(lines)
+
+
+def used_imports(imports, code):
+    """Return the import statements binding names that code uses"""
+    used = _names(code)
+    return [statement for statement in imports
+            if any((alias.asname or alias.name.split('.')[0]) in used for alias in ast.parse(statement).body[0].names)]
+
+
+def _names(code):
+    return {node.id for node in ast.walk(ast.parse(code)) if isinstance(node, ast.Name)}
+
+
+def _definition(source, subcircuit, name=None):
+    decorators = ("@subcircuit\n" if subcircuit else "") + (f"@named({name!r})\n" if name else "")
+    return decorators + source.strip('\n') + "\n"
+
+
+class Family:
+    """Shared module and variant programs of a board family"""
+
+    def __init__(self, module=DEFAULT_MODULE):
+        self.module = module
+        self.imports = {}
+        self.functions = {}
+        self._names = {}
+
+    def add(self, code):
+        """Add generated program to family and return the variant program using the shared module"""
+        program = split_program(code)
+        for statement in program.imports:
+            self.imports.setdefault(statement, None)
+        local = local_functions(program)
+        shared = {}
+        for name in program.definitions:
+            if name not in local:
+                self._share(name, program.definitions, shared, set())
+        definitions = [_definition(*program.definitions[name]) for name in program.definitions if name in local]
+        code = "\n\n".join(definitions + [program.body])
+        imports = used_imports(program.imports, code)
+        used = _names(code)
+        imports += [f"from {self.module} import {shared[name]}" + (f" as {name}" if shared[name] != name else "")
+                    for name in program.definitions if name in shared and name in used]
+        docstring = f"{program.docstring}\n\n" if program.docstring else ''
+        return (f"{HEADER.splitlines()[0]}\n# Helper and subcircuit functions are defined in {self.module}.py\n\n"
+                f"{docstring}" + "\n".join(imports) + ("\n\n\n" if definitions else "\n\n") + code)
+
+    def _share(self, name, definitions, shared, visiting):
+        """Return name of the shared function of the variant's function name, defining it in the
+        shared module with the family functions it calls renamed to their shared names"""
+        if name in shared:
+            return shared[name]
+        source, subcircuit = definitions[name]
+        visiting.add(name)
+        free, _ = function_globals(source)
+        names = {callee: self._share(callee, definitions, shared, visiting)
+                 for callee in free if callee in definitions and callee not in visiting}
+        visiting.remove(name)
+        source = rename(source, names)
+        key = (name, source, subcircuit)
+        if key not in self._names:
+            shared_name = name
+            suffix = 1
+            while shared_name in self.functions:
+                suffix += 1
+                shared_name = f"{name}_{suffix}"
+            self.functions[shared_name] = _definition(rename(source, {name: shared_name}), subcircuit,
+                                                      name if subcircuit and shared_name != name else None)
+            self._names[key] = shared_name
+        shared[name] = self._names[key]
+        return shared[name]
+
+    def shared_module(self):
+        """Return source of the shared module"""
+        functions = "\n\n".join(self.functions.values())
+        parts = [HEADER.replace('"""Creates Kicad netlist file for a microcontroller board"""', SHARED_DOCSTRING),
+                 "\n".join(used_imports(self.imports, functions)), "\n"]
+        if "@named(" in functions:
+            parts.append(NAMED)
+        parts += ["\n\n", functions]
+        return "".join(parts)
+
+
+def generate_family(settings_list, module=DEFAULT_MODULE, cache=fragment_cache):
+    """Return source of the shared module and list of variant programs of settings"""
+    family = Family(module)
+    programs = [family.add(generate(settings, cache)) for settings in settings_list]
+    return family.shared_module(), programs
+
+
+def generate_family_batch(settings_filenames, output_dir=None, module=DEFAULT_MODULE, jobs=None, chunksize=16,
+                          validate=False):
+    """Generate variant program of every settings file and the shared module of the family to
+    output directory, by default the directory of the first settings file. The programs are
+    generated in a process pool and added to the family in the order of the files. A failing file
+    is recorded in the result and does not abort the run; with validate, files with settings
+    errors are not generated, see generate_batch. The shared module is written only if a variant
+    was generated"""
+    result = BatchResult()
+    settings_filenames = list(settings_filenames)
+    if output_dir is None:
+        output_dir = os.path.dirname(settings_filenames[0]) if settings_filenames else '.'
+    os.makedirs(output_dir or '.', exist_ok=True)
+
+    start = time.perf_counter()
+    if validate:
+        for settings_filename, errors in check_settings_files(settings_filenames).items():
+            result.errors[settings_filename] = "invalid settings: " + "; ".join(str(error) for error in errors)
+        settings_filenames = [name for name in settings_filenames if name not in result.errors]
+    family = Family(module)
+    try:
+        if jobs == 1:
+            _collect(result, family, output_dir, map(render_file, settings_filenames))
+        else:
+            from concurrent.futures import ProcessPoolExecutor  # pylint: disable=import-outside-toplevel
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                _collect(result, family, output_dir, executor.map(render_file, settings_filenames, chunksize=chunksize))
+    except Exception as error:  # pylint: disable=broad-except
+        for settings_filename in settings_filenames:
+            if settings_filename not in result.errors and settings_filename not in result.generated:
+                result.errors[settings_filename] = f"Not generated, {type(error).__name__}: {error}"
+    if result.generated:
+        with open(os.path.join(output_dir, module + '.py'), 'w') as file:
+            file.write(family.shared_module())
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def _collect(result, family, output_dir, outcomes):
+    for settings_filename, _, code, error in outcomes:
+        if error is None:
+            try:
+                code = family.add(code)
+            except Exception as add_error:  # pylint: disable=broad-except
+                error = f"{type(add_error).__name__}: {add_error}"
+        if error is None:
+            with open(output_filename(settings_filename, output_dir), 'w') as file:
+                file.write(code)
+            result.generated.append(settings_filename)
+        else:
+            result.errors[settings_filename] = error
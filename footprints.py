@@ -0,0 +1,215 @@
+# MIT license
+#
+# Skimibowi - SKiDL Microcontroller Board Wizard
+# Copyright (C) 2019  Jussi Vestman
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Pad and courtyard index of KiCad footprints
+
+Footprints are looked up by 'Library:Name' the way KiCad resolves the footprint field of a part: a
+library is a Library.pretty directory of .kicad_mod files next to Skimibowi or in the KiCad
+footprint directories. Footprint files are read with the streaming S-expression tokenizer, through
+mmap when they are large, and only their pads and courtyard graphics are kept. The index is kept in
+a local cache keyed by footprint path, checked only when the modification time or size changes."""
+
+import glob
+import mmap
+import os
+import threading
+
+import sexpr
+from settings_cache import cache_entry_filename, default_cache_dir, read_cache_entry, write_cache_entry
+
+CACHE_FORMAT = 1
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+FOOTPRINT_DIR_VARIABLES = ('KICAD_FOOTPRINT_DIR', 'KICAD9_FOOTPRINT_DIR', 'KICAD8_FOOTPRINT_DIR',
+                           'KICAD7_FOOTPRINT_DIR', 'KICAD6_FOOTPRINT_DIR')
+
+FOOTPRINT_DIRS = ('/usr/share/kicad/footprints', '/usr/local/share/kicad/footprints', '/usr/share/kicad/modules',
+                  '/Applications/KiCad/KiCad.app/Contents/SharedSupport/footprints')
+
+# Files of at least this many bytes are mapped instead of read
+MMAP_THRESHOLD = 1 << 20
+
+_HEADS = frozenset(('pad', 'fp_line', 'fp_rect', 'fp_circle', 'fp_arc', 'fp_poly'))
+
+
+class FootprintNotFoundError(LookupError):
+    """Footprint library or footprint does not exist in any of the footprint directories"""
+
+
+class Footprint:
+    """Footprint: its pads as (number, type, shape, x, y, width, height) tuples in file order, and
+    the (left, top, right, bottom) bounds of its courtyard or None if it has no courtyard"""
+
+    __slots__ = ('name', 'pads', 'courtyard')
+
+    def __init__(self, name, pads, courtyard):
+        self.name = name
+        self.pads = pads
+        self.courtyard = courtyard
+
+    def __repr__(self):
+        return f"Footprint({self.name!r}, pads={len(self.pads)})"
+
+    @property
+    def pad_numbers(self):
+        """Set of pad numbers, without the unnumbered mechanical pads"""
+        return frozenset(pad[0] for pad in self.pads if pad[0])
+
+
+def parse_kicad_mod(data):
+    """Return Footprint of .kicad_mod footprint str, bytes or buffer"""
+    stream = sexpr.tokens(data)
+    if next(stream, None) is not sexpr.OPEN or next(stream, None) not in ('module', 'footprint'):
+        raise ValueError("Not a KiCad footprint")
+    name = next(stream, '')
+    if not isinstance(name, str):
+        raise ValueError("Footprint without a name")
+    pads = []
+    points = []
+    for expression in sexpr.iterparse(stream, _HEADS):
+        if expression[0] == 'pad':
+            pads.append(_pad(expression))
+        elif _on_courtyard(expression):
+            points.extend(_points(expression))
+    courtyard = None
+    if points:
+        xs = [x for x, _ in points]
+        ys = [y for _, y in points]
+        courtyard = (min(xs), min(ys), max(xs), max(ys))
+    return Footprint(name, tuple(pads), courtyard)
+
+
+def _pad(pad):
+    number = pad[1] if len(pad) > 1 and isinstance(pad[1], str) else ''
+    pad_type = pad[2] if len(pad) > 2 and isinstance(pad[2], str) else ''
+    shape = pad[3] if len(pad) > 3 and isinstance(pad[3], str) else ''
+    x = y = width = height = 0.0
+    for item in pad:
+        if isinstance(item, list) and len(item) > 2:
+            if item[0] == 'at':
+                x, y = float(item[1]), float(item[2])
+            elif item[0] == 'size':
+                width, height = float(item[1]), float(item[2])
+    return number, pad_type, shape, x, y, width, height
+
+
+def _on_courtyard(graphic):
+    return any(isinstance(item, list) and item[:1] == ['layer'] and len(item) > 1 and item[1].endswith('.CrtYd')
+               for item in graphic)
+
+
+def _points(graphic):
+    """Return points of graphic; arcs and circles are bounded by their defining points"""
+    points = []
+    for item in graphic:
+        if not isinstance(item, list) or not item:
+            continue
+        if item[0] in ('start', 'end', 'center', 'mid', 'xy') and len(item) > 2:
+            points.append((float(item[1]), float(item[2])))
+        elif item[0] == 'pts':
+            points.extend(_points(item))
+    if graphic[0] == 'fp_circle' and len(points) == 2:
+        (cx, cy), (ex, ey) = points
+        radius = ((ex - cx) ** 2 + (ey - cy) ** 2) ** 0.5
+        points = [(cx - radius, cy - radius), (cx + radius, cy + radius)]
+    return points
+
+
+def footprint_dirs():
+    """Return directories searched for .pretty libraries: the Skimibowi directory, the KiCad
+    footprint directories of environment variables and the default KiCad install locations"""
+    dirs = [PACKAGE_DIR]
+    dirs.extend(os.environ[variable] for variable in FOOTPRINT_DIR_VARIABLES if os.environ.get(variable))
+    dirs.extend(FOOTPRINT_DIRS)
+    dirs.extend(sorted(glob.glob(r'C:\Program Files\KiCad\*\share\kicad\footprints'), reverse=True))
+    return [directory for directory in dirs if os.path.isdir(directory)]
+
+
+class FootprintIndex:
+    """Resolves footprints by 'Library:Name', parsing each footprint file once. An empty cache_dir
+    disables the on-disk footprint cache"""
+
+    def __init__(self, dirs=None, cache_dir=None):
+        self.dirs = footprint_dirs() if dirs is None else list(dirs)
+        self.cache_dir = default_cache_dir('footprints') if cache_dir is None else cache_dir
+        self._footprints = {}
+        self._libraries = {}
+        self._lock = threading.Lock()
+
+    def library_dir(self, library):
+        """Return .pretty directory of library name, or None if it is not found"""
+        with self._lock:
+            if library not in self._libraries:
+                self._libraries[library] = next(
+                    (path for path in (os.path.join(directory, library + '.pretty') for directory in self.dirs)
+                     if os.path.isdir(path)), None)
+            return self._libraries[library]
+
+    def has_library(self, library):
+        """Return True if footprint library is found"""
+        return self.library_dir(library) is not None
+
+    def footprint(self, reference):
+        """Return Footprint of 'Library:Name' reference"""
+        with self._lock:
+            footprint = self._footprints.get(reference)
+        if footprint is not None:
+            return footprint
+        library, _, name = reference.partition(':')
+        directory = self.library_dir(library)
+        if directory is None:
+            searched = ', '.join(self.dirs) or 'no directories'
+            raise FootprintNotFoundError(f"Footprint library '{library}' not found in {searched}; "
+                                         f"set KICAD_FOOTPRINT_DIR to the KiCad footprints directory")
+        filename = os.path.join(directory, name + '.kicad_mod')
+        if not os.path.isfile(filename):
+            raise FootprintNotFoundError(f"Footprint '{name}' not found in library '{library}'")
+        footprint = self.load(filename)
+        with self._lock:
+            self._footprints[reference] = footprint
+        return footprint
+
+    def load(self, filename):
+        """Return Footprint of .kicad_mod file, from the footprint cache if its modification time
+        and size have not changed"""
+        status = os.stat(filename)
+        entry_filename = cache_entry_filename(self.cache_dir, filename) if self.cache_dir else None
+        entry = read_cache_entry(entry_filename) if entry_filename else None
+        if isinstance(entry, tuple) and len(entry) == 4 and entry[:3] == (
+                CACHE_FORMAT, status.st_mtime_ns, status.st_size):
+            return Footprint(*entry[3])
+
+        with open(filename, 'rb') as footprint_file:
+            if status.st_size >= MMAP_THRESHOLD:
+                with mmap.mmap(footprint_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    footprint = parse_kicad_mod(data)
+            else:
+                footprint = parse_kicad_mod(footprint_file.read())
+        if entry_filename:
+            write_cache_entry(entry_filename, (CACHE_FORMAT, status.st_mtime_ns, status.st_size,
+                                               (footprint.name, footprint.pads, footprint.courtyard)))
+        return footprint
+
+
+footprint_index = FootprintIndex()
@@ -0,0 +1,153 @@
+# MIT license
+#
+# Skimibowi - SKiDL Microcontroller Board Wizard
+# Copyright (C) 2019  Jussi Vestman
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""LRU cache of rendered fragments
+
+A fragment is keyed by its identity and the projection of settings to the keys its code depends
+on. The keys are declared with register_fragment(depends=...) or discovered by recording which
+keys the fragment reads while it is rendered. Settings that differ only in keys a fragment never
+reads share its cached code and the requirements and import statements it adds to the context."""
+
+import threading
+from collections import OrderedDict, namedtuple
+from collections.abc import Mapping
+
+from generator_functions import GenerationContext
+from registry import freeze_value
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+MISSING = object()
+
+
+class RecordingArgs(Mapping):
+    """Read-only view of settings that records the keys read through it"""
+
+    __slots__ = ('args', 'keys_read')
+
+    def __init__(self, args):
+        self.args = args
+        self.keys_read = set()
+
+    def __getitem__(self, key):
+        self.keys_read.add(key)
+        return self.args[key]
+
+    def __contains__(self, key):
+        self.keys_read.add(key)
+        return key in self.args
+
+    def get(self, key, default=None):
+        self.keys_read.add(key)
+        return self.args.get(key, default)
+
+    def __iter__(self):
+        self.keys_read.update(self.args)
+        return iter(self.args)
+
+    def __len__(self):
+        return len(self.args)
+
+
+class FragmentCache:
+    """Bounded LRU cache of rendered fragments with hit/miss counters"""
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._keys = {}
+        self._lock = threading.Lock()
+
+    def render(self, fragment, args, context):
+        """Return code of fragment for settings args, rendering it only if no equivalent
+        configuration has been rendered before"""
+        keys = fragment.depends if fragment.depends is not None else self._keys.get(fragment)
+        if keys is not None:
+            cache_key = _cache_key(fragment, keys, args)
+            with self._lock:
+                entry = self._entries.get(cache_key)
+                if entry is not None:
+                    self._entries.move_to_end(cache_key)
+                    self.hits += 1
+            if entry is not None:
+                return _replay(entry, context)
+
+        keys_read, code, requirements, import_statements = record_fragment(fragment, args)
+        if fragment.depends is None:
+            keys = tuple(sorted(set(keys_read).union(keys or ()), key=str))
+        entry = (code, requirements, import_statements)
+
+        with self._lock:
+            self.misses += 1
+            if fragment.depends is None:
+                self._keys[fragment] = keys
+            self._entries[_cache_key(fragment, keys, args)] = entry
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return _replay(entry, context)
+
+    def cache_info(self):
+        """Return hits, misses, maxsize and current size of the cache"""
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+    def clear(self):
+        """Remove all rendered fragments and reset counters"""
+        with self._lock:
+            self._entries.clear()
+            self._keys.clear()
+            self.hits = self.misses = 0
+
+
+def record_fragment(fragment, args):
+    """Render fragment into a context of its own. Returns the settings keys the code depends on,
+    the code and the requirements and import statements the fragment adds"""
+    context = GenerationContext()
+    if fragment.depends is None:
+        recording = RecordingArgs(args)
+        code = fragment.render(recording, context)
+        keys = tuple(sorted(recording.keys_read, key=str))
+    else:
+        code = fragment.render(args, context)
+        keys = fragment.depends
+    return keys, code, tuple(context.requirements), tuple(context.import_statements)
+
+
+def _cache_key(fragment, keys, args):
+    get = args.get
+    return fragment, keys, tuple([freeze_value(get(key, MISSING)) for key in keys])
+
+
+def _replay(entry, context):
+    """Add requirements and import statements of cached fragment to context and return its code"""
+    code, requirements, import_statements = entry
+    if requirements:
+        context.requirements.update(requirements)
+    if import_statements:
+        context.import_statements.update(import_statements)
+    return code
+
+
+fragment_cache = FragmentCache()
@@ -23,7 +23,10 @@
 
 """Generates microcontroller board descriptions in SKiDL"""
 
-from generator_functions import requirements, generate_subcircuit, generate_connect_parts, import_statements
+from collections import ChainMap
+
+from generator_functions import GenerationContext, generate_subcircuit, generate_connect_parts
+from templates import renders
 from passives_generator import generate_r, generate_device, generate_d
 from esp_generator import generate_esp, generate_esp_01, generate_esp8266ex, generate_esp_uart_reset, generate_wemos_d1_mini
 from arduino_generator import generate_atmega328p
@@ -37,164 +40,19 @@ from arduino_generator import generate_arduino_reset_button
 from arduino_generator import generate_arduino_ftdi_reset
 from usb_uart_generator import generate_ftdi230, generate_ftdi232rl, generate_cp2104, generate_cp2102, generate_usb_connector, generate_vusb_avr
 from battery_manager_generator import generate_mcp73831, mcp73871
+from registry import register_fragment, plan
+from fragment_cache import fragment_cache
+from nets import hoist_nets
+import profiling
 
+ESP_MODULES = ('ESP-12E', 'ESP-07')
+ESP8266_MCUS = ('ESP8266EX', 'ESP-12E', 'ESP-07')
+ATMEGA328P_MCUS = ('ATmega328P-P', 'ATmega328P-A', 'ATmega328P-M')
+ATTINY85_MCUS = ('ATtiny85-20P', 'ATtiny85-20S', 'ATtiny85-20M')
+POWER_CONNECTORS = ('JST PH S2B', 'Barrel Jack 2.0/5.5mm')
 
-def generate(args):
-    """Generates microcontroller board descriptions in SKiDL """
-
-    requirements.clear()
-    import_statements.clear()
-
-    code = ""
-
-    if args.get('mcu') in ['ESP-12E', 'ESP-07']:
-        code += generate_subcircuit(generate_esp, args)
-
-    if args.get('mcu') in ['ESP-01']:
-        code += generate_subcircuit(generate_esp_01, args)
-
-    if args.get('mcu') in ['ESP8266EX']:
-        code += generate_subcircuit(generate_esp8266ex, args)
-
-    if args.get('mcu') == "WeMos D1 mini":
-        code += generate_subcircuit(generate_wemos_d1_mini, args)
-
-    if args.get('mcu') in ['ATmega328P-P', "ATmega328P-A", "ATmega328P-M"]:
-        code += generate_atmega328p(args)
-        if args['icsp']:
-            code += generate_icsp()
-        if args['Reset button']:
-            code += generate_arduino_reset_button()
-        if args['FTDI header']:
-            code += generate_arduino_ftdi_reset(args)
-
-    if args.get('mcu') in ['ATtiny85-20P', 'ATtiny85-20S', 'ATtiny85-20M']:
-        code += generate_attiny85(args)
-
-    if args.get('mcu') in ['Arduino Nano']:
-        code += generate_arduino_nano(args)
-
-    if args.get('powersource', 'No battery') not in ['No battery', 'JST PH S2B', 'Barrel Jack 2.0/5.5mm']:
-        code += generate_battery(args)
-
-    if args.get('powersource') in ['JST PH S2B', 'Barrel Jack 2.0/5.5mm']:
-        code += generate_power_connector(args)
-
-    if args.get('fuse', 'No fuse') != 'No fuse':
-        code += generate_fuse(args)
-
-    if args.get('switch', False):
-        code += generate_power_switch(args)
-
-    if args.get('battery_management', False) == 'MCP73871-2AA':
-        code += generate_subcircuit(mcp73871, args)
-
-    if args.get('battery_management', False) == 'MCP73831':
-        code += generate_subcircuit(generate_mcp73831, args)
-
-    if args.get('regulator_data', None):
-        code += generate_regulator(args)
-
-    if args.get('autoselect', False):
-        code += generate_autoselect(args)
-
-    if args.get('DS18B20', False) or args.get('DS18B20U', False) or args.get('onewire_connector', 'No Onewire connector') != 'No Onewire connector':
-        code += generate_onewire_bus(args)
-
-    if args.get('DS18B20', False):
-        code += generate_18b20(args)
-
-    if args.get('DS18B20U', False):
-        code += generate_18b20u(args)
-
-    if args.get('onewire_connector', "No Onewire connector") != "No Onewire connector":
-        code += generate_onewire_connector(args)
-
-    if args.get('ina219', False):
-        code += generate_subcircuit(generate_ina219, args)
-
-    if args.get('FTDI header', False):
-        code += generate_ftdi_header(args)
-
-    if args.get('usb_connector', 'No USB connector') != 'No USB connector':
-        code += generate_usb_connector(args)
-
-    if args.get('powersource', 'No battery') != 'No battery' \
-       or args.get('usb_connector', 'No USB connector') != 'No USB connector':
-        code += connect_power_network(args)
-
-    if args.get('usb_uart', False) == 'FT231':
-        code += generate_ftdi230(args)
-        if args['mcu'] in ['ESP-12E', 'ESP-07']:
-            code += generate_esp_uart_reset(args)
-
-    if args.get('usb_uart', False) == 'FT232RL':
-        code += generate_ftdi232rl(args)
-        if args['mcu'] in ['ESP-12E', 'ESP-07']:
-            code += generate_esp_uart_reset(args)
-
-    if args.get('usb_uart', False) == 'CP2102N-A01-GQFN24':
-        code += generate_cp2102(args)
-        if args['mcu'] in ['ESP-12E', 'ESP-07']:
-            code += generate_esp_uart_reset(args)
-
-    if args.get('usb_uart', False) == 'CP2104':
-        code += generate_subcircuit(generate_cp2104, args)
-        if args['mcu'] in ['ESP-12E', 'ESP-07']:
-            code += generate_subcircuit(generate_esp_uart_reset, args)
 
-    if args.get('usb_uart', False) == 'VUSB-AVR':
-        code += generate_vusb_avr(args)
-
-    if args.get('hc12', False):
-        code += generate_hc12(args)
-        if args['mcu'] in ['ESP-12E', 'ESP-07']:
-            code += generate_esp_software_serial(args)
-
-    if args.get('sh1106', False):
-        code += generate_sh1106(args)
-
-    if args.get('si5351', False):
-        code += generate_si5351(args)
-
-    if args.get('board_footprint', False) == 'Arduino Uno R3':
-        code += generate_arduino_uno_r3_board_footprint()
-        if args['mcu'] in ['ATmega328P-P', 'ATmega328P-A', 'ATmega328P-M']:
-            code += generate_atmega_arduino_board_connections()
-
-    if args.get('board_footprint', False) == 'Arduino Nano':
-        code += generate_arduino_nano_v3_board_footprint()
-        if args['mcu'] in ['ATmega328P-P', 'ATmega328P-A', 'ATmega328P-M']:
-            code += generate_atmega_arduino_board_connections()
-
-    if args.get('board_footprint', False) == 'Adafruit Feather':
-        code += generate_adafruit_feather(args)
-
-    if args.get('mcu') in ['ESP8266EX', 'ESP-12E', 'ESP-07'] \
-       and args.get('board_footprint') == 'Adafruit Feather':
-        code += generate_adadafruit_feather_esp_connections(args)
-
-    if args.get('title') and args.get('generate_labels'):
-        code += generate_title(args)
-
-    if args.get('author') and args.get('generate_labels'):
-        code += generate_author(args)
-
-    code += '''
-generate_netlist()
-'''
-
-    import_statements.add('from skidl import generate_netlist')
-    import_statements.add('from skidl import Net')
-    import_statements.add('from skidl import Part')
-    import_statements.add('from skidl import set_default_tool')
-    import_statements.add('from skidl import KICAD7')
-
-    import_code = "\n".join(import_statements)
-
-    reqcode = "\n".join([requirement(args) for requirement in requirements])
-
-    return f"""# Generated by Swimibowi - SKiDL Microcontroller Board Wizard
+HEADER = """# Generated by Swimibowi - SKiDL Microcontroller Board Wizard
 #
 # MIT license
 #
@@ -221,56 +79,139 @@ generate_netlist()
 
 \"\"\"Creates Kicad netlist file for a microcontroller board\"\"\"
 
-{import_code}
+"""
 
-set_default_tool(KICAD7)
+SKIDL_IMPORTS = ('from skidl import generate_netlist', 'from skidl import Net', 'from skidl import Part',
+                 'from skidl import set_default_tool', 'from skidl import KICAD7')
 
-""" + reqcode + code
+FOOTER = '''
+generate_netlist()
+'''
 
 
-def generate_battery(args):
-    """Generate Battery Holder"""
-    return '''
+def generate(args, cache=fragment_cache):
+    """Generates microcontroller board descriptions in SKiDL. Fragments are rendered through
+    cache, pass None to render every fragment from scratch"""
+
+    return "".join(generate_chunks(args, cache))
+
+
+def generate_to(stream, args, cache=fragment_cache):
+    """Write generated SKiDL program to text stream fragment by fragment"""
+
+    chunks = generate_chunks(args, cache)
+    if hasattr(stream, 'writelines'):
+        stream.writelines(chunks)
+    else:
+        for chunk in chunks:
+            stream.write(chunk)
+
+
+def generate_chunks(args, cache=fragment_cache):
+    """Return iterator over pieces of generated SKiDL program whose concatenation is the program.
+    Fragments are rendered before returning because the imports and helper functions that precede
+    them depend on what the fragments require, so invalid settings raise before anything is written"""
+
+    context = GenerationContext()
+    args = dict(args)
+
+    if profiling.profiler is not None:
+        return _generate_chunks_profiled(profiling.profiler, args, cache, context)
+    if cache is None:
+        fragment_codes = [fragment.render(args, context) for fragment in plan(args)]
+    else:
+        fragment_codes = [cache.render(fragment, args, context) for fragment in plan(args)]
+
+    context.import_statements.update(SKIDL_IMPORTS)
+    requirement_codes = [requirement(args) for requirement in context.requirements]
+
+    return iterate_chunks(context.import_statements, requirement_codes, *bind_nets(args, fragment_codes))
+
+
+def _generate_chunks_profiled(profiler, args, cache, context):
+    render = _render_fragment if cache is None else cache.render
+    fragment_codes = [profiler.call(fragment.name, 'fragment', render, fragment, args, context)
+                      for fragment in plan(args)]
+    context.import_statements.update(SKIDL_IMPORTS)
+    requirement_codes = [profiler.call(requirement.__name__, 'helper', requirement, args)
+                         for requirement in context.requirements]
+    net_prelude = ''
+    if args.get('hoist_nets'):
+        fragment_codes, net_prelude = profiler.call('hoist_nets', 'helper', bind_nets, args, fragment_codes)
+    return iterate_chunks(context.import_statements, requirement_codes, fragment_codes, net_prelude)
+
+
+def _render_fragment(fragment, args, context):
+    return fragment.render(args, context)
+
+
+def bind_nets(args, fragment_codes):
+    """Return fragment codes and the prelude binding their nets when settings hoist nets"""
+    if not args.get('hoist_nets'):
+        return fragment_codes, ''
+    net_prelude, fragment_codes = hoist_nets(fragment_codes)
+    return fragment_codes, net_prelude
+
+
+def iterate_chunks(import_statements, requirement_codes, fragment_codes, net_prelude=''):
+    """Yield pieces of program: header, import statements, helper functions required by fragments,
+    net bindings of hoisted nets, fragments and footer"""
+    yield HEADER
+    yield "\n".join(import_statements)
+    yield "\n\nset_default_tool(KICAD7)\n\n"
+    for index, requirement_code in enumerate(requirement_codes):
+        if index:
+            yield "\n"
+        yield requirement_code
+    if net_prelude:
+        yield net_prelude
+    yield from fragment_codes
+    yield FOOTER
+
+
+@renders('''
 BATTERY = Part('Device', 'Battery', footprint='{powersource_footprint}')
 BATTERY['+'] += Net.fetch('+VBatt')
 BATTERY['-'] += Net.fetch('GND')
-'''.format(**args)
+''')
+def generate_battery(args, context):
+    """Generate Battery Holder"""
 
 
-def generate_power_switch(args):
-    """Generate power switch"""
-    return '''
+@renders('''
 SWITCH = Part('Switch', 'SW_DPDT_x2', footprint='Button_Switch_THT:SW_CuK_JS202011CQN_DPDT_Straight')
-'''.format(**args)
+''')
+def generate_power_switch(args, context):
+    """Generate power switch"""
 
 
-def generate_fuse(args):
-    """Generate Fuse"""
-    return '''
+@renders('''
 FUSE = Part('Device', 'Fuse', footprint='{fuse_footprint}')
-'''.format(**args)
-
+''')
+def generate_fuse(args, context):
+    """Generate Fuse"""
 
-def generate_power_connector(args):
-    """Generate power connector"""
-    if args.get('Battery management', False) == 'No battery management ic':
-        args['battery_connector_pos'] = '+VLipo'
-    else:
-        args['battery_connector_pos'] = '+VBatt'
 
-    return '''
+@renders('''
 BATTERY = Part('Connector', 'Conn_01x02_Socket', footprint='{powersource_footprint}')
 BATTERY[1] += Net.fetch('{battery_connector_pos}')
 BATTERY[2] += Net.fetch('GND')
-'''.format(**args)
+''')
+def generate_power_connector(args, context):
+    """Generate power connector"""
+    if args.get('Battery management', False) == 'No battery management ic':
+        battery_connector_pos = '+VLipo'
+    else:
+        battery_connector_pos = '+VBatt'
+    return ChainMap({'battery_connector_pos': battery_connector_pos}, args)
 
 
-def connect_power_network(args):
+def connect_power_network(args, context):
     """Connect components that connect mcu/regulator throuh optional power switch, fuse and ina219 to battery"""
     if args.get('regulator_data', False):
-        requirements.add(generate_device)
-        requirements.add(generate_d)
-        import_statements.add("from skidl import show")
+        context.requirements.add(generate_device)
+        context.requirements.add(generate_d)
+        context.import_statements.add("from skidl import show")
         components = ['REGULATOR[\'VI\']', 'D("MBR0520LT", footprint=\'Diode_SMD:D_SOD-123\')[\'A,K\']']
     elif args.get('usb_connector', False) != 'No USB connector':
         components = ['Net.fetch(\'+VBus\')']
@@ -290,24 +231,24 @@ def connect_power_network(args):
     if args['powersource'] != 'No battery':
         components.append('BATTERY')
     elif args.get('regulator', False) == 'No regulator':
-        components.append('Net.fetch(\'{mcurail}\')'.format(**args))
+        components.append(f"Net.fetch('{args['mcurail']}')")
 
     line = " & ".join(components)
     return '\n' + line + '\n'
 
 
-def generate_autoselect(args):
+def generate_autoselect(args, context):
     """Generate +5V/USB auto selector"""
     return '''
 AUTOSELECTOR = Part('Device', 'D', footprint='Diode_SMD:D_SMA')
 Net.fetch('+5V') & AUTOSELECTOR & Net.fetch('+VBus')
-'''.format(*args)
+'''
 
 
-def generate_onewire_bus(args):
+def generate_onewire_bus(args, context):
     """Generate DQ net for onewire bus"""
 
-    requirements.add(generate_r)
+    context.requirements.add(generate_r)
 
     mcurail = args['mcurail']
 
@@ -323,40 +264,40 @@ Net.fetch('{mcurail}') & R('4k7') & Net.fetch('DQ')
 """
 
 
-def generate_18b20u(args):
-    """Generate 18B20U part and connect it to onewire bus"""
-    return '''
+@renders('''
 U3 = Part('Sensor_Temperature', 'DS18B20U', footprint="Package_SO:MSOP-8_3x3mm_P0.65mm")
 U3['VDD'] += Net.fetch('{mcurail}')
 U3['GND'] += Net.fetch('GND')
 U3['DQ'] += Net.fetch('DQ')
-'''.format(**args)
+''')
+def generate_18b20u(args, context):
+    """Generate 18B20U part and connect it to onewire bus"""
 
 
-def generate_18b20(args):
-    """Generate 18b20 part and connect it to onewire bus"""
-    return '''
+@renders('''
 U2 = Part('Sensor_Temperature', 'DS18B20', footprint="Package_TO_SOT_THT:TO-92_Inline")
 U2['VDD'] += Net.fetch('{mcurail}')
 U2['GND'] += Net.fetch('GND')
 U2['DQ'] += Net.fetch('DQ')
-'''.format(**args)
+''')
+def generate_18b20(args, context):
+    """Generate 18b20 part and connect it to onewire bus"""
 
 
-def generate_onewire_connector(args):
-    """Generate connector for external onewire devices"""
-    return '''
+@renders('''
 ONEWIRECONN = Part('Connector', 'Conn_01x03_Socket', footprint='{onewire_connector_footprint}')
 ONEWIRECONN[1] += Net.fetch('{mcurail}')
 ONEWIRECONN[2] += Net.fetch('DQ')
 ONEWIRECONN[3] += Net.fetch('GND')
-'''.format(**args)
+''')
+def generate_onewire_connector(args, context):
+    """Generate connector for external onewire devices"""
 
 
-def generate_ina219_i2c_address(args):
+def generate_ina219_i2c_address(args, context):
     """Generate resistors for setting up INA219 I2C bus address"""
 
-    requirements.add(generate_r)
+    context.requirements.add(generate_r)
 
     return """
 Net.fetch('GND') & R('10k') & INA219['A0']
@@ -364,10 +305,10 @@ Net.fetch('GND') & R('10k') & INA219['A1']
 """
 
 
-def generate_ina219(args):
+def generate_ina219(args, context):
     """Generate INA219 that measures voltage and current at battery + terminal"""
 
-    requirements.add(generate_r)
+    context.requirements.add(generate_r)
 
     return F"""
 global INA219_R_SHUNT
@@ -387,14 +328,11 @@ INA219['IN+'] += INA219_R_SHUNT[1]
 INA219['IN-'] += INA219_R_SHUNT[2]
 
 # Set I2C address
-{generate_subcircuit(generate_ina219_i2c_address, args)}
+{generate_subcircuit(generate_ina219_i2c_address, args, context)}
 """
 
 
-def generate_ftdi_header(args):
-    """Generate header for connecting FTDI programmer"""
-
-    return '''
+@renders('''
 FTDI_HEADER = Part('Connector', 'Conn_01x06_Pin', footprint='Skimibowi:FTDI_Header')
 FTDI_HEADER[1] += Net.fetch('GND')
 FTDI_HEADER[2] += Net.fetch('CTS')
@@ -402,10 +340,12 @@ FTDI_HEADER[3] += Net.fetch('{mcurail}')
 FTDI_HEADER[4] += Net.fetch('rx')
 FTDI_HEADER[5] += Net.fetch('tx')
 FTDI_HEADER[6] += Net.fetch('RTS')
-'''.format(**args)
+''')
+def generate_ftdi_header(args, context):
+    """Generate header for connecting FTDI programmer"""
 
 
-def generate_regulator(args):
+def generate_regulator(args, context):
     """Generate regulator that regulates battery voltage to corresponding voltage rail"""
 
     module = args['regulator_data']['module']
@@ -420,33 +360,33 @@ def generate_regulator(args):
 
     def regulator_vin_bypass_cap(args):
         vin_bypass_cap = args.get('regulator_vin_bypass_cap')
-        return (f"""Net.fetch('GND') & C('{vin_bypass_cap}') & REGULATOR['VI']
+        return (f"""Net.fetch('GND') & C({vin_bypass_cap!r}) & REGULATOR['VI']
 """ if vin_bypass_cap else '')
 
     def regulator_vout_bypass_cap(args):
         vout_bypass_cap = args.get('regulator_vout_bypass_cap')
-        return (f"""Net.fetch('GND') & C('{vout_bypass_cap}') & REGULATOR['VO']
+        return (f"""Net.fetch('GND') & C({vout_bypass_cap!r}) & REGULATOR['VO']
 """ if vout_bypass_cap else '')
 
     return f"""
-REGULATOR = Part('{module}', '{part}', value='{part}', footprint='{footprint}')
-REGULATOR['VO'] += Net.fetch('{output}')
+REGULATOR = Part({module!r}, {part!r}, value={part!r}, footprint={footprint!r})
+REGULATOR['VO'] += Net.fetch({output!r})
 REGULATOR['GND'] += Net.fetch('GND')
 """ + regulator_enable() + regulator_vin_bypass_cap(args) + regulator_vout_bypass_cap(args)
 
 
-def generate_adafruit_feather(args):
+def generate_adafruit_feather(args, context):
     """Generate Adafruit Feather board footprint"""
     return '''
 BOARD = Part('./library/feather.lib', 'Adafruit_Feather', footprint='Skimibowi:Adafruit_Feather')
-'''.format(args)
+'''
 
 
-def generate_adadafruit_feather_esp_connections(args):
+def generate_adadafruit_feather_esp_connections(args, context):
     """Generate connections from ESP-module to Adafruit feather board"""
 
-    import_statements.add("import itertools")
-    requirements.add(generate_connect_parts)
+    context.import_statements.add("import itertools")
+    context.requirements.add(generate_connect_parts)
 
     return f"""
 connect_parts(BOARD, U1)
@@ -470,22 +410,18 @@ U1['GPIO4'] += Net.fetch('SDA')
 """
 
 
-def generate_hc12(args):
-    """Generate footprint for HC-12 RF-module"""
-
-    return '''
+@renders('''
 HC12 = Part('./library/Skimibowi.lib', 'HC-12', footprint="Skimibowi:HC-12")
 HC12['VCC'] += Net.fetch('{mcurail}')
 HC12['GND'] += Net.fetch('GND')
 HC12['RXD'] += Net.fetch('TXD2')
 HC12['TXD'] += Net.fetch('RXD2')
-'''.format(**args)
-
+''')
+def generate_hc12(args, context):
+    """Generate footprint for HC-12 RF-module"""
 
-def generate_sh1106(args):
-    """Generate footprint for SH1106 display module"""
 
-    return '''
+@renders('''
 SH1106 = Part('./library/Skimibowi.lib', 'SH1106', footprint="Connector_PinHeader_2.54mm:PinHeader_1x07_P2.54mm_Vertical")
 SH1106['GND'] += Net.fetch('GND')
 SH1106['VCC'] += Net.fetch('+3V3')
@@ -494,10 +430,12 @@ SH1106['MOSI'] += Net.fetch('MOSI')
 SH1106['RES'] += Net.fetch('RES')
 SH1106['DC'] += Net.fetch('MISO')
 SH1106['CS'] += Net.fetch('SS')
-'''.format(**args)
+''')
+def generate_sh1106(args, context):
+    """Generate footprint for SH1106 display module"""
 
 
-def generate_si5351(args):
+def generate_si5351(args, context):
     """Generate footprint for SI5351"""
 
     return '''
@@ -519,30 +457,112 @@ SI5351['CLK2'] & connector3 & Net.fetch('GND')
 '''
 
 
-def generate_esp_software_serial(args):
-    """Generate ESP software serial networks"""
-
-    return '''
+@renders('''
 U1['GPIO13'] += Net.fetch('RXD2')
 U1['GPIO15'] += Net.fetch('TXD2')
-'''.format(**args)
+''')
+def generate_esp_software_serial(args, context):
+    """Generate ESP software serial networks"""
 
 
-def generate_title(args):
+def generate_title(args, context):
     """Generate visible title label for PCB to netlist"""
 
     title = args.get('title')
 
     return f"""
-Part('./library/Skimibowi.lib', 'Label', ref=" ", value='{title}', footprint='Skimibowi:label{len(title)}')
+Part('./library/Skimibowi.lib', 'Label', ref=" ", value={title!r}, footprint='Skimibowi:label{len(title)}')
 """
 
 
-def generate_author(args):
+def generate_author(args, context):
     """Generate visible author label for PCB to netlist"""
 
     author = args.get('author')
 
     return f"""
-Part('./library/Skimibowi.lib', 'Label', ref=" ", value='{author}', footprint='Skimibowi:label{len(author)}')
+Part('./library/Skimibowi.lib', 'Label', ref=" ", value={author!r}, footprint='Skimibowi:label{len(author)}')
 """
+
+
+def _has_onewire_bus(args):
+    return args.get('DS18B20', False) or args.get('DS18B20U', False) \
+        or args.get('onewire_connector', 'No Onewire connector') != 'No Onewire connector'
+
+
+def _has_power_network(args):
+    return args.get('powersource', 'No battery') != 'No battery' \
+        or args.get('usb_connector', 'No USB connector') != 'No USB connector'
+
+
+register_fragment('esp', generate_esp, lambda args: args.get('mcu') in ESP_MODULES, ['mcu'], subcircuit=True)
+register_fragment('esp_01', generate_esp_01, lambda args: args.get('mcu') == 'ESP-01', ['mcu'], subcircuit=True)
+register_fragment('esp8266ex', generate_esp8266ex, lambda args: args.get('mcu') == 'ESP8266EX', ['mcu'], subcircuit=True)
+register_fragment('wemos_d1_mini', generate_wemos_d1_mini, lambda args: args.get('mcu') == 'WeMos D1 mini', ['mcu'],
+                  subcircuit=True)
+register_fragment('atmega328p', generate_atmega328p, lambda args: args.get('mcu') in ATMEGA328P_MCUS, ['mcu'])
+register_fragment('icsp', generate_icsp, lambda args: args.get('icsp'), ['icsp'], requires=['atmega328p'])
+register_fragment('arduino_reset_button', generate_arduino_reset_button, lambda args: args.get('Reset button'),
+                  ['Reset button'], requires=['atmega328p'])
+register_fragment('arduino_ftdi_reset', generate_arduino_ftdi_reset, lambda args: args.get('FTDI header'),
+                  ['FTDI header'], requires=['atmega328p'])
+register_fragment('attiny85', generate_attiny85, lambda args: args.get('mcu') in ATTINY85_MCUS, ['mcu'])
+register_fragment('arduino_nano', generate_arduino_nano, lambda args: args.get('mcu') == 'Arduino Nano', ['mcu'])
+register_fragment('battery', generate_battery,
+                  lambda args: args.get('powersource', 'No battery') not in ('No battery',) + POWER_CONNECTORS,
+                  ['powersource'])
+register_fragment('power_connector', generate_power_connector, lambda args: args.get('powersource') in POWER_CONNECTORS,
+                  ['powersource'])
+register_fragment('fuse', generate_fuse, lambda args: args.get('fuse', 'No fuse') != 'No fuse', ['fuse'])
+register_fragment('power_switch', generate_power_switch, lambda args: args.get('switch', False), ['switch'])
+register_fragment('mcp73871', mcp73871, lambda args: args.get('battery_management') == 'MCP73871-2AA',
+                  ['battery_management'], subcircuit=True)
+register_fragment('mcp73831', generate_mcp73831, lambda args: args.get('battery_management') == 'MCP73831',
+                  ['battery_management'], subcircuit=True)
+register_fragment('regulator', generate_regulator, lambda args: args.get('regulator_data'), [], flags=['regulator_data'])
+register_fragment('autoselect', generate_autoselect, lambda args: args.get('autoselect', False), ['autoselect'])
+register_fragment('onewire_bus', generate_onewire_bus, _has_onewire_bus, ['DS18B20', 'DS18B20U', 'onewire_connector'])
+register_fragment('18b20', generate_18b20, lambda args: args.get('DS18B20', False), ['DS18B20'])
+register_fragment('18b20u', generate_18b20u, lambda args: args.get('DS18B20U', False), ['DS18B20U'])
+register_fragment('onewire_connector', generate_onewire_connector,
+                  lambda args: args.get('onewire_connector', 'No Onewire connector') != 'No Onewire connector',
+                  ['onewire_connector'])
+register_fragment('ina219', generate_ina219, lambda args: args.get('ina219', False), ['ina219'], subcircuit=True)
+register_fragment('ftdi_header', generate_ftdi_header, lambda args: args.get('FTDI header', False), ['FTDI header'])
+register_fragment('usb_connector', generate_usb_connector,
+                  lambda args: args.get('usb_connector', 'No USB connector') != 'No USB connector', ['usb_connector'])
+register_fragment('power_network', connect_power_network, _has_power_network, ['powersource', 'usb_connector'])
+register_fragment('ftdi230', generate_ftdi230, lambda args: args.get('usb_uart') == 'FT231', ['usb_uart'])
+register_fragment('ftdi230_esp_uart_reset', generate_esp_uart_reset, lambda args: args.get('mcu') in ESP_MODULES,
+                  ['mcu'], requires=['ftdi230'])
+register_fragment('ftdi232rl', generate_ftdi232rl, lambda args: args.get('usb_uart') == 'FT232RL', ['usb_uart'])
+register_fragment('ftdi232rl_esp_uart_reset', generate_esp_uart_reset, lambda args: args.get('mcu') in ESP_MODULES,
+                  ['mcu'], requires=['ftdi232rl'])
+register_fragment('cp2102', generate_cp2102, lambda args: args.get('usb_uart') == 'CP2102N-A01-GQFN24', ['usb_uart'])
+register_fragment('cp2102_esp_uart_reset', generate_esp_uart_reset, lambda args: args.get('mcu') in ESP_MODULES,
+                  ['mcu'], requires=['cp2102'])
+register_fragment('cp2104', generate_cp2104, lambda args: args.get('usb_uart') == 'CP2104', ['usb_uart'], subcircuit=True)
+register_fragment('cp2104_esp_uart_reset', generate_esp_uart_reset, lambda args: args.get('mcu') in ESP_MODULES,
+                  ['mcu'], requires=['cp2104'], subcircuit=True)
+register_fragment('vusb_avr', generate_vusb_avr, lambda args: args.get('usb_uart') == 'VUSB-AVR', ['usb_uart'])
+register_fragment('hc12', generate_hc12, lambda args: args.get('hc12', False), ['hc12'])
+register_fragment('esp_software_serial', generate_esp_software_serial, lambda args: args.get('mcu') in ESP_MODULES,
+                  ['mcu'], requires=['hc12'])
+register_fragment('sh1106', generate_sh1106, lambda args: args.get('sh1106', False), ['sh1106'])
+register_fragment('si5351', generate_si5351, lambda args: args.get('si5351', False), ['si5351'])
+register_fragment('arduino_uno_r3_board', generate_arduino_uno_r3_board_footprint,
+                  lambda args: args.get('board_footprint') == 'Arduino Uno R3', ['board_footprint'])
+register_fragment('arduino_uno_r3_atmega_connections', generate_atmega_arduino_board_connections,
+                  lambda args: args.get('mcu') in ATMEGA328P_MCUS, ['mcu'], requires=['arduino_uno_r3_board'])
+register_fragment('arduino_nano_v3_board', generate_arduino_nano_v3_board_footprint,
+                  lambda args: args.get('board_footprint') == 'Arduino Nano', ['board_footprint'])
+register_fragment('arduino_nano_v3_atmega_connections', generate_atmega_arduino_board_connections,
+                  lambda args: args.get('mcu') in ATMEGA328P_MCUS, ['mcu'], requires=['arduino_nano_v3_board'])
+register_fragment('adafruit_feather', generate_adafruit_feather,
+                  lambda args: args.get('board_footprint') == 'Adafruit Feather', ['board_footprint'])
+register_fragment('adafruit_feather_esp_connections', generate_adadafruit_feather_esp_connections,
+                  lambda args: args.get('mcu') in ESP8266_MCUS, ['mcu'], requires=['adafruit_feather'])
+register_fragment('title', generate_title, lambda args: args.get('title') and args.get('generate_labels'),
+                  [], flags=['title', 'generate_labels'])
+register_fragment('author', generate_author, lambda args: args.get('author') and args.get('generate_labels'),
+                  [], flags=['author', 'generate_labels'])
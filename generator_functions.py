@@ -24,17 +24,26 @@
 """Functions that generate SKiDL subcircuits functions"""
 
 from ordered_set import OrderedSet
+from blocks import Block, BlockTree
 
-requirements = OrderedSet()
-import_statements = OrderedSet()
 
+class GenerationContext:
+    """State of a single generate() call: the helper functions and import statements the generated
+    program requires, and the subcircuit functions nested in the one being generated. Fragment
+    generators receive the context explicitly so that concurrent generations never share state"""
 
-def generate_subcircuit(function, args):
+    def __init__(self):
+        self.requirements = OrderedSet()
+        self.import_statements = OrderedSet()
+        self.blocks = BlockTree()
+
+
+def generate_subcircuit(function, args, context):
     """Generate SKiDL @subcircuit which body will be the return value of argument function"""
 
-    import_statements.add('from skidl import subcircuit')
+    context.import_statements.add('from skidl import subcircuit')
 
-    return f"""{generate_subcircuit_without_call(function, args)}
+    return f"""{generate_subcircuit_without_call(function, args, context)}
 
 
 {function.__name__}()
@@ -42,41 +51,40 @@ def generate_subcircuit(function, args):
 """
 
 
-def generate_subcircuit_without_call(function, args):
-    """Generate function with subcircuit decorator"""
-    newline = '\n'
-    indent_str = '\n' + '    '
-    empty_line = '    \n'
+def generate_subcircuit_without_call(function, args, context):
+    """Generate function with subcircuit decorator. A function generated inside another one is
+    returned as a marker of its block, and indented when the outermost function is serialized"""
     function_name = function.__name__.replace('generate_', '')
     if args.get('generate_labels'):
-        requirements.add(generate_subcircuit_label)
-        return f"""
-
-@subcircuit
+        context.requirements.add(generate_subcircuit_label)
+    tree = context.blocks
+    tree.depth += 1
+    try:
+        body = function(args, context).strip()
+    finally:
+        tree.depth -= 1
+    header = f"""@subcircuit
 def {function.__name__}():
-    \"\"\"{function.__doc__}\"\"\"
-    subcircuit_label('{function_name}')
-    {function(args).strip().replace(newline, indent_str).replace(empty_line, newline)}"""
-
-    return f"""
-@subcircuit
-def {function.__name__}():
-    \"\"\"{function.__doc__}\"\"\"
-    {function(args).strip().replace(newline, indent_str).replace(empty_line, newline)}"""
+    \"\"\"{function.__doc__}\"\"\""""
+    if args.get('generate_labels'):
+        header += f"\n    subcircuit_label('{function_name}')"
+    block = Block(header, body)
+    code = tree.marker(block) if tree.depth else tree.serialize(block)
+    return ('\n\n' if args.get('generate_labels') else '\n') + code
 
 
-def generate_ifdef(define, function, args):
+def generate_ifdef(define, function, args, context):
     """Generate subcircuit function if key define is present in args dict"""
     if define in args:
-        return generate_subcircuit(function, args)
+        return generate_subcircuit(function, args, context)
 
     return ''
 
 
-def generate_inline(function, args):
+def generate_inline(function, args, context):
     """Return function contents with comment line as inline code"""
     return f"""# {function.__doc__}
-{function(args)}
+{function(args, context)}
 """
 
 
@@ -0,0 +1,148 @@
+# MIT license
+#
+# Skimibowi - SKiDL Microcontroller Board Wizard
+# Copyright (C) 2019  Jussi Vestman
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Incremental regeneration. An IncrementalGenerator keeps the plan and the fragments it rendered
+for the previous settings together with the settings keys each fragment read. Given new settings
+it re-renders only the fragments whose keys changed, rebuilds the import and helper function
+prelude if the fragments changed, and splices the program back together"""
+
+from ordered_set import OrderedSet
+
+from fragment_cache import MISSING, RecordingArgs, record_fragment
+from generator import SKIDL_IMPORTS, iterate_chunks, bind_nets
+from registry import plan, plan_keys
+
+
+class _Rendered:
+    """Code rendered for the settings values of the keys it depends on"""
+
+    __slots__ = ('keys', 'values', 'code', 'requirements', 'import_statements', 'generation')
+
+    def __init__(self, keys, args, code, requirements=(), import_statements=()):
+        self.generation = None
+        self.keys = keys
+        self.values = _values(keys, args)
+        self.code = code
+        self.requirements = requirements
+        self.import_statements = import_statements
+
+    def is_valid(self, args, changed, generation):
+        """Return True if none of the keys the code depends on has changed. changed is the set of
+        keys changed since the last successful generation, which used the code if it is numbered
+        generation"""
+        if changed is None or self.generation != generation:
+            return self.values == _values(self.keys, args)
+        return changed.isdisjoint(self.keys)
+
+
+def _same_prelude(entry, other):
+    return entry is other or (entry.requirements == other.requirements and
+                              entry.import_statements == other.import_statements)
+
+
+def _values(keys, args):
+    get = args.get
+    return tuple([get(key, MISSING) for key in keys])
+
+
+class IncrementalGenerator:
+    """Generates programs for successive settings, e.g. of a live preview, re-rendering only the
+    fragments invalidated by changed settings keys. Names of the fragments rendered by the last
+    call are in rendered"""
+
+    def __init__(self):
+        self.rendered = []
+        self._args = None
+        self._plan_keys = None
+        self._plan = ()
+        self._fragments = {}
+        self._requirements = {}
+        self._entries = ()
+        self._prelude = None
+        self._chunks = None
+        self._attempts = 0
+        self._generation = 0
+
+    def generate(self, args):
+        """Return program for settings args"""
+        return "".join(self.generate_chunks(args))
+
+    def generate_chunks(self, args):
+        """Return iterator over pieces of program for settings args, see generator.generate_chunks"""
+        args = dict(args)
+        previous = self._args
+        changed = None if previous is None else \
+            {key for key in previous.keys() | args.keys() if previous.get(key, MISSING) != args.get(key, MISSING)}
+        if changed is not None and not changed and plan_keys() is self._plan_keys:
+            self.rendered = []
+            return iterate_chunks(*self._chunks)
+
+        self._attempts += 1
+        attempt = self._attempts
+        current_plan_keys = plan_keys()
+        if changed is None or current_plan_keys is not self._plan_keys or not changed.isdisjoint(current_plan_keys):
+            selected = plan(args)
+        else:
+            selected = self._plan
+
+        rendered_names = []
+        entries = []
+        for fragment in selected:
+            entry = self._fragments.get(fragment)
+            if entry is None or not entry.is_valid(args, changed, self._generation):
+                keys, code, requirements, import_statements = record_fragment(fragment, args)
+                entry = self._fragments[fragment] = _Rendered(keys, args, code, requirements, import_statements)
+                rendered_names.append(fragment.name)
+            entry.generation = attempt
+            entries.append(entry)
+
+        if self._prelude is None or len(entries) != len(self._entries) or \
+                not all(map(_same_prelude, entries, self._entries)):
+            requirements = OrderedSet()
+            import_statements = OrderedSet()
+            for entry in entries:
+                requirements.update(entry.requirements)
+                import_statements.update(entry.import_statements)
+            import_statements.update(SKIDL_IMPORTS)
+            prelude = tuple(requirements), "\n".join(import_statements)
+        else:
+            prelude = self._prelude
+        requirement_codes = [self._render_requirement(requirement, args, changed, attempt)
+                             for requirement in prelude[0]]
+
+        chunks = ((prelude[1],), requirement_codes, *bind_nets(args, [entry.code for entry in entries]))
+        self._args, self._plan_keys, self._plan, self._entries, self._prelude, self._chunks = \
+            args, current_plan_keys, selected, entries, prelude, chunks
+        self._generation = attempt
+        self.rendered = rendered_names
+        return iterate_chunks(*chunks)
+
+    def _render_requirement(self, requirement, args, changed, attempt):
+        entry = self._requirements.get(requirement)
+        if entry is None or not entry.is_valid(args, changed, self._generation):
+            recording = RecordingArgs(args)
+            code = requirement(recording)
+            keys = tuple(sorted(recording.keys_read, key=str))
+            entry = self._requirements[requirement] = _Rendered(keys, args, code)
+        entry.generation = attempt
+        return entry.code
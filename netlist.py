@@ -0,0 +1,84 @@
+# MIT license
+#
+# Skimibowi - SKiDL Microcontroller Board Wizard
+# Copyright (C) 2019  Jussi Vestman
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""KiCad netlist backend. The board is built into a Circuit by running the generated SKiDL
+program against lightweight stand-ins of the SKiDL classes instead of SKiDL itself, so parts,
+pins and nets are built without importing SKiDL or parsing its libraries, and the netlist
+S-expression is rendered directly from the circuit"""
+
+import uuid
+
+from circuit import Circuit
+from generator import generate
+from sexpr import quote
+
+TSTAMP_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, 'https://github.com/jvestman/skimibowi')
+
+
+def sheetpath(hierarchy):
+    """Return KiCad sheet path names and timestamps of subcircuit hierarchy"""
+    names = '/' + ''.join(f"{name}/" for name in hierarchy)
+    tstamps = '/' + ''.join(f"{uuid.uuid5(TSTAMP_NAMESPACE, '/'.join(hierarchy[:index + 1]))}/"
+                            for index in range(len(hierarchy)))
+    return names, tstamps
+
+
+def render_netlist(circuit, source=''):
+    """Return KiCad netlist S-expression of circuit"""
+    lines = ['(export (version "D")',
+             '  (design',
+             f'    (source {quote(source)})',
+             '    (tool "Skimibowi"))',
+             '  (components']
+    for part in sorted(circuit.parts, key=lambda part: part.ref):
+        names, tstamps = sheetpath(part.hierarchy)
+        lines.append(f'    (comp (ref {quote(part.ref)})')
+        lines.append(f'      (value {quote(part.value)})')
+        lines.append(f'      (footprint {quote(part.footprint)})')
+        lines.append(f'      (libsource (lib {quote(part.lib)}) (part {quote(part.name)}))')
+        lines.append(f'      (sheetpath (names {quote(names)}) (tstamps {quote(tstamps)}))')
+        lines.append(f'      (tstamps {quote(uuid.uuid5(TSTAMP_NAMESPACE, names + part.ref))}))')
+    lines[-1] += ')'
+    lines.append('  (nets')
+    for code, (net, pins) in enumerate(circuit.net_pins(), 1):
+        lines.append(f'    (net (code {quote(code)}) (name {quote(net.name)})')
+        for ref, number in sorted(map(circuit.pin_ref, pins), key=_node_key):
+            lines.append(f'      (node (ref {quote(ref)}) (pin {quote(number)}))')
+        lines[-1] += ')'
+    lines[-1] += '))'
+    return '\n'.join(lines) + '\n'
+
+
+def _node_key(node):
+    ref, number = node
+    return (ref, 0, int(number), '') if number.isdigit() else (ref, 1, 0, number)
+
+
+def build_circuit(args, libraries=None):
+    """Return circuit of board described by settings args"""
+    return Circuit(libraries).run(generate(args))
+
+
+def generate_netlist(args, source='', libraries=None):
+    """Return KiCad netlist of board described by settings args"""
+    return render_netlist(build_circuit(args, libraries), source)
@@ -0,0 +1,68 @@
+# MIT license
+#
+# Skimibowi - SKiDL Microcontroller Board Wizard
+# Copyright (C) 2019  Jussi Vestman
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Net hoisting of generated SKiDL programs
+
+With the hoist_nets setting, every Net.fetch() of a literal net name in the fragments is replaced
+with a module level binding, e.g. net_GND, created once in a prelude that precedes the fragments.
+The program then looks each net up once instead of at every connection, and the nets of a board are
+listed in one place. Net.fetch() of computed names, e.g. in connect_parts, is left as it is."""
+
+import re
+
+NET_FETCH = re.compile(r"""Net\.fetch\((['"])([^'"\\\n]*)\1\)""")
+
+_NOT_IDENTIFIER = re.compile(r'\W')
+
+
+def net_variable(name, taken):
+    """Return unused variable name for net name: net_ and the name with + and - spelled as P
+    and N. The returned name is added to set taken"""
+    base = 'net_' + _NOT_IDENTIFIER.sub('_', name.replace('+', 'P').replace('-', 'N'))
+    variable = base
+    suffix = 1
+    while variable in taken:
+        suffix += 1
+        variable = f'{base}_{suffix}'
+    taken.add(variable)
+    return variable
+
+
+def hoist_nets(codes):
+    """Return prelude that binds every net of codes to a variable in order of first use, and
+    codes with their Net.fetch() of literal names replaced with the variables"""
+    variables = {}
+    taken = set()
+
+    def replace(match):
+        name = match.group(2)
+        variable = variables.get(name)
+        if variable is None:
+            variable = variables[name] = net_variable(name, taken)
+        return variable
+
+    codes = [NET_FETCH.sub(replace, code) for code in codes]
+    if not variables:
+        return '', codes
+    bindings = ''.join(f"{variable} = Net.fetch({name!r})\n" for name, variable in variables.items())
+    return f"\n\n# Nets\n{bindings}\n", codes
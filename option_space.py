@@ -0,0 +1,186 @@
+# MIT license
+#
+# Skimibowi - SKiDL Microcontroller Board Wizard
+# Copyright (C) 2019  Jussi Vestman
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Lazy enumeration of the wizard option space. The choices of every wizard field come from the
+option tables in controller; configurations are walked depth first through the cross-product,
+pruning invalid combinations as soon as the fields they depend on are chosen, and fields that do
+not affect the board chosen so far (e.g. crystal settings of an ESP board) keep their default.
+The product is never materialized, so even the full space can be walked in bounded memory"""
+
+from controller import (footprints, battery_footprints, regulators, resistor_footprints, usb_connector_footprints,
+                        fuse_footprints, onewire_connector_footprints, mcu_rails, battery_management_ics, usb_uarts,
+                        board_footprints, transistor_footprints, crystal_footprints, crystal_frequencies,
+                        settings_from_fields)
+from generator import ATMEGA328P_MCUS, ATTINY85_MCUS
+
+# Wizard fields in enumeration order with their choices, the first choice being the default.
+# Fields that constraints and relevance depend on come first
+FIELDS = (
+    ('mcu', tuple(footprints)),
+    ('powersource', tuple(battery_footprints)),
+    ('usb_connector', tuple(usb_connector_footprints)),
+    ('usb_uart', tuple(usb_uarts)),
+    ('board_footprint', tuple(board_footprints)),
+    ('battery_management', tuple(battery_management_ics)),
+    ('regulator', tuple(regulators)),
+    ('mcurail', tuple(mcu_rails)),
+    ('fuse', tuple(fuse_footprints)),
+    ('onewire_connector', tuple(onewire_connector_footprints)),
+    ('common_footprint', tuple(resistor_footprints)),
+    ('transistor_footprint', tuple(transistor_footprints)),
+    ('crystal_footprint', tuple(crystal_footprints)),
+    ('crystal_frequency', tuple(crystal_frequencies)),
+    ('icsp', (False, True)),
+    ('reset', (False, True)),
+    ('Reset button', (False, True)),
+    ('Flash button', (False, True)),
+    ('led', (False, True)),
+    ('FTDI header', (False, True)),
+    ('switch', (False, True)),
+    ('autoselect', (False, True)),
+    ('ina219', (False, True)),
+    ('DS18B20', (False, True)),
+    ('DS18B20U', (False, True)),
+    ('hc12', (False, True)),
+    ('sh1106', (False, True)),
+    ('si5351', (False, True)),
+    ('generate_labels', (False, True)),
+    ('regulator_vin_bypass_cap', ('10uF',)),
+    ('regulator_vout_bypass_cap', ('10uF',)),
+    ('title', ('',)),
+    ('author', ('',)),
+)
+
+# Bare AVR MCUs, named as the generator fragments of the MCUs expect
+AVR_MCUS = ATMEGA328P_MCUS + ATTINY85_MCUS
+
+
+def is_avr(fields):
+    """Return True if the MCU is a bare ATmega or ATtiny"""
+    return fields['mcu'] in AVR_MCUS
+
+
+def is_atmega(fields):
+    """Return True if the MCU is a bare ATmega"""
+    return fields['mcu'] in ATMEGA328P_MCUS
+
+
+def is_esp(fields):
+    """Return True if the MCU is an ESP8266 chip or module"""
+    return fields['mcu'].startswith(('ESP', 'WeMos'))
+
+
+# Fields that matter only for some boards, with the predicate telling when
+RELEVANT = {
+    'crystal_footprint': is_atmega,
+    'crystal_frequency': is_atmega,
+    'icsp': is_avr,
+    'reset': is_esp,
+    'Flash button': is_esp,
+    'led': is_esp,
+    'Reset button': lambda fields: is_esp(fields) or is_atmega(fields),
+    'transistor_footprint': is_esp,
+    'regulator_vin_bypass_cap': lambda fields: fields['regulator'] != 'No regulator',
+    'regulator_vout_bypass_cap': lambda fields: fields['regulator'] != 'No regulator',
+}
+
+BOARD_MCUS = {
+    'Arduino Uno R3': is_atmega,
+    'Arduino Nano': is_atmega,
+    'Wemos D1 Mini': is_esp,
+    'Adafruit Feather': is_esp,
+}
+
+# Predicates of valid configurations, checked when the last field they read has been chosen
+CONSTRAINTS = (
+    (('mcu', 'usb_uart'), lambda fields: fields['usb_uart'] != 'VUSB-AVR' or is_avr(fields)),
+    (('usb_connector', 'usb_uart'),
+     lambda fields: fields['usb_uart'] == 'No USB' or fields['usb_connector'] != 'No USB connector'),
+    (('mcu', 'board_footprint'), lambda fields: BOARD_MCUS.get(fields['board_footprint'], bool)(fields)),
+    (('powersource', 'battery_management'),
+     lambda fields: fields['powersource'] != 'No battery' or fields['battery_management'] == battery_management_ics[0]),
+    (('usb_connector', 'autoselect'),
+     lambda fields: not fields['autoselect'] or fields['usb_connector'] != 'No USB connector'),
+)
+
+
+class OptionSpace:
+    """Walks wizard field combinations. fixed maps fields to the only value they take, and when vary
+    is given, fields not in it keep their default"""
+
+    def __init__(self, fixed=None, vary=None, fields=FIELDS, relevant=None, constraints=CONSTRAINTS):
+        self.fixed = dict(fixed or {})
+        self.vary = None if vary is None else frozenset(vary)
+        self.fields = tuple(fields)
+        self.relevant = RELEVANT if relevant is None else relevant
+        names = [name for name, _ in self.fields]
+        unknown = (set(self.fixed) | (self.vary or set())).difference(names)
+        if unknown:
+            raise ValueError(f"Unknown fields {sorted(unknown)}")
+        self._checks = [[] for _ in names]
+        for depends, predicate in constraints:
+            self._checks[max(names.index(name) for name in depends)].append(predicate)
+
+    def choices(self, index, fields):
+        """Return choices of field at index, given fields chosen before it"""
+        name, choices = self.fields[index]
+        if name in self.fixed:
+            return (self.fixed[name],)
+        if self.vary is not None and name not in self.vary:
+            return choices[:1]
+        relevant = self.relevant.get(name)
+        if relevant is not None and not relevant(fields):
+            return choices[:1]
+        return choices
+
+    def field_values(self):
+        """Yield dict of wizard field values of every valid configuration"""
+        count = len(self.fields)
+        fields = {}
+        iterators = [iter(self.choices(0, fields))]
+        while iterators:
+            depth = len(iterators) - 1
+            value = next(iterators[depth], _END)
+            if value is _END:
+                iterators.pop()
+                continue
+            fields[self.fields[depth][0]] = value
+            if not all(check(fields) for check in self._checks[depth]):
+                continue
+            if depth + 1 == count:
+                yield dict(fields)
+            else:
+                iterators.append(iter(self.choices(depth + 1, fields)))
+
+    def __iter__(self):
+        """Yield settings of every valid configuration, ready for generate()"""
+        for fields in self.field_values():
+            yield settings_from_fields(fields.__getitem__)
+
+
+_END = object()
+
+
+def configurations(fixed=None, vary=None):
+    """Return lazy iterator over settings of every valid configuration, see OptionSpace"""
+    return iter(OptionSpace(fixed, vary))
@@ -23,8 +23,6 @@
 
 """Generates passive component footprints to SKiDL programs"""
 
-from generator_functions import import_statements
-
 def generate_r(args):
     """Generate default resistor footprint"""
     return f"""
@@ -0,0 +1,227 @@
+# MIT license
+#
+# Skimibowi - SKiDL Microcontroller Board Wizard
+# Copyright (C) 2019  Jussi Vestman
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Static check of the pin references of generated SKiDL programs. Parts assigned to variables,
+e.g. HC12 = Part('./library/Skimibowi.lib', 'HC-12'), are resolved to their library symbols, and
+every pin subscript of such a variable with literal pin ids, e.g. HC12['RXD'] or sw_reset[1], is
+matched exactly to a pin number or pin name of the symbol, as circuit.Circuit.pin_index matches
+them. Typos are then found when the program is generated instead of when SKiDL runs it.
+
+Parts with a literal footprint, e.g. footprint='Skimibowi:HC-12', are also checked to have a
+footprint pad for every pin number of their symbol. Results are memoized by library, symbol and
+footprint, so thousands of generated variants are checked in one pass reading each file once"""
+
+import re
+import string
+
+from footprints import FootprintNotFoundError, footprint_index
+from symbols import SymbolNotFoundError, symbol_libraries
+
+PART_ARGUMENTS = re.compile(r"""\s*(['"])(.+?)\1\s*,\s*(['"])(.+?)\3""")
+ASSIGNED_VARIABLE = re.compile(r"""([A-Za-z_]\w*)\s*=\s*$""")
+PIN_IDS = re.compile(r"""\[\s*((?:'[^'\n]*'|"[^"\n]*"|\d+)(?:\s*,\s*(?:'[^'\n]*'|"[^"\n]*"|\d+))*)\s*\]""")
+PIN_ID = re.compile(r"""'([^'\n]*)'|"([^"\n]*)"|(\d+)""")
+NAME_CHARACTERS = string.ascii_letters + string.digits + '_'
+MAX_NAME_LENGTH = 64
+FOOTPRINT_ARGUMENT = re.compile(r"""\bfootprint\s*=\s*([fF]?)(['"])(.*?)\2""")
+
+
+class PinReferenceError(ValueError):
+    """Generated program refers to pins its parts do not have, or its parts have pins without pads"""
+
+    def __init__(self, problems):
+        super().__init__("\n".join(map(str, problems)))
+        self.problems = problems
+
+
+class UnknownPin:
+    """Pin reference that matches no pin of the symbol of the part"""
+
+    __slots__ = ('line', 'variable', 'library', 'symbol', 'pin')
+
+    def __init__(self, line, variable, library, symbol, pin):
+        self.line = line
+        self.variable = variable
+        self.library = library
+        self.symbol = symbol
+        self.pin = pin
+
+    def __repr__(self):
+        return f"UnknownPin({self.line}, {self.variable!r}, {self.pin!r})"
+
+    def __str__(self):
+        if self.pin is None:
+            return f"line {self.line}: symbol '{self.symbol}' of {self.variable} not found in library '{self.library}'"
+        return f"line {self.line}: {self.variable}[{self.pin!r}] matches no pin of '{self.symbol}' in '{self.library}'"
+
+
+class MissingPad:
+    """Pin number of the symbol of a part that has no pad in the footprint of the part"""
+
+    __slots__ = ('line', 'library', 'symbol', 'footprint', 'pin')
+
+    def __init__(self, line, library, symbol, footprint, pin):
+        self.line = line
+        self.library = library
+        self.symbol = symbol
+        self.footprint = footprint
+        self.pin = pin
+
+    def __repr__(self):
+        return f"MissingPad({self.line}, {self.symbol!r}, {self.footprint!r}, {self.pin!r})"
+
+    def __str__(self):
+        return (f"line {self.line}: pin {self.pin} of '{self.symbol}' in '{self.library}' "
+                f"has no pad in '{self.footprint}'")
+
+
+def check_pin_references(code, libraries=None):
+    """Return list of UnknownPin of the pin references of program code that match no pin. Parts of
+    libraries that are not found, e.g. stock KiCad libraries on hosts without KiCad, are not checked"""
+    libraries = symbol_libraries if libraries is None else libraries
+    events = _part_assignments(code) + _pin_subscripts(code)
+    events.sort(key=lambda event: event[0])
+
+    parts = {}
+    problems = []
+    for position, variable, library, name, pin_ids_text in events:
+        if pin_ids_text is None:
+            try:
+                parts[variable] = (library, name, _pin_ids(libraries.symbol(library, name)))
+            except SymbolNotFoundError:
+                if _library_exists(libraries, library):
+                    problems.append(UnknownPin(code.count('\n', 0, position) + 1, variable, library, name, None))
+                parts[variable] = None
+            continue
+        part = parts.get(variable)
+        if part is None:
+            continue
+        library, name, pin_ids = part
+        for pin_match in PIN_ID.finditer(pin_ids_text):
+            pin = next(group for group in pin_match.groups() if group is not None)
+            if pin not in pin_ids:
+                problems.append(UnknownPin(code.count('\n', 0, position) + 1, variable, library, name, pin))
+    return problems
+
+
+def validate_pin_references(code, libraries=None, footprints=None):
+    """Raise PinReferenceError if pin references of program code match no pin, or if pins of its
+    parts have no pad in their footprint"""
+    problems = check_pin_references(code, libraries) + check_footprint_pads(code, libraries, footprints)
+    if problems:
+        raise PinReferenceError(problems)
+
+
+def check_footprint_pads(code, libraries=None, footprints=None, memo=None):
+    """Return list of MissingPad of the parts of program code with a literal footprint. Symbols and
+    footprints that are not found are not checked. Pass the same memo dict to check many programs"""
+    libraries = symbol_libraries if libraries is None else libraries
+    footprints = footprint_index if footprints is None else footprints
+    memo = {} if memo is None else memo
+    problems = []
+    for position, library, name, footprint in _part_footprints(code):
+        key = (library, name, footprint)
+        missing = memo.get(key)
+        if missing is None:
+            missing = memo[key] = _missing_pads(libraries, footprints, library, name, footprint)
+        if missing:
+            line = code.count('\n', 0, position) + 1
+            problems.extend(MissingPad(line, library, name, footprint, pin) for pin in missing)
+    return problems
+
+
+def check_many_footprint_pads(codes, libraries=None, footprints=None):
+    """Return list of (index, MissingPad) of the problems of iterable of program codes"""
+    memo = {}
+    return [(index, problem) for index, code in enumerate(codes)
+            for problem in check_footprint_pads(code, libraries, footprints, memo)]
+
+
+def _part_footprints(code):
+    """Return (position, library, symbol, footprint) of Part() calls with a literal footprint"""
+    parts = []
+    position = code.find('Part(')
+    while position >= 0:
+        arguments = PART_ARGUMENTS.match(code, position + 5)
+        if arguments and (position < 1 or not _is_name(code[position - 1])):
+            end = code.find('\n', arguments.end())
+            footprint = FOOTPRINT_ARGUMENT.search(code, arguments.end(), len(code) if end < 0 else end)
+            if footprint and not footprint.group(1) and ':' in footprint.group(3) and '{' not in footprint.group(3):
+                parts.append((position, arguments.group(2), arguments.group(4), footprint.group(3)))
+        position = code.find('Part(', position + 5)
+    return parts
+
+
+def _missing_pads(libraries, footprints, library, name, footprint):
+    """Return tuple of pin numbers of symbol without a pad in footprint; empty if either is not found"""
+    try:
+        pins = libraries.symbol(library, name).pins
+        pads = footprints.footprint(footprint).pad_numbers
+    except (SymbolNotFoundError, FootprintNotFoundError):
+        return ()
+    missing = []
+    for number, _, pin_type in pins:
+        if number and pin_type != 'no_connect' and number not in pads and number not in missing:
+            missing.append(number)
+    return tuple(missing)
+
+
+def _part_assignments(code):
+    """Return (position, variable, library, symbol, None) of Part() calls assigned to a variable"""
+    assignments = []
+    position = code.find('Part(')
+    while position >= 0:
+        variable = ASSIGNED_VARIABLE.search(code, code.rfind('\n', 0, position) + 1, position)
+        arguments = PART_ARGUMENTS.match(code, position + 5)
+        if variable and arguments and (position < 1 or not _is_name(code[position - 1])):
+            assignments.append((position, variable.group(1), arguments.group(2), arguments.group(4), None))
+        position = code.find('Part(', position + 5)
+    return assignments
+
+
+def _pin_subscripts(code):
+    """Return (position, variable, None, None, pin ids) of subscripts of variables with literal ids"""
+    subscripts = []
+    for pin_ids in PIN_IDS.finditer(code):
+        position = pin_ids.start()
+        before = code[max(0, position - MAX_NAME_LENGTH):position]
+        variable = before[len(before.rstrip(NAME_CHARACTERS)):]
+        if variable and not variable[0].isdigit():
+            subscripts.append((position - len(variable), variable, None, None, pin_ids.group(1)))
+    return subscripts
+
+
+def _is_name(character):
+    return character.isalnum() or character == '_'
+
+
+def _pin_ids(symbol):
+    return frozenset(pin_id for number, name, _ in symbol.pins for pin_id in (number, name))
+
+
+def _library_exists(libraries, library):
+    try:
+        libraries.library(library)
+    except SymbolNotFoundError:
+        return False
+    return True
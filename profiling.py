@@ -0,0 +1,160 @@
+# MIT license
+#
+# Skimibowi - SKiDL Microcontroller Board Wizard
+# Copyright (C) 2019  Jussi Vestman
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Per-fragment profiling of generation. While a Profiler is active, generate() renders every
+fragment and helper function through it, recording wall time, call count, bytes of code emitted
+and tracemalloc allocation. When no profiler is active generate() checks a single global and
+renders exactly as before, so the hooks cost nothing when disabled"""
+
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+profiler = None
+
+
+def reset_peak():
+    """Reset the tracemalloc peak to the current traced size. Python 3.8 has no
+    tracemalloc.reset_peak(), so there tracing is restarted, which also forgets earlier allocations"""
+    if hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+    else:
+        frames = tracemalloc.get_traceback_limit()
+        tracemalloc.stop()
+        tracemalloc.start(frames)
+
+
+class Stats:
+    """Accumulated measurements of one fragment or helper function"""
+
+    __slots__ = ('name', 'category', 'calls', 'seconds', 'bytes', 'allocated', 'peak')
+
+    def __init__(self, name, category):
+        self.name = name
+        self.category = category
+        self.calls = 0
+        self.seconds = 0.0
+        self.bytes = 0
+        self.allocated = 0
+        self.peak = 0
+
+    def as_dict(self):
+        """Return measurements as dict"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class Profiler:
+    """Collects timing and allocation of the calls made through call(). Used as a context manager
+    it is the active profiler generate() reports to. memory=False skips tracemalloc, whose tracing
+    slows the measured code down"""
+
+    def __init__(self, memory=True):
+        self.memory = memory
+        self.stats = {}
+        self.events = []
+        self._lock = threading.Lock()
+        self._previous = None
+        self._started_tracing = False
+        self._origin = time.perf_counter_ns()
+
+    def __enter__(self):
+        global profiler
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._previous, profiler = profiler, self
+        return self
+
+    def __exit__(self, *exc_info):
+        global profiler
+        profiler = self._previous
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def call(self, name, category, function, *args):
+        """Return function(*args), recording its measurements under name"""
+        memory = self.memory and tracemalloc.is_tracing()
+        if memory:
+            reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter_ns()
+        result = function(*args)
+        end = time.perf_counter_ns()
+        allocated = peak = 0
+        if memory:
+            current, peak = tracemalloc.get_traced_memory()
+            allocated, peak = current - before, peak - before
+        emitted = len(result.encode('utf-8')) if isinstance(result, str) else 0
+
+        with self._lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = self.stats[name] = Stats(name, category)
+            stats.calls += 1
+            stats.seconds += (end - start) / 1e9
+            stats.bytes += emitted
+            stats.allocated += allocated
+            stats.peak = max(stats.peak, peak)
+            self.events.append((name, category, start, end, threading.get_ident(), emitted, allocated))
+        return result
+
+    def sorted_stats(self):
+        """Return stats, the slowest first"""
+        return sorted(self.stats.values(), key=lambda stats: stats.seconds, reverse=True)
+
+    def format_table(self):
+        """Return measurements as text table"""
+        lines = [f"{'name':34} {'category':11} {'calls':>6} {'total ms':>9} {'mean us':>9} {'bytes':>8} "
+                 f"{'alloc KiB':>9} {'peak KiB':>9}"]
+        for stats in self.sorted_stats():
+            lines.append(f"{stats.name:34} {stats.category:11} {stats.calls:6d} {stats.seconds * 1e3:9.3f} "
+                         f"{stats.seconds * 1e6 / stats.calls:9.1f} {stats.bytes:8d} "
+                         f"{stats.allocated / 1024:9.1f} {stats.peak / 1024:9.1f}")
+        return "\n".join(lines)
+
+    def to_json(self):
+        """Return measurements as JSON"""
+        return json.dumps([stats.as_dict() for stats in self.sorted_stats()], indent=2)
+
+    def chrome_trace(self):
+        """Return calls in Chrome trace event format, for chrome://tracing or Perfetto"""
+        pid = os.getpid()
+        events = [{'name': name, 'cat': category, 'ph': 'X', 'pid': pid, 'tid': tid,
+                   'ts': (start - self._origin) / 1000, 'dur': (end - start) / 1000,
+                   'args': {'bytes': emitted, 'allocated': allocated}}
+                  for name, category, start, end, tid, emitted, allocated in self.events]
+        return json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'})
+
+    def report(self, output_format='table'):
+        """Return measurements in output format table, json or trace"""
+        if output_format == 'json':
+            return self.to_json()
+        if output_format == 'trace':
+            return self.chrome_trace()
+        return self.format_table()
+
+
+REPORT_FORMATS = ('table', 'json', 'trace')
@@ -0,0 +1,347 @@
+# MIT license
+#
+# Skimibowi - SKiDL Microcontroller Board Wizard
+# Copyright (C) 2019  Jussi Vestman
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Interpreter of generated SKiDL programs
+
+Circuits are built from the programs the fragment generators produce without compiling or
+executing them as Python. A program is parsed to its syntax tree, and the tree is evaluated node
+by node: only the statements and expressions generated programs are made of are supported, names
+resolve to the program's own definitions, the modules it may import and a few builtins, and only
+the attributes generated programs read can be read. Anything else raises ProgramError, so settings
+that reach a generated program can not make it do more than build a circuit."""
+
+import ast
+import operator
+
+# Attributes of the SKiDL stand-ins, itertools and strings that generated programs read
+PROGRAM_ATTRIBUTES = frozenset(['F2', 'chain', 'fetch', 'from_iterable', 'get_pins', 'name', 'split'])
+
+_OPERATORS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.BitAnd: operator.and_, ast.BitOr: operator.or_}
+
+_INPLACE_OPERATORS = {ast.Add: operator.iadd, ast.Sub: operator.isub, ast.BitAnd: operator.iand,
+                      ast.BitOr: operator.ior}
+
+_UNARY_OPERATORS = {ast.Not: operator.not_, ast.USub: operator.neg}
+
+_COMPARISONS = {ast.Eq: operator.eq, ast.NotEq: operator.ne, ast.In: lambda a, b: a in b,
+                ast.NotIn: lambda a, b: a not in b, ast.Is: operator.is_, ast.IsNot: operator.is_not}
+
+_CONVERSIONS = {-1: lambda value: value, ord('s'): str, ord('r'): repr, ord('a'): ascii}
+
+
+class ProgramError(ValueError):
+    """Generated program uses something circuits are not built with"""
+
+
+def run_program(code, modules, builtins, source='<skimibowi>'):
+    """Interpret program code with the modules it may import and builtins it may call, both dicts
+    of name to object. Returns dict of the global names the program defined"""
+    program = Program(modules, builtins, source)
+    program.execute(ast.parse(code, source).body, program.globals)
+    return program.globals.names
+
+
+class Scope:
+    """Names of the module or of a function call, and the names the function declared global"""
+
+    __slots__ = ('names', 'parent', 'global_names')
+
+    def __init__(self, parent=None):
+        self.names = {}
+        self.parent = parent
+        self.global_names = set()
+
+
+class Function:
+    """Function defined by a program, called by interpreting its body in a new scope"""
+
+    def __init__(self, program, node, scope, defaults):
+        self.__name__ = node.name
+        self.__doc__ = ast.get_docstring(node)
+        self.program = program
+        self.node = node
+        self.scope = scope
+        self.parameters = [argument.arg for argument in node.args.args]
+        self.defaults = dict(zip(self.parameters[len(self.parameters) - len(defaults):], defaults))
+
+    def __call__(self, *args, **kwargs):
+        if len(args) > len(self.parameters):
+            raise TypeError(f"{self.__name__}() takes {len(self.parameters)} arguments but {len(args)} were given")
+        scope = Scope(self.scope)
+        scope.names.update(zip(self.parameters, args))
+        for name, value in kwargs.items():
+            if name not in self.parameters or name in scope.names:
+                raise TypeError(f"{self.__name__}() got an unexpected or repeated argument {name!r}")
+            scope.names[name] = value
+        for name in self.parameters:
+            if name not in scope.names:
+                if name not in self.defaults:
+                    raise TypeError(f"{self.__name__}() missing argument {name!r}")
+                scope.names[name] = self.defaults[name]
+        try:
+            self.program.execute(self.node.body, scope)
+        except _Returned as returned:
+            return returned.value
+        return None
+
+    def __repr__(self):
+        return f"<function {self.__name__}>"
+
+
+class _Returned(Exception):
+    """Return statement unwinding to the call of its function"""
+
+    def __init__(self, value):
+        super().__init__()
+        self.value = value
+
+
+class Program:
+    """Evaluator of the statements and expressions of a program. Nodes are evaluated by the method
+    named after their type"""
+
+    # pylint: disable=invalid-name,unused-argument
+
+    def __init__(self, modules, builtins, source='<skimibowi>'):
+        self.modules = modules
+        self.builtins = builtins
+        self.source = source
+        self.globals = Scope()
+
+    def unsupported(self, node, what=None):
+        """Return ProgramError of node that generated programs do not use"""
+        what = what or f"{type(node).__name__} {'statement' if isinstance(node, ast.stmt) else 'expression'}"
+        line = getattr(node, 'lineno', '?')
+        return ProgramError(f"{self.source}:{line}: {what} is not allowed in generated programs")
+
+    def execute(self, statements, scope):
+        """Execute statements in scope"""
+        for statement in statements:
+            method = getattr(self, '_' + type(statement).__name__, None)
+            if method is None:
+                raise self.unsupported(statement)
+            method(statement, scope)
+
+    def evaluate(self, node, scope):
+        """Return value of expression node in scope"""
+        method = getattr(self, '_' + type(node).__name__, None)
+        if method is None:
+            raise self.unsupported(node)
+        return method(node, scope)
+
+    def lookup(self, name, scope):
+        """Return value of name in scope, its enclosing scopes, globals or builtins"""
+        if name in scope.global_names:
+            scope = self.globals
+        while scope is not None:
+            if name in scope.names:
+                return scope.names[name]
+            scope = scope.parent
+        if name in self.builtins:
+            return self.builtins[name]
+        raise NameError(f"name {name!r} is not defined")
+
+    def store(self, name, value, scope):
+        """Bind name in scope, or in globals if the scope declared it global"""
+        (self.globals if name in scope.global_names else scope).names[name] = value
+
+    def assign(self, target, value, scope):
+        """Assign value to target name, subscript or tuple of targets"""
+        if isinstance(target, ast.Name):
+            self.store(target.id, value, scope)
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            values = list(value)
+            if len(values) != len(target.elts):
+                raise ValueError(f"Expected {len(target.elts)} values to unpack, got {len(values)}")
+            for element, element_value in zip(target.elts, values):
+                self.assign(element, element_value, scope)
+        elif isinstance(target, ast.Subscript):
+            self.evaluate(target.value, scope)[self.evaluate(target.slice, scope)] = value
+        else:
+            raise self.unsupported(target, f"Assignment to {type(target).__name__}")
+
+    def import_module(self, name, node):
+        """Return module name that programs may import"""
+        if name not in self.modules or getattr(node, 'level', 0):
+            raise ImportError(f"Generated programs can not import {name}")
+        return self.modules[name]
+
+    # Statements
+
+    def _Import(self, node, scope):
+        for alias in node.names:
+            self.store(alias.asname or alias.name, self.import_module(alias.name, node), scope)
+
+    def _ImportFrom(self, node, scope):
+        module = self.import_module(node.module, node)
+        for alias in node.names:
+            if alias.name.startswith('_') or alias.name == '*' or not hasattr(module, alias.name):
+                raise ImportError(f"Generated programs can not import {alias.name} from {node.module}")
+            self.store(alias.asname or alias.name, getattr(module, alias.name), scope)
+
+    def _FunctionDef(self, node, scope):
+        arguments = node.args
+        if arguments.vararg or arguments.kwarg or arguments.kwonlyargs or getattr(arguments, 'posonlyargs', None):
+            raise self.unsupported(node, "Variable or keyword-only arguments")
+        decorators = [self.evaluate(decorator, scope) for decorator in node.decorator_list]
+        function = Function(self, node, scope, [self.evaluate(default, scope) for default in arguments.defaults])
+        for decorator in reversed(decorators):
+            function = decorator(function)
+        self.store(node.name, function, scope)
+
+    def _Return(self, node, scope):
+        raise _Returned(None if node.value is None else self.evaluate(node.value, scope))
+
+    def _Global(self, node, scope):
+        if scope is not self.globals:
+            scope.global_names.update(node.names)
+
+    def _Assign(self, node, scope):
+        value = self.evaluate(node.value, scope)
+        for target in node.targets:
+            self.assign(target, value, scope)
+
+    def _AugAssign(self, node, scope):
+        operation = _INPLACE_OPERATORS.get(type(node.op))
+        if operation is None:
+            raise self.unsupported(node, f"{type(node.op).__name__} operator")
+        target = node.target
+        if isinstance(target, ast.Name):
+            self.store(target.id, operation(self.lookup(target.id, scope), self.evaluate(node.value, scope)), scope)
+        elif isinstance(target, ast.Subscript):
+            container = self.evaluate(target.value, scope)
+            key = self.evaluate(target.slice, scope)
+            container[key] = operation(container[key], self.evaluate(node.value, scope))
+        else:
+            raise self.unsupported(target, f"Assignment to {type(target).__name__}")
+
+    def _Expr(self, node, scope):
+        self.evaluate(node.value, scope)
+
+    def _If(self, node, scope):
+        self.execute(node.body if self.evaluate(node.test, scope) else node.orelse, scope)
+
+    def _For(self, node, scope):
+        for value in self.evaluate(node.iter, scope):
+            self.assign(node.target, value, scope)
+            self.execute(node.body, scope)
+        self.execute(node.orelse, scope)
+
+    def _Pass(self, node, scope):
+        pass
+
+    # Expressions
+
+    def _Constant(self, node, scope):
+        return node.value
+
+    def _Name(self, node, scope):
+        return self.lookup(node.id, scope)
+
+    def _Attribute(self, node, scope):
+        if node.attr not in PROGRAM_ATTRIBUTES:
+            raise self.unsupported(node, f"Attribute {node.attr}")
+        return getattr(self.evaluate(node.value, scope), node.attr)
+
+    def _Call(self, node, scope):
+        function = self.evaluate(node.func, scope)
+        args = [self.evaluate(argument, scope) for argument in node.args]
+        kwargs = {}
+        for keyword in node.keywords:
+            if keyword.arg is None:
+                raise self.unsupported(node, "Unpacking keyword arguments")
+            kwargs[keyword.arg] = self.evaluate(keyword.value, scope)
+        return function(*args, **kwargs)
+
+    def _BinOp(self, node, scope):
+        operation = _OPERATORS.get(type(node.op))
+        if operation is None:
+            raise self.unsupported(node, f"{type(node.op).__name__} operator")
+        return operation(self.evaluate(node.left, scope), self.evaluate(node.right, scope))
+
+    def _BoolOp(self, node, scope):
+        is_or = isinstance(node.op, ast.Or)
+        for value_node in node.values:
+            value = self.evaluate(value_node, scope)
+            if bool(value) == is_or:
+                return value
+        return value
+
+    def _UnaryOp(self, node, scope):
+        operation = _UNARY_OPERATORS.get(type(node.op))
+        if operation is None:
+            raise self.unsupported(node, f"{type(node.op).__name__} operator")
+        return operation(self.evaluate(node.operand, scope))
+
+    def _Compare(self, node, scope):
+        left = self.evaluate(node.left, scope)
+        for op, comparator in zip(node.ops, node.comparators):
+            comparison = _COMPARISONS.get(type(op))
+            if comparison is None:
+                raise self.unsupported(node, f"{type(op).__name__} comparison")
+            right = self.evaluate(comparator, scope)
+            if not comparison(left, right):
+                return False
+            left = right
+        return True
+
+    def _JoinedStr(self, node, scope):
+        return ''.join(str(self.evaluate(value, scope)) for value in node.values)
+
+    def _FormattedValue(self, node, scope):
+        value = _CONVERSIONS[node.conversion](self.evaluate(node.value, scope))
+        return format(value, '' if node.format_spec is None else self.evaluate(node.format_spec, scope))
+
+    def _Subscript(self, node, scope):
+        return self.evaluate(node.value, scope)[self.evaluate(node.slice, scope)]
+
+    def _Index(self, node, scope):
+        # Subscripts of Python 3.8 syntax trees
+        return self.evaluate(node.value, scope)
+
+    def _Slice(self, node, scope):
+        return slice(*(None if part is None else self.evaluate(part, scope)
+                       for part in (node.lower, node.upper, node.step)))
+
+    def _Tuple(self, node, scope):
+        return tuple(self.evaluate(element, scope) for element in node.elts)
+
+    def _List(self, node, scope):
+        return [self.evaluate(element, scope) for element in node.elts]
+
+    def _ListComp(self, node, scope):
+        values = []
+        self._comprehend(node, node.generators, Scope(scope), values)
+        return values
+
+    def _comprehend(self, node, generators, scope, values):
+        generator = generators[0]
+        if generator.is_async:
+            raise self.unsupported(node, "Asynchronous comprehension")
+        for value in self.evaluate(generator.iter, scope):
+            self.assign(generator.target, value, scope)
+            if all(self.evaluate(condition, scope) for condition in generator.ifs):
+                if len(generators) > 1:
+                    self._comprehend(node, generators[1:], scope, values)
+                else:
+                    values.append(self.evaluate(node.elt, scope))
@@ -0,0 +1,189 @@
+# MIT license
+#
+# Skimibowi - SKiDL Microcontroller Board Wizard
+# Copyright (C) 2019  Jussi Vestman
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Registry of fragment generators and the execution plans generate() builds from it
+
+Every fragment declares a trigger predicate, the settings keys the predicate reads, its position
+in the generated program and the fragments it depends on. A plan, the ordered tuple of fragments
+generated for a configuration, is computed once per distinct projection of settings to trigger keys.
+Third-party fragments are discovered from the 'skimibowi.fragments' entry point group."""
+
+import threading
+from collections import OrderedDict
+
+from generator_functions import generate_subcircuit
+
+ENTRY_POINT_GROUP = 'skimibowi.fragments'
+PLAN_CACHE_SIZE = 1024
+
+fragments = {}
+
+_plans = OrderedDict()
+_trigger_keys = ()
+_trigger_flags = ()
+_plan_keys = frozenset()
+_ordered = None
+_lock = threading.RLock()
+_SCALARS = frozenset([str, bool, int, float, type(None)])
+_discovered = False
+
+
+class Fragment:
+    """Fragment generator registered to the generation engine"""
+
+    __slots__ = ('name', 'function', 'when', 'keys', 'flags', 'order', 'requires', 'subcircuit', 'depends')
+
+    def __init__(self, name, function, when, keys, order, requires=(), subcircuit=False, depends=None, flags=()):
+        self.name = name
+        self.function = function
+        self.when = when
+        self.keys = tuple(keys)
+        self.flags = tuple(flags)
+        self.order = order
+        self.requires = tuple(requires)
+        self.subcircuit = subcircuit
+        self.depends = None if depends is None else tuple(depends)
+
+    def __repr__(self):
+        return f"Fragment({self.name!r}, order={self.order})"
+
+    def render(self, args, context):
+        """Generate code of the fragment"""
+        if self.subcircuit:
+            return generate_subcircuit(self.function, args, context)
+        return self.function(args, context)
+
+
+def register_fragment(name, function, when, keys, order=None, requires=(), subcircuit=False, depends=None, flags=()):
+    """Register fragment generator function(args, context) that is generated when predicate
+    when(args) is true and all fragments named in requires are generated too. keys lists the
+    settings keys when() reads and flags the keys of which when() only tests truthiness.
+    Fragments are generated in ascending order; by default a fragment is placed after all
+    fragments registered before it. depends optionally lists every settings
+    key the generated code depends on, otherwise the keys are discovered when it is rendered"""
+    with _lock:
+        if name in fragments:
+            raise ValueError(f"Fragment '{name}' is already registered")
+        if order is None:
+            order = max((fragment.order for fragment in fragments.values()), default=0) + 10
+        fragments[name] = Fragment(name, function, when, keys, order, requires, subcircuit, depends, flags)
+        _invalidate()
+    return fragments[name]
+
+
+def unregister_fragment(name):
+    """Remove fragment from registry"""
+    with _lock:
+        del fragments[name]
+        _invalidate()
+
+
+def fragment(name, when, keys, **kwargs):
+    """Decorator that registers function as fragment generator, see register_fragment"""
+    def decorator(function):
+        register_fragment(name, function, when, keys, **kwargs)
+        return function
+    return decorator
+
+
+def discover_fragments():
+    """Load third-party fragment modules from entry points. Importing the module is expected to
+    register its fragments; an entry point referring to a callable is called without arguments"""
+    global _discovered
+    with _lock:
+        if _discovered:
+            return
+        _discovered = True
+        from importlib.metadata import entry_points  # pylint: disable=import-outside-toplevel
+        try:
+            found = entry_points(group=ENTRY_POINT_GROUP)
+        except TypeError:
+            found = entry_points().get(ENTRY_POINT_GROUP, [])
+        for entry_point in found:
+            loaded = entry_point.load()
+            if callable(loaded):
+                loaded()
+
+
+def plan_keys():
+    """Return frozenset of the settings keys that select fragments. Settings differing only in
+    other keys have the same plan. A new set is returned whenever fragments are registered"""
+    discover_fragments()
+    return _plan_keys
+
+
+def plan(settings):
+    """Return tuple of fragments that are generated for settings, in the order they are generated"""
+    discover_fragments()
+    with _lock:
+        key = tuple([freeze_value(settings.get(trigger_key)) for trigger_key in _trigger_keys] +
+                    [not settings.get(flag) for flag in _trigger_flags])
+        cached = _plans.get(key)
+        if cached is not None:
+            _plans.move_to_end(key)
+            return cached
+        cached = _build_plan(settings)
+        _plans[key] = cached
+        if len(_plans) > PLAN_CACHE_SIZE:
+            _plans.popitem(last=False)
+        return cached
+
+
+def _build_plan(settings):
+    global _ordered
+    if _ordered is None:
+        _ordered = tuple(sorted(fragments.values(), key=lambda fragment: fragment.order))
+        for candidate in _ordered:
+            for requirement in candidate.requires:
+                if requirement not in fragments:
+                    raise ValueError(f"Fragment '{candidate.name}' requires unknown fragment '{requirement}'")
+                if fragments[requirement].order >= candidate.order:
+                    raise ValueError(f"Fragment '{candidate.name}' must be ordered after '{requirement}'")
+    selected = {}
+    for candidate in _ordered:
+        if candidate.requires and not all(requirement in selected for requirement in candidate.requires):
+            continue
+        if candidate.when(settings):
+            selected[candidate.name] = candidate
+    return tuple(selected.values())
+
+
+def _invalidate():
+    global _trigger_keys, _trigger_flags, _plan_keys, _ordered
+    _plans.clear()
+    _ordered = None
+    _trigger_keys = tuple(sorted({key for fragment in fragments.values() for key in fragment.keys}))
+    flags = {flag for fragment in fragments.values() for flag in fragment.flags}
+    _trigger_flags = tuple(sorted(flags.difference(_trigger_keys)))
+    _plan_keys = frozenset(_trigger_keys + _trigger_flags)
+
+
+def freeze_value(value):
+    """Hashable representation of a settings value"""
+    if value.__class__ in _SCALARS:
+        return value
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze_value(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze_value(item) for item in value)
+    return value
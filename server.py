@@ -0,0 +1,264 @@
+# MIT license
+#
+# Skimibowi - SKiDL Microcontroller Board Wizard
+# Copyright (C) 2019  Jussi Vestman
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Local generation server that keeps the generator loaded between requests, e.g.
+
+    python skimibowi_gen.py serve --port 8765
+    python skimibowi_gen.py serve --socket /tmp/skimibowi.sock
+
+Settings are posted as JSON or YAML to /generate and the response is the generated SKiDL
+program, or with ?format=netlist or ?format=bom the netlist or bill of materials. With
+?check_pins=1 pin references are checked first. Requests are handled in threads, so slow clients
+do not hold up others, and the fragment cache is shared by every request. GET /health answers
+'ok' once the server is ready. See client.py for the command line client
+
+Settings are checked against the settings schema before anything is generated. Only requests
+naming the server's own host, without an Origin header, are answered, so web pages can not post
+to the server from a browser; with --token (or SKIMIBOWI_SERVER_TOKEN) every request must also
+carry 'Authorization: Bearer <token>'"""
+
+import argparse
+import hmac
+import json
+import os
+import socketserver
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from yaml import YAMLError
+
+from build import FORMATS, render_settings
+from pin_check import PinReferenceError, validate_pin_references
+from controller import upgrade_settings
+from settings_cache import parse_settings
+from settings_schema import validate_settings
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+MAX_SETTINGS_SIZE = 1 << 20
+
+JSON_TYPES = ('application/json', 'text/json')
+YAML_TYPES = ('application/yaml', 'application/x-yaml', 'text/yaml', 'text/x-yaml')
+LOCAL_HOSTS = ('localhost', '127.0.0.1', '::1')
+TOKEN_VARIABLE = 'SKIMIBOWI_SERVER_TOKEN'
+
+
+class RequestError(ValueError):
+    """Request that can not be answered with generated code, with its HTTP status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_request_settings(body, content_type=''):
+    """Return settings dict of request body, which content type says is JSON or YAML"""
+    media_type = content_type.split(';')[0].strip().lower()
+    if media_type not in JSON_TYPES + YAML_TYPES:
+        raise RequestError(415, f"Settings must be posted as {', '.join(JSON_TYPES + YAML_TYPES)}")
+    try:
+        if media_type in JSON_TYPES:
+            settings = json.loads(body)
+        else:
+            settings = parse_settings(body)
+    except (ValueError, YAMLError) as error:
+        raise RequestError(400, f"Invalid settings: {error}") from None
+    if settings is None:
+        return {}
+    if not isinstance(settings, dict):
+        raise RequestError(400, "Settings must be a mapping")
+    return upgrade_settings(settings)
+
+
+def render_request(settings, output_format='skidl', check_pins=False):
+    """Return output of request as text. Settings with schema errors are rejected"""
+    if output_format not in FORMATS:
+        raise RequestError(400, f"Unknown format '{output_format}', expected one of {', '.join(FORMATS)}")
+    errors = validate_settings(settings)
+    if errors:
+        raise RequestError(422, "Invalid settings\n" + "\n".join(f"  {error}" for error in errors))
+    try:
+        text = "".join(render_settings(settings, output_format, 'settings'))
+        if check_pins and output_format == 'skidl':
+            validate_pin_references(text)
+    except PinReferenceError as error:
+        raise RequestError(422, f"Unknown pins\n{error}") from None
+    except (KeyError, TypeError, ValueError, LookupError) as error:
+        raise RequestError(422, f"Generation failed: {error!r}") from None
+    return text
+
+
+class GenerationHandler(BaseHTTPRequestHandler):
+    """Handler of generation requests"""
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'Skimibowi'
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Answer health checks"""
+        if not self._authorized():
+            return
+        if urlsplit(self.path).path == '/health':
+            self._respond(200, 'ok\n')
+        else:
+            self._respond(404, 'Not found\n')
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Generate output of posted settings"""
+        if not self._authorized():
+            return
+        url = urlsplit(self.path)
+        if url.path != '/generate':
+            self._respond(404, 'Not found\n')
+            return
+        query = parse_qs(url.query)
+        try:
+            length = int(self.headers.get('Content-Length', ''))
+        except ValueError:
+            self.close_connection = True
+            self._respond(411, 'Content-Length required\n')
+            return
+        if not 0 <= length <= MAX_SETTINGS_SIZE:
+            self.close_connection = True
+            self._respond(413, 'Settings too large\n')
+            return
+        body = self.rfile.read(length)
+        output_format = query.get('format', ['skidl'])[-1]
+        try:
+            settings = parse_request_settings(body, self.headers.get('Content-Type', ''))
+            text = render_request(settings, output_format, query.get('check_pins', ['0'])[-1] not in ('', '0', 'false'))
+        except RequestError as error:
+            self._respond(error.status, f"{error}\n")
+            return
+        except Exception as error:  # pylint: disable=broad-except
+            self.log_error("Generation failed: %r", error)
+            self._respond(500, f"Generation failed: {error!r}\n")
+            return
+        self._respond(200, text, 'text/x-python' if output_format == 'skidl' else 'text/plain')
+
+    def _authorized(self):
+        """Return True if request may be answered, otherwise answer it with an error status"""
+        host = self.headers.get('Host', '')
+        host = host[1:].partition(']')[0] if host.startswith('[') else host.rpartition(':')[0] or host
+        if host.lower() not in self.server.allowed_hosts:
+            status, message = 403, 'Unknown host'
+        elif 'Origin' in self.headers:
+            status, message = 403, 'Requests from web pages are not answered'
+        elif self.server.token and not hmac.compare_digest(
+                self.headers.get('Authorization', '').encode('utf-8'), f"Bearer {self.server.token}".encode('utf-8')):
+            status, message = 401, 'Token required'
+        else:
+            return True
+        self.close_connection = True
+        self._respond(status, f"{message}\n")
+        return False
+
+    def _respond(self, status, text, content_type='text/plain'):
+        data = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self):
+        """Return client address for the log, also for Unix socket clients that have none"""
+        if isinstance(self.client_address, tuple) and self.client_address:
+            return str(self.client_address[0])
+        return 'local'
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        if not getattr(self.server, 'quiet', False):
+            super().log_message(format, *args)
+
+
+class GenerationServer(ThreadingHTTPServer):
+    """Generation server on a TCP port"""
+
+    daemon_threads = True
+    quiet = False
+    token = None
+    allowed_hosts = LOCAL_HOSTS
+
+
+class UnixGenerationServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Generation server on a Unix socket. A socket file left behind by a stopped server is
+    replaced, and the socket file is removed when the server is closed"""
+
+    daemon_threads = True
+    quiet = False
+    token = None
+    allowed_hosts = LOCAL_HOSTS
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        super().server_bind()
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.remove(self.server_address)
+        except OSError:
+            pass
+
+
+def make_server(host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None, quiet=False, token=None):
+    """Return generation server listening on Unix socket_path, or on host and port. Requests
+    must name a local host or host, and carry token when one is given"""
+    if socket_path:
+        server = UnixGenerationServer(socket_path, GenerationHandler)
+    else:
+        server = GenerationServer((host, port), GenerationHandler)
+        server.allowed_hosts = tuple({*LOCAL_HOSTS, host.strip('[]').lower()})
+    server.quiet = quiet
+    server.token = token or None
+    render_request({})
+    return server
+
+
+def serve_main(argv):
+    """Run generation server until interrupted and return exit code"""
+    parser = argparse.ArgumentParser(prog='skimibowi serve',
+                                     description='Serve SKiDL generation over local HTTP, keeping the generator loaded')
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f'Address to listen on (default: {DEFAULT_HOST})')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'Port to listen on (default: {DEFAULT_PORT})')
+    parser.add_argument('--socket', metavar='PATH', help='Listen on Unix socket PATH instead of a port')
+    parser.add_argument('--quiet', action='store_true', help='Do not log requests')
+    parser.add_argument('--token', default=os.environ.get(TOKEN_VARIABLE),
+                        help=f'Require "Authorization: Bearer TOKEN" in every request (default: ${TOKEN_VARIABLE})')
+    args = parser.parse_args(argv)
+
+    try:
+        server = make_server(args.host, args.port, args.socket, args.quiet, args.token)
+    except OSError as error:
+        parser.error(str(error))
+    address = args.socket or f"http://{args.host}:{server.server_address[1]}"
+    print(f"Skimibowi generation server listening on {address}", file=sys.stderr, flush=True)
+    with server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    return 0
@@ -0,0 +1,129 @@
+# MIT license
+#
+# Skimibowi - SKiDL Microcontroller Board Wizard
+# Copyright (C) 2019  Jussi Vestman
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Fast loading of settings files. Settings are parsed with the libyaml safe loader when PyYAML
+is built with it, and parsed settings are kept in an on-disk cache in marshal format keyed by the
+settings file path, modification time and content hash, so loading thousands of settings files
+that have not changed is dominated by reading them"""
+
+import hashlib
+import marshal
+import os
+import threading
+
+import yaml
+
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader, SafeDumper
+
+CACHE_FORMAT = 1
+
+
+def default_cache_dir(kind='settings'):
+    """Return cache directory for kind of cached data under $SKIMIBOWI_CACHE_DIR, or under
+    skimibowi in the user cache directory. An empty $SKIMIBOWI_CACHE_DIR disables caching"""
+    if 'SKIMIBOWI_CACHE_DIR' in os.environ:
+        root = os.environ['SKIMIBOWI_CACHE_DIR']
+        return os.path.join(root, kind) if root else ''
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'skimibowi', kind)
+
+
+def write_cache_entry(entry_filename, entry):
+    """Write marshalled cache entry atomically. Entries that marshal cannot represent and unwritable
+    cache directories are not cached"""
+    try:
+        data = marshal.dumps(entry)
+    except ValueError:
+        return
+    temporary = f"{entry_filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(entry_filename), exist_ok=True)
+        with open(temporary, 'wb') as entry_file:
+            entry_file.write(data)
+        os.replace(temporary, entry_filename)
+    except OSError:
+        try:
+            os.remove(temporary)
+        except OSError:
+            pass
+
+
+def read_cache_entry(entry_filename):
+    """Return unmarshalled cache entry, or None if it is missing or unreadable"""
+    try:
+        with open(entry_filename, 'rb') as entry_file:
+            return marshal.load(entry_file)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+
+def cache_entry_filename(cache_dir, filename):
+    """Return cache entry of file in cache directory"""
+    path = os.path.realpath(filename)
+    return os.path.join(cache_dir, hashlib.sha1(path.encode('utf-8')).hexdigest() + '.marshal')
+
+
+def parse_settings(text):
+    """Parse settings YAML with the safe loader"""
+    return yaml.load(text, Loader=SafeLoader)
+
+
+def dump_settings(settings):
+    """Serialize settings to YAML with the safe dumper"""
+    return yaml.dump(settings, Dumper=SafeDumper)
+
+
+class SettingsCache:
+    """On-disk cache of parsed settings files. An empty cache_dir disables the cache"""
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = default_cache_dir() if cache_dir is None else cache_dir
+
+    def entry_filename(self, settings_filename):
+        """Return cache file of settings file"""
+        return cache_entry_filename(self.cache_dir, settings_filename)
+
+    def load(self, settings_filename):
+        """Return settings parsed from settings file, from the cache if the file has not changed
+        since it was cached"""
+        with open(settings_filename, 'rb') as settings_file:
+            mtime = os.fstat(settings_file.fileno()).st_mtime_ns
+            content = settings_file.read()
+        if not self.cache_dir:
+            return parse_settings(content)
+
+        digest = hashlib.blake2b(content, digest_size=16).digest()
+        entry_filename = self.entry_filename(settings_filename)
+        entry = read_cache_entry(entry_filename)
+        if isinstance(entry, tuple) and len(entry) == 4 and entry[:3] == (CACHE_FORMAT, mtime, digest):
+            return entry[3]
+
+        settings = parse_settings(content)
+        write_cache_entry(entry_filename, (CACHE_FORMAT, mtime, digest, settings))
+        return settings
+
+
+settings_cache = SettingsCache()
@@ -0,0 +1,295 @@
+# MIT license
+#
+# Skimibowi - SKiDL Microcontroller Board Wizard
+# Copyright (C) 2019  Jussi Vestman
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Schema of settings files. The choices of the wizard fields come from the option tables of
+controller, and the footprint and part data fields are required when generate() reads them.
+The schema is compiled once into a validator function that reports every error of a settings
+document, so batch runs can reject bad settings files before generating anything"""
+
+from controller import (footprints, battery_footprints, regulators, resistor_footprints, usb_connector_footprints,
+                        fuse_footprints, onewire_connector_footprints, mcu_rails, battery_management_ics, usb_uarts,
+                        board_footprints, transistor_footprints, crystal_footprints, crystal_frequencies,
+                        legacy_mcus, load_settings_file)
+from generator import ESP_MODULES, ATMEGA328P_MCUS
+
+# Values of settings files saved by earlier versions of the wizard that generate() still accepts, or
+# that load_settings_file renames
+LEGACY_VALUES = {
+    'mcu': tuple(legacy_mcus),
+    'board_footprint': ('No board',),
+    'usb_uart': ('No USB UART',),
+    'crystal_frequency': ('16Mhz',),
+}
+
+ESP_UART_RESETS = ('FT231', 'FT232RL', 'CP2102N-A01-GQFN24', 'CP2104')
+
+
+def one_of(*tables):
+    """Field taking one of the keys of option tables"""
+    return ('one_of', frozenset(value for table in tables for value in table))
+
+
+def of_type(*types):
+    """Field taking a value of one of types"""
+    return ('type', types)
+
+
+def literal(optional=False):
+    """Field taking text that generated programs quote as is, such as a footprint name, which
+    therefore must not contain quotes, backslashes or line breaks. optional allows None"""
+    return ('literal', optional)
+
+
+def record(fields, optional=()):
+    """Field taking a mapping of the fields, name to type, with None or '' meaning no part.
+    Text fields are checked as literals"""
+    return ('record', (fields, frozenset(optional)))
+
+
+FLAG = of_type(bool)
+TEXT = of_type(str)
+LITERAL = literal()
+
+# Characters that would end or escape a quoted string of generated code
+UNQUOTED = frozenset('\'"\\\n\r')
+
+SCHEMA = {
+    'mcu': one_of(footprints, LEGACY_VALUES['mcu']),
+    'mcu_footprint': LITERAL,
+    'icsp': FLAG,
+    'mcurail': one_of(mcu_rails),
+    'powersource': one_of(battery_footprints),
+    'powersource_footprint': LITERAL,
+    'battery_management': one_of(battery_management_ics),
+    'fuse': one_of(fuse_footprints),
+    'fuse_footprint': literal(optional=True),
+    'switch': FLAG,
+    'reset': FLAG,
+    'Reset button': FLAG,
+    'Flash button': FLAG,
+    'led': FLAG,
+    'FTDI header': FLAG,
+    'usb_connector': one_of(usb_connector_footprints),
+    'ina219': FLAG,
+    'DS18B20': FLAG,
+    'DS18B20U': FLAG,
+    'usb_uart': one_of(usb_uarts, LEGACY_VALUES['usb_uart']),
+    'board_footprint': one_of(board_footprints, LEGACY_VALUES['board_footprint']),
+    'onewire_connector': one_of(onewire_connector_footprints),
+    'common_footprint': one_of(resistor_footprints),
+    'transistor_footprint': one_of(transistor_footprints),
+    'crystal_footprint': one_of(crystal_footprints),
+    'crystal_frequency': one_of(crystal_frequencies, LEGACY_VALUES['crystal_frequency']),
+    'resistor_footprint': LITERAL,
+    'capacitor_footprint': LITERAL,
+    'led_footprint': LITERAL,
+    'regulator': one_of(regulators),
+    'regulator_data': record({'module': str, 'part': str, 'footprint': str, 'output': str, 'enable_pin': bool},
+                             optional=['enable_pin']),
+    'regulator_vin_bypass_cap': TEXT,
+    'regulator_vout_bypass_cap': TEXT,
+    'usb_connector_footprint': record({'part': str, 'footprint': str}),
+    'onewire_connector_footprint': LITERAL,
+    'autoselect': FLAG,
+    'hc12': FLAG,
+    'sh1106': FLAG,
+    'si5351': FLAG,
+    'generate_labels': FLAG,
+    'hoist_nets': FLAG,
+    'title': TEXT,
+    'author': TEXT,
+}
+
+
+def has_mcu(settings):
+    """Return True if settings choose a microcontroller"""
+    return settings.get('mcu', 'No MCU') != 'No MCU'
+
+
+def has_power_network(settings):
+    """Return True if the power network connecting battery or USB to the board is generated"""
+    return settings.get('powersource', 'No battery') != 'No battery' \
+        or settings.get('usb_connector', 'No USB connector') != 'No USB connector'
+
+
+def has_onewire_bus(settings):
+    """Return True if the onewire bus of the temperature sensors is generated"""
+    return settings.get('DS18B20', False) or settings.get('DS18B20U', False) \
+        or settings.get('onewire_connector', 'No Onewire connector') != 'No Onewire connector'
+
+
+# Fields that generate() reads, with the predicate telling when. Every wizard selection is saved
+# together with the footprint or part data the controller fills in for it
+REQUIRED = (
+    (('mcu_footprint', 'mcurail'), has_mcu),
+    (('crystal_footprint', 'crystal_frequency'), lambda settings: settings.get('mcu') in ATMEGA328P_MCUS),
+    (('transistor_footprint',),
+     lambda settings: settings.get('mcu') in ESP_MODULES and settings.get('usb_uart') in ESP_UART_RESETS),
+    (('mcu', 'mcurail'), has_onewire_bus),
+    (('powersource',), has_power_network),
+    (('mcurail',), lambda settings: has_power_network(settings) and settings.get('regulator') == 'No regulator'
+     and settings.get('powersource') == 'No battery'),
+    (('powersource_footprint',), lambda settings: settings.get('powersource', 'No battery') != 'No battery'),
+    (('fuse_footprint',), lambda settings: 'fuse' in settings),
+    (('resistor_footprint', 'capacitor_footprint', 'led_footprint'),
+     lambda settings: 'common_footprint' in settings or has_mcu(settings)),
+    (('regulator_data',), lambda settings: 'regulator' in settings),
+    (('usb_connector_footprint',), lambda settings: 'usb_connector' in settings),
+    (('onewire_connector_footprint',), lambda settings: 'onewire_connector' in settings),
+)
+
+
+class SettingsError:
+    """Invalid or missing field of a settings document"""
+
+    __slots__ = ('key', 'message')
+
+    def __init__(self, key, message):
+        self.key = key
+        self.message = message
+
+    def __repr__(self):
+        return f"SettingsError({self.key!r}, {self.message!r})"
+
+    def __str__(self):
+        return f"{self.key}: {self.message}"
+
+    def __eq__(self, other):
+        return isinstance(other, SettingsError) and (self.key, self.message) == (other.key, other.message)
+
+    def __hash__(self):
+        return hash((self.key, self.message))
+
+
+def _one_of_check(key, values):
+    choices = ', '.join(sorted(repr(value) for value in values))
+
+    def check(value):
+        try:
+            if value in values:
+                return None
+        except TypeError:
+            pass
+        return SettingsError(key, f"{value!r} is not one of {choices}")
+    return check
+
+
+def _type_check(key, types):
+    names = ' or '.join('None' if kind is type(None) else kind.__name__ for kind in types)
+
+    def check(value):
+        if type(value) in types:
+            return None
+        return SettingsError(key, f"{value!r} is not {names}")
+    return check
+
+
+def _literal_check(key, optional):
+    def check(value):
+        if value is None and optional:
+            return None
+        if type(value) is not str:
+            return SettingsError(key, f"{value!r} is not str")
+        if not UNQUOTED.isdisjoint(value):
+            return SettingsError(key, f"{value!r} contains quotes, backslashes or line breaks")
+        return None
+    return check
+
+
+def _record_check(key, fields, optional):
+    required = [name for name in fields if name not in optional]
+
+    def check(value):
+        if value is None or value == '':
+            return None
+        if not isinstance(value, dict):
+            return SettingsError(key, f"{value!r} is not a mapping of {', '.join(fields)}")
+        missing = [name for name in required if name not in value]
+        if missing:
+            return SettingsError(key, f"missing {', '.join(missing)}")
+        for name, field in value.items():
+            if name not in fields:
+                return SettingsError(key, f"unknown field {name!r}")
+            if type(field) is not fields[name]:
+                return SettingsError(key, f"{name} {field!r} is not {fields[name].__name__}")
+            if type(field) is str and not UNQUOTED.isdisjoint(field):
+                return SettingsError(key, f"{name} {field!r} contains quotes, backslashes or line breaks")
+        return None
+    return check
+
+
+_CHECKS = {'one_of': _one_of_check, 'type': _type_check, 'literal': _literal_check}
+
+
+def compile_schema(schema=None, required=REQUIRED, allow_unknown=True):
+    """Compile schema into a function returning the list of SettingsErrors of a settings dict.
+    Unknown keys are errors unless allow_unknown"""
+    schema = SCHEMA if schema is None else schema
+    checks = {}
+    for key, (kind, argument) in schema.items():
+        if kind == 'record':
+            checks[key] = _record_check(key, *argument)
+        else:
+            checks[key] = _CHECKS[kind](key, argument)
+    required = tuple(required)
+
+    def validate(settings):
+        if not isinstance(settings, dict):
+            return [SettingsError('settings', f"{type(settings).__name__} is not a mapping")]
+        errors = []
+        for key, value in settings.items():
+            check = checks.get(key)
+            if check is None:
+                if not allow_unknown:
+                    errors.append(SettingsError(key, "unknown setting"))
+                continue
+            error = check(value)
+            if error is not None:
+                errors.append(error)
+        missing = set()
+        for keys, predicate in required:
+            if predicate(settings):
+                missing.update(key for key in keys if key not in settings)
+        errors.extend(SettingsError(key, "missing") for key in sorted(missing))
+        return errors
+    return validate
+
+
+validate_settings = compile_schema()
+
+
+def check_settings_files(filenames, validate=None):
+    """Return dict of the errors of every settings file that has errors, as lists of
+    SettingsErrors, or of a single one when the file cannot be read"""
+    validate = validate_settings if validate is None else validate
+    errors = {}
+    for filename in filenames:
+        try:
+            settings = load_settings_file(filename)
+        except Exception as error:  # pylint: disable=broad-except
+            errors[filename] = [SettingsError('settings', f"{type(error).__name__}: {error}")]
+            continue
+        file_errors = validate({} if settings is None else settings)
+        if file_errors:
+            errors[filename] = file_errors
+    return errors
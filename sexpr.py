@@ -0,0 +1,119 @@
+# MIT license
+#
+# Skimibowi - SKiDL Microcontroller Board Wizard
+# Copyright (C) 2019  Jussi Vestman
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Parser for the S-expression files of KiCad: symbol libraries, footprints and netlists"""
+
+import re
+
+_TOKEN = re.compile(r'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|([^\s()"]+))')
+_BYTES_TOKEN = re.compile(rb'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|([^\s()"]+))')
+_ESCAPE = re.compile(r'\\(.)')
+
+OPEN = object()
+CLOSE = object()
+
+
+def parse(text):
+    """Return list of the top level expressions of text. An expression is a list of atoms and
+    expressions; atoms are strings whether they were quoted or not"""
+    stack = [[]]
+    for opening, closing, quoted, atom in _TOKEN.findall(text):
+        if opening:
+            expression = []
+            stack[-1].append(expression)
+            stack.append(expression)
+        elif closing:
+            if len(stack) == 1:
+                raise ValueError("Unbalanced ')' in S-expression")
+            stack.pop()
+        elif atom:
+            stack[-1].append(atom)
+        else:
+            stack[-1].append(_ESCAPE.sub(r'\1', quoted) if '\\' in quoted else quoted)
+    if len(stack) != 1:
+        raise ValueError("Unterminated '(' in S-expression")
+    return stack[0]
+
+
+def tokens(data):
+    """Yield tokens of S-expression str, bytes or buffer such as an mmap: OPEN, CLOSE or the
+    string of an atom. Bytes are decoded as UTF-8 one atom at a time, so a large file is never
+    decoded or held as a whole"""
+    if isinstance(data, str):
+        for opening, closing, quoted, atom in _TOKEN.findall(data):
+            if opening:
+                yield OPEN
+            elif closing:
+                yield CLOSE
+            elif atom:
+                yield atom
+            else:
+                yield _ESCAPE.sub(r'\1', quoted) if '\\' in quoted else quoted
+        return
+    for match in _BYTES_TOKEN.finditer(data):
+        opening, closing, quoted, atom = match.groups()
+        if opening:
+            yield OPEN
+        elif closing:
+            yield CLOSE
+        elif atom:
+            yield atom.decode('utf-8', errors='replace')
+        else:
+            text = quoted.decode('utf-8', errors='replace')
+            yield _ESCAPE.sub(r'\1', text) if '\\' in text else text
+
+
+def iterparse(stream, heads):
+    """Yield expressions whose first atom is in heads, parsed from iterator of tokens or data.
+    Other expressions are scanned for matching subexpressions but never built, so the memory
+    used is bounded by the largest matching expression"""
+    if not hasattr(stream, '__next__'):
+        stream = tokens(stream)
+    building = []
+    for token in stream:
+        if token is OPEN:
+            head = next(stream, CLOSE)
+            if head is CLOSE:
+                if building:
+                    building[-1].append([])
+                continue
+            if head is OPEN:
+                raise ValueError("Expression without a head atom in S-expression")
+            if building:
+                expression = [head]
+                building[-1].append(expression)
+                building.append(expression)
+            elif head in heads:
+                building.append([head])
+        elif token is CLOSE:
+            if building:
+                expression = building.pop()
+                if not building:
+                    yield expression
+        elif building:
+            building[-1].append(token)
+
+
+def quote(value):
+    """Return value as quoted S-expression string"""
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
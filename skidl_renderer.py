@@ -0,0 +1,46 @@
+# MIT license
+#
+# Skimibowi - SKiDL Microcontroller Board Wizard
+# Copyright (C) 2019  Jussi Vestman
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Flat SKiDL program of a circuit: one Part per part and one net per net, without the
+subcircuit structure of the program the fragment generators produce"""
+
+
+def render_skidl(circuit):
+    """Return SKiDL program that creates the parts and nets of circuit"""
+    lines = ['"""Creates Kicad netlist file for a microcontroller board"""',
+             '',
+             'from skidl import Part, Net, generate_netlist, set_default_tool, KICAD7',
+             '',
+             'set_default_tool(KICAD7)',
+             '']
+    for index, part in enumerate(circuit.parts):
+        lines.append(f"PART{index} = Part({part.lib!r}, {part.name!r}, value={part.value!r}, "
+                     f"footprint={part.footprint!r}, ref={part.ref!r})")
+    lines.append('')
+    for net, pins in circuit.net_pins():
+        nodes = ', '.join(f"PART{circuit.pin_part[pin]}[{circuit.pin_numbers[pin]!r}]" for pin in pins)
+        lines.append(f"net = Net.fetch({net.name!r})")
+        lines.append(f"net += {nodes}")
+    lines.append('')
+    lines.append('generate_netlist()')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+
+# MIT license
+#
+# Skimibowi - SKiDL Microcontroller Board Wizard
+# Copyright (C) 2019  Jussi Vestman
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Headless command line generator: creates SKiDL programs from settings files without importing
+the Qt user interface, e.g.
+
+    python skimibowi_gen.py board.py -f board.yml
+    python skimibowi_gen.py board.net -f board.yml --netlist
+    python skimibowi_gen.py board.csv -f board.yml --bom
+    python skimibowi_gen.py --batch boards/ -o out/ --validate
+    python skimibowi_gen.py --batch 'boards/esp12e-*.yml' -o out/ --family esp12e
+    python skimibowi_gen.py --batch boards/ --archive out/boards.zip
+    python skimibowi_gen.py board.py -f board.yml --profile trace --profile-file board.trace.json
+    python skimibowi_gen.py build build.yml
+    python skimibowi_gen.py serve --socket /tmp/skimibowi.sock
+    python skimibowi_gen.py client board.py -f board.yml --socket /tmp/skimibowi.sock"""
+
+import argparse
+import sys
+from batch import find_settings_files
+from batch import generate_batch
+from controller import generate_from_settings
+from controller import netlist_from_settings
+from controller import bom_from_settings
+from profiling import Profiler, REPORT_FORMATS
+from settings_schema import check_settings_files
+
+
+def add_batch_arguments(parser):
+    """Add batch generation options to argument parser"""
+    parser.add_argument('--batch', metavar='DIR_OR_GLOB', help='Generate SKiDL for every settings file in directory or glob')
+    parser.add_argument('-j', metavar='N', type=int, help='Number of batch worker processes (default: CPU count)')
+    parser.add_argument('-o', metavar='DIR', help='Output directory for batch generated files (default: next to settings)')
+    parser.add_argument('--family', metavar='MODULE', nargs='?', const='board_family',
+                        help='Write the helper and subcircuit functions of the batch once to MODULE.py '
+                             '(default: board_family) and import them in every generated program')
+    parser.add_argument('--archive', metavar='FILE.zip',
+                        help='Write batch generated programs to a zip archive with an index, storing equal programs once')
+    parser.add_argument('--validate', action='store_true',
+                        help='Check settings files against the settings schema and generate only valid ones')
+
+
+def run_batch(pattern, output_dir=None, jobs=None, validate=False, family=None, archive=None):
+    """Generate SKiDL for settings files matching pattern, print summary and return exit code.
+    With family, the programs share the functions of module named family, and with archive they
+    are written to the zip archive of that name"""
+    if archive:
+        from archive import generate_archive  # pylint: disable=import-outside-toplevel
+        result = generate_archive(find_settings_files(pattern), archive, jobs, validate=validate)
+    elif family:
+        from family import generate_family_batch  # pylint: disable=import-outside-toplevel
+        result = generate_family_batch(find_settings_files(pattern), output_dir, family, jobs, validate=validate)
+    else:
+        result = generate_batch(find_settings_files(pattern), output_dir, jobs, validate=validate)
+    print(result.summary())
+    return 1 if result.errors else 0
+
+
+def check_batch_arguments(parser, args):
+    """Exit with usage error if parsed batch options can not be combined"""
+    if args.archive and args.family:
+        parser.error('--archive and --family cannot be combined')
+
+
+def run_batch_arguments(args, jobs=None):
+    """Run batch of parsed command line arguments, see run_batch"""
+    return run_batch(args.batch, args.o, args.j if jobs is None else jobs, args.validate, args.family, args.archive)
+
+
+def build_main(argv):
+    """Build stale targets of a build manifest, print summary and return exit code"""
+    parser = argparse.ArgumentParser(prog='skimibowi build',
+                                     description='Build outputs of a manifest whose settings or generator changed')
+    parser.add_argument('manifest', nargs='?', default='build.yml', help='Build manifest (default: build.yml)')
+    parser.add_argument('-j', metavar='N', type=int, help='Number of worker processes (default: CPU count)')
+    parser.add_argument('--force', action='store_true', help='Build every target, also those that are up to date')
+    args = parser.parse_args(argv)
+
+    from build import build, ManifestError  # pylint: disable=import-outside-toplevel
+    try:
+        result = build(args.manifest, args.j, args.force)
+    except (OSError, ManifestError) as error:
+        parser.error(str(error))
+    print(result.summary())
+    return 1 if result.errors else 0
+
+
+def main(argv=None):
+    """Generate SKiDL program from settings file, or every settings file of --batch. With build as
+    the first argument, build a manifest, see build_main; with serve, run the generation server,
+    and with client, generate through it"""
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['build']:
+        return build_main(argv[1:])
+    if argv[:1] == ['serve']:
+        from server import serve_main  # pylint: disable=import-outside-toplevel
+        return serve_main(argv[1:])
+    if argv[:1] == ['client']:
+        from client import client_main  # pylint: disable=import-outside-toplevel
+        return client_main(argv[1:])
+    parser = argparse.ArgumentParser(prog='skimibowi-gen',
+                                     description='Skimibowi - generate SKiDL microcontroller board descriptions')
+    parser.add_argument('output', nargs='?', metavar='FILE', help='Generated SKiDL program')
+    parser.add_argument('-f', metavar='settings.yml', help='Settings.yml filename')
+    output_format = parser.add_mutually_exclusive_group()
+    output_format.add_argument('--netlist', action='store_true',
+                               help='Write KiCad netlist instead of SKiDL program, without running SKiDL')
+    output_format.add_argument('--bom', action='store_true', help='Write bill of materials CSV instead of SKiDL program')
+    add_batch_arguments(parser)
+    parser.add_argument('--check-pins', action='store_true',
+                        help='Check that pins referred to exist in the symbol libraries and that pins '
+                             'have footprint pads before writing FILE')
+    parser.add_argument('--profile', nargs='?', const='table', choices=REPORT_FORMATS,
+                        help='Profile fragment generation and print a table (default), JSON or Chrome trace; '
+                             'batches are then generated in this process')
+    parser.add_argument('--profile-file', metavar='FILE', help='Write profile to FILE instead of standard error')
+    args = parser.parse_args(argv)
+    if not args.batch and not args.output:
+        parser.error('FILE or --batch is required')
+    check_batch_arguments(parser, args)
+
+    if args.profile is None:
+        return run(args)
+    with Profiler() as profiler:
+        status = run(args)
+    write_profile(profiler.report(args.profile), args.profile_file)
+    return status
+
+
+def run(args):
+    """Generate the outputs selected by parsed command line arguments and return exit code"""
+    if args.batch:
+        return run_batch_arguments(args, 1 if args.profile else None)
+    if args.validate:
+        errors = check_settings_files([args.f or 'settings.yml'])
+        for settings_filename, file_errors in errors.items():
+            print(f"{settings_filename}: invalid settings", file=sys.stderr)
+            for error in file_errors:
+                print(f"  {error}", file=sys.stderr)
+        if errors:
+            return 1
+    if args.netlist:
+        netlist_from_settings(args.output, args.f or 'settings.yml')
+    elif args.bom:
+        bom_from_settings(args.output, args.f or 'settings.yml')
+    elif args.check_pins:
+        from pin_check import PinReferenceError  # pylint: disable=import-outside-toplevel
+        try:
+            generate_from_settings(args.output, args.f or 'settings.yml', check_pins=True)
+        except PinReferenceError as error:
+            print(f"{args.f or 'settings.yml'}: pin check failed\n{error}", file=sys.stderr)
+            return 1
+    else:
+        generate_from_settings(args.output, args.f or 'settings.yml')
+    return 0
+
+
+def write_profile(report, filename=None):
+    """Write profile report to file, or to standard error"""
+    if filename is None:
+        print(report, file=sys.stderr)
+        return
+    with open(filename, 'w') as profile_file:
+        profile_file.write(report + "\n")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
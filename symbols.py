@@ -0,0 +1,269 @@
+# MIT license
+#
+# Skimibowi - SKiDL Microcontroller Board Wizard
+# Copyright (C) 2019  Jussi Vestman
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Pin data of schematic symbols, read from KiCad symbol libraries
+
+Symbols are looked up by library and name the way SKiDL Part() does: a library is either a path
+of a library file, such as './library/Skimibowi.lib', or the name of a library in the KiCad
+symbol directories, such as 'Device'. Both legacy .lib and .kicad_sym libraries are read. Parsed
+libraries are kept in a local pin cache keyed by library path and content hash, checked only when
+the modification time or size of the file changes, so the stock KiCad libraries are parsed once."""
+
+import glob
+import hashlib
+import os
+import threading
+
+import sexpr
+from settings_cache import cache_entry_filename, default_cache_dir, read_cache_entry, write_cache_entry
+
+CACHE_FORMAT = 2
+
+LIBRARY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'library')
+
+SYMBOL_DIR_VARIABLES = ('KICAD_SYMBOL_DIR', 'KICAD9_SYMBOL_DIR', 'KICAD8_SYMBOL_DIR', 'KICAD7_SYMBOL_DIR',
+                        'KICAD6_SYMBOL_DIR')
+
+SYMBOL_DIRS = ('/usr/share/kicad/symbols', '/usr/local/share/kicad/symbols', '/usr/share/kicad/library',
+               '/Applications/KiCad/KiCad.app/Contents/SharedSupport/symbols')
+
+LIBRARY_EXTENSIONS = ('.kicad_sym', '.lib')
+
+# Electrical types of legacy .lib pins by their code, named as in .kicad_sym libraries
+LIB_PIN_TYPES = {'I': 'input', 'O': 'output', 'B': 'bidirectional', 'T': 'tri_state', 'P': 'passive',
+                 'U': 'unspecified', 'W': 'power_in', 'w': 'power_out', 'C': 'open_collector',
+                 'E': 'open_emitter', 'N': 'no_connect'}
+
+
+class SymbolNotFoundError(LookupError):
+    """Library or symbol does not exist in any of the symbol directories"""
+
+
+class Symbol:
+    """Schematic symbol: reference prefix, default value and footprint, and its pins as
+    (number, name, electrical type) tuples in library order"""
+
+    __slots__ = ('name', 'reference', 'value', 'footprint', 'pins')
+
+    def __init__(self, name, reference, value, footprint, pins):
+        self.name = name
+        self.reference = reference
+        self.value = value
+        self.footprint = footprint
+        self.pins = pins
+
+    def __repr__(self):
+        return f"Symbol({self.name!r}, {self.reference!r}, pins={len(self.pins)})"
+
+
+def parse_lib(lines):
+    """Return dict of symbols in legacy KiCad .lib library text or iterable of its lines. Lines are
+    dispatched on their first character, so the graphics of symbols are skipped without being split"""
+    if isinstance(lines, str):
+        lines = lines.splitlines()
+    symbols = {}
+    symbol = aliases = None
+    for line in lines:
+        first = line[:1]
+        if first not in _LIB_RECORDS:
+            continue
+        fields = line.split()
+        if fields[0] == 'X':
+            if symbol is not None and len(fields) > 11 and fields[10] in ('0', '1'):
+                symbol.pins.append((fields[2], fields[1], LIB_PIN_TYPES.get(fields[11], 'unspecified')))
+        elif fields[0] == 'DEF':
+            symbol = Symbol(fields[1], fields[2], fields[1], '', [])
+            aliases = []
+        elif symbol is None:
+            continue
+        elif fields[0] == 'F1':
+            symbol.value = _field_text(line)
+        elif fields[0] == 'F2':
+            symbol.footprint = _field_text(line)
+        elif fields[0] == 'ALIAS':
+            aliases.extend(fields[1:])
+        elif fields[0] == 'ENDDEF':
+            symbol.pins = _unique_pins(symbol.pins)
+            for name in [symbol.name] + aliases:
+                symbols[name] = Symbol(name, symbol.reference, symbol.value if name == symbol.name else name,
+                                       symbol.footprint, symbol.pins)
+            symbol = None
+    return symbols
+
+
+def parse_kicad_sym(text):
+    """Return dict of symbols in KiCad 6+ .kicad_sym library text"""
+    expressions = sexpr.parse(text)
+    if not expressions or expressions[0][:1] != ['kicad_symbol_lib']:
+        raise ValueError("Not a KiCad symbol library")
+
+    definitions = {}
+    for expression in expressions[0]:
+        if isinstance(expression, list) and expression[:1] == ['symbol']:
+            definitions[expression[1]] = expression
+
+    symbols = {}
+    for name, definition in definitions.items():
+        properties = {item[1]: item[2] for item in definition
+                      if isinstance(item, list) and item[:1] == ['property'] and len(item) > 2}
+        base = definition
+        seen = set()
+        while True:
+            parent = next((item[1] for item in base if isinstance(item, list) and item[:1] == ['extends']), None)
+            if parent is None or parent in seen or parent not in definitions:
+                break
+            seen.add(parent)
+            base = definitions[parent]
+        pins = []
+        for unit in base:
+            if isinstance(unit, list) and unit[:1] == ['symbol'] and not unit[1].endswith('_2'):
+                pins.extend(_kicad_sym_pin(item) for item in unit if isinstance(item, list) and item[:1] == ['pin'])
+        symbols[name] = Symbol(name, properties.get('Reference', 'U'), properties.get('Value', name),
+                               properties.get('Footprint', ''), _unique_pins(pins))
+    return symbols
+
+
+_LIB_RECORDS = frozenset('XDFAE')
+
+
+def _kicad_sym_pin(pin):
+    number = name = ''
+    pin_type = pin[1] if len(pin) > 1 and isinstance(pin[1], str) else 'unspecified'
+    for item in pin:
+        if isinstance(item, list) and len(item) > 1:
+            if item[0] == 'number':
+                number = item[1]
+            elif item[0] == 'name':
+                name = item[1]
+    return number, name, pin_type
+
+
+def _field_text(line):
+    start = line.find('"')
+    return line[start + 1:line.find('"', start + 1)] if start >= 0 else ''
+
+
+def _unique_pins(pins):
+    """Drop pins repeated in units and body styles of a symbol"""
+    seen = set()
+    unique = []
+    for pin in pins:
+        if pin not in seen:
+            seen.add(pin)
+            unique.append(pin)
+    return tuple(unique)
+
+
+def symbol_dirs():
+    """Return directories searched for libraries given by name: the Skimibowi library directory,
+    the KiCad symbol directories of environment variables and the default KiCad install locations"""
+    dirs = [LIBRARY_DIR]
+    dirs.extend(os.environ[variable] for variable in SYMBOL_DIR_VARIABLES if os.environ.get(variable))
+    dirs.extend(SYMBOL_DIRS)
+    dirs.extend(sorted(glob.glob(r'C:\Program Files\KiCad\*\share\kicad\symbols'), reverse=True))
+    return [directory for directory in dirs if os.path.isdir(directory)]
+
+
+class SymbolLibraries:
+    """Resolves symbols of libraries, parsing each library file once. An empty cache_dir disables
+    the on-disk pin cache"""
+
+    def __init__(self, dirs=None, cache_dir=None):
+        self.dirs = symbol_dirs() if dirs is None else list(dirs)
+        self.cache_dir = default_cache_dir('symbols') if cache_dir is None else cache_dir
+        self._libraries = {}
+        self._missing = {}
+        self._lock = threading.Lock()
+
+    def library_filename(self, library):
+        """Return file of library path or name"""
+        if os.path.splitext(library)[1] in LIBRARY_EXTENSIONS:
+            candidates = [library] if os.path.isabs(library) else \
+                [library, os.path.join(os.path.dirname(LIBRARY_DIR), library)]
+        else:
+            candidates = [os.path.join(directory, library + extension)
+                          for directory in self.dirs for extension in LIBRARY_EXTENSIONS]
+        for candidate in candidates:
+            if os.path.isfile(candidate):
+                return candidate
+        searched = ', '.join(self.dirs) or 'no directories'
+        raise SymbolNotFoundError(f"Symbol library '{library}' not found in {searched}; "
+                                  f"set KICAD_SYMBOL_DIR to the KiCad symbols directory")
+
+    def library(self, library):
+        """Return dict of symbols of library path or name. A library that is not found is not
+        searched for again"""
+        with self._lock:
+            symbols = self._libraries.get(library)
+            if symbols is None:
+                if library in self._missing:
+                    raise SymbolNotFoundError(self._missing[library])
+                try:
+                    filename = self.library_filename(library)
+                except SymbolNotFoundError as error:
+                    self._missing[library] = str(error)
+                    raise
+                symbols = self._libraries[library] = self.load(filename)
+            return symbols
+
+    def symbol(self, library, name):
+        """Return symbol name of library"""
+        symbols = self.library(library)
+        try:
+            return symbols[name]
+        except KeyError:
+            raise SymbolNotFoundError(f"Symbol '{name}' not found in library '{library}'") from None
+
+    def load(self, filename):
+        """Return dict of symbols of library file, from the pin cache if the file content has not
+        changed. The content is hashed only when its modification time or size has changed"""
+        status = os.stat(filename)
+        entry_filename = cache_entry_filename(self.cache_dir, filename) if self.cache_dir else None
+        entry = read_cache_entry(entry_filename) if entry_filename else None
+        if not (isinstance(entry, tuple) and len(entry) == 5 and entry[0] == CACHE_FORMAT):
+            entry = None
+        elif entry[1:3] == (status.st_mtime_ns, status.st_size):
+            return _cached_symbols(entry[4])
+
+        with open(filename, 'rb') as library_file:
+            data = library_file.read()
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        if entry is not None and entry[3] == digest:
+            symbols = _cached_symbols(entry[4])
+            write_cache_entry(entry_filename, (CACHE_FORMAT, status.st_mtime_ns, status.st_size) + entry[3:])
+            return symbols
+
+        text = data.decode('utf-8', errors='replace')
+        symbols = parse_kicad_sym(text) if filename.endswith('.kicad_sym') else parse_lib(text)
+        if entry_filename:
+            write_cache_entry(entry_filename, (CACHE_FORMAT, status.st_mtime_ns, status.st_size, digest, {
+                name: (symbol.reference, symbol.value, symbol.footprint, symbol.pins)
+                for name, symbol in symbols.items()}))
+        return symbols
+
+
+def _cached_symbols(fields_of_symbols):
+    return {name: Symbol(name, *fields) for name, fields in fields_of_symbols.items()}
+
+
+symbol_libraries = SymbolLibraries()
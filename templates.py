@@ -0,0 +1,77 @@
+# MIT license
+#
+# Skimibowi - SKiDL Microcontroller Board Wizard
+# Copyright (C) 2019  Jussi Vestman
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Code templates compiled once from str.format syntax
+
+A Template is parsed when it is created and rendered by direct slot substitution."""
+
+from functools import wraps
+from string import Formatter
+
+INDENT = '    '
+
+
+def indent_body(code):
+    """Indent code as body of a generated function"""
+    return code.strip().replace('\n', '\n' + INDENT).replace(INDENT + '\n', '\n')
+
+
+class Template:
+    """Code template with {field} slots compiled once"""
+
+    __slots__ = ('source', 'fields', '_format')
+
+    def __init__(self, source):
+        self.source = source
+        literals = ['']
+        fields = []
+        for literal, field, spec, conversion in Formatter().parse(source):
+            literals[-1] += literal
+            if field is not None:
+                if not field or spec or conversion:
+                    raise ValueError(f"Unsupported template field {{{field}}}")
+                fields.append(field)
+                literals.append('')
+        self.fields = tuple(fields)
+        self._format = '%s'.join(literal.replace('%', '%%') for literal in literals)
+
+    def render(self, values):
+        """Render template with values from mapping"""
+        return self._format % tuple([values[field] for field in self.fields])
+
+
+def renders(source):
+    """Decorator for fragment generators whose code is a single template. The decorated function
+    performs side effects such as adding requirements to context and may return the mapping the
+    template is rendered with, by default the settings"""
+    template = Template(source)
+
+    def decorator(function):
+        @wraps(function)
+        def fragment(args, context):
+            values = function(args, context)
+            return template.render(args if values is None else values)
+
+        fragment.template = template
+        return fragment
+    return decorator
@@ -0,0 +1,15 @@
+"""Test configuration: test outputs and the caches of the tested modules are kept in a temporary
+directory instead of the source tree and the user cache directory. Test modules write their
+outputs under TMP_DIR"""
+
+import atexit
+import os
+import shutil
+import tempfile
+
+# Set on import, before the test modules create their module level caches
+TEST_DIR = tempfile.mkdtemp(prefix='skimibowi-tests-')
+TMP_DIR = os.path.join(TEST_DIR, 'tmp')
+os.makedirs(TMP_DIR)
+os.environ['SKIMIBOWI_CACHE_DIR'] = os.path.join(TEST_DIR, 'cache')
+atexit.register(shutil.rmtree, TEST_DIR, True)
@@ -0,0 +1,103 @@
+"""Tests for content-addressed archive output"""
+
+import unittest
+import sys
+import os
+import zipfile
+from unittest import mock
+sys.path.append('.')
+from conftest import TMP_DIR
+from controller import load_settings_file
+import archive
+from archive import ArchiveError, ArchiveReader, ArchiveWriter, generate_archive, settings_hash
+from batch import find_settings_files
+
+
+class TestArchive(unittest.TestCase):
+    """Tests for archive writer, reader and batch generation"""
+
+    def setUp(self):
+        os.makedirs(f"{TMP_DIR}/archive/", exist_ok=True)
+
+    def test_batch_matches_golden_files(self):
+        """Test that every fixture read from the archive matches its expected result"""
+        settings_filenames = find_settings_files("tests")
+        result = generate_archive(settings_filenames, f"{TMP_DIR}/archive/boards.zip", jobs=2)
+
+        self.assertEqual(result.errors, {})
+        with ArchiveReader(f"{TMP_DIR}/archive/boards.zip") as reader:
+            self.assertEqual(len(reader), len(settings_filenames))
+            for settings_filename in settings_filenames:
+                with open(os.path.splitext(settings_filename)[0] + '.py') as target:
+                    expected = target.read()
+                self.assertEqual(reader.read(settings_filename), expected)
+                self.assertEqual(reader.read(load_settings_file(settings_filename)), expected)
+
+    def test_equal_programs_are_stored_once(self):
+        """Test that variants with the same program share one member"""
+        settings = load_settings_file("tests/esp12.yml")
+        with ArchiveWriter(f"{TMP_DIR}/archive/dedup.zip") as writer:
+            first = writer.add('a', settings, 'program')
+            second = writer.add('b', dict(settings, notes='Not read'), 'program')
+            writer.add('c', dict(settings, mcurail='+5V'), 'other program')
+        self.assertNotEqual(first, second)
+        with zipfile.ZipFile(f"{TMP_DIR}/archive/dedup.zip") as archive:
+            self.assertEqual(len([name for name in archive.namelist() if name.startswith('objects/')]), 2)
+        with ArchiveReader(f"{TMP_DIR}/archive/dedup.zip") as reader:
+            self.assertEqual(reader.member('a'), reader.member(second))
+            self.assertEqual(reader.read('c'), 'other program')
+
+    def test_settings_hash_ignores_key_order(self):
+        """Test that settings hash does not depend on key order"""
+        self.assertEqual(settings_hash({'a': 1, 'b': {'c': 2}}), settings_hash({'b': {'c': 2}, 'a': 1}))
+        self.assertNotEqual(settings_hash({'a': 1}), settings_hash({'a': 2}))
+
+    def test_extract_and_missing_variant(self):
+        """Test that one variant is extracted and an unknown one raises ArchiveError"""
+        with ArchiveWriter(f"{TMP_DIR}/archive/one.zip") as writer:
+            writer.add('one', {}, 'program\n')
+        with ArchiveReader(f"{TMP_DIR}/archive/one.zip") as reader:
+            reader.extract('one', f"{TMP_DIR}/archive/one.py")
+            self.assertNotIn('two', reader)
+            with self.assertRaises(ArchiveError):
+                reader.read('two')
+        with open(f"{TMP_DIR}/archive/one.py") as program:
+            self.assertEqual(program.read(), 'program\n')
+
+    def test_failed_write_keeps_previous_archive(self):
+        """Test that an archive is replaced only when it is written completely"""
+        with ArchiveWriter(f"{TMP_DIR}/archive/keep.zip") as writer:
+            writer.add('one', {}, 'program')
+        with self.assertRaises(RuntimeError):
+            with ArchiveWriter(f"{TMP_DIR}/archive/keep.zip") as writer:
+                writer.add('two', {}, 'program')
+                raise RuntimeError()
+        with ArchiveReader(f"{TMP_DIR}/archive/keep.zip") as reader:
+            self.assertIn('one', reader)
+            self.assertNotIn('two', reader)
+
+    def test_failed_pool_keeps_generated_programs(self):
+        """Test that programs generated before the pool fails are kept and the rest reported"""
+        render_file = archive.render_file
+        outcomes = iter([render_file, mock.Mock(side_effect=RuntimeError("pool broke"))])
+        with mock.patch('archive.render_file', side_effect=lambda name: next(outcomes)(name)):
+            result = generate_archive(["tests/esp12.yml", "tests/zero.yml"], f"{TMP_DIR}/archive/broken.zip", jobs=1)
+        self.assertEqual(result.generated, ["tests/esp12.yml"])
+        self.assertIn("pool broke", result.errors["tests/zero.yml"])
+        with ArchiveReader(f"{TMP_DIR}/archive/broken.zip") as reader:
+            self.assertIn("tests/esp12.yml", reader)
+
+    def test_wizard_command_line(self):
+        """Test that the batch of the wizard entry point writes the archive"""
+        from skimibowi import main  # pylint: disable=import-outside-toplevel
+        with mock.patch('sys.stdout'):
+            status = main(["--batch", "tests/esp12.yml", "-o", f"{TMP_DIR}/archive/cli", "--archive",
+                           f"{TMP_DIR}/archive/cli.zip", "-j", "1", "--validate"])
+        self.assertEqual(status, 0)
+        self.assertFalse(os.path.exists(f"{TMP_DIR}/archive/cli/esp12.py"))
+        with ArchiveReader(f"{TMP_DIR}/archive/cli.zip") as reader, open("tests/esp12.py") as target:
+            self.assertEqual(reader.read("tests/esp12.yml"), target.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
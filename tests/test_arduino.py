@@ -4,6 +4,7 @@ import unittest
 import sys
 import os
 sys.path.append('.')
+from conftest import TMP_DIR
 from controller import generate_from_settings
 
 class TestGenerator(unittest.TestCase):
@@ -22,15 +23,15 @@ class TestGenerator(unittest.TestCase):
     
     def setUp(self):
         try:
-            os.mkdir("tests/tmp/")
+            os.mkdir(f"{TMP_DIR}/")
         except:
             pass
 
     def test_arduino_nano(self):
         """Test Arduino Nano generation"""
 
-        generate_from_settings("tests/tmp/arduino-nano.py", "tests/arduino-nano.yml")
-        self.assertEqualsFile("tests/tmp/arduino-nano.py", "tests/arduino-nano.py")
+        generate_from_settings(f"{TMP_DIR}/arduino-nano.py", "tests/arduino-nano.yml")
+        self.assertEqualsFile(f"{TMP_DIR}/arduino-nano.py", "tests/arduino-nano.py")
 
 if __name__ == '__main__':
     unittest.main()
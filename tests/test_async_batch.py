@@ -0,0 +1,116 @@
+"""Tests for asynchronous batch generation"""
+
+import unittest
+import sys
+import os
+import shutil
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+sys.path.append('.')
+from conftest import TMP_DIR
+import async_batch
+from controller import load_settings_file
+from async_batch import generate_many
+
+FIXTURES = ['esp12', 'arduino-nano', 'esp-12-mcp73831-ap2112k-cp2104-feather', 'zero', 'basic-esp12']
+
+
+class TestGenerateMany(unittest.TestCase):
+    """Tests for generate_many"""
+
+    def setUp(self):
+        shutil.rmtree(f"{TMP_DIR}/async", ignore_errors=True)
+
+    def assert_generated(self, name, output):
+        """Assert that output equals the expected program of fixture"""
+        with open(output) as generated, open(f"tests/{name}.py") as target:
+            self.assertEqual(generated.read(), target.read())
+
+    def test_files_and_settings(self):
+        """Test that settings files and dicts are generated with progress for every item"""
+        settings = load_settings_file("tests/esp12.yml")
+        reports = []
+
+        async def report(item):
+            reports.append(item)
+
+        items = [f"tests/{name}.yml" for name in FIXTURES] + [('dict-esp12', settings), "tests/missing.yml"]
+        result = asyncio.run(generate_many(items, f"{TMP_DIR}/async", concurrency=2, progress=report))
+        self.assertEqual(sorted(result.generated), sorted(items[:-2] + ['dict-esp12']))
+        self.assertEqual(list(result.errors), ["tests/missing.yml"])
+        self.assertEqual(sorted(item.completed for item in reports), list(range(1, len(items) + 1)))
+        self.assertTrue(all(item.total == len(items) for item in reports))
+        for name in FIXTURES:
+            self.assert_generated(name, f"{TMP_DIR}/async/{name}.py")
+        self.assert_generated('esp12', f"{TMP_DIR}/async/dict-esp12.py")
+
+    def test_backpressure(self):
+        """Test that async iterable is consumed only as fast as items complete"""
+        state = {'taken': 0, 'ahead': 0}
+
+        async def settings_files():
+            for index in range(40):
+                state['ahead'] = max(state['ahead'], state['taken'] - len(completed))
+                state['taken'] += 1
+                yield f"tests/{FIXTURES[index % len(FIXTURES)]}.yml"
+
+        completed = []
+        result = asyncio.run(generate_many(settings_files(), f"{TMP_DIR}/async", concurrency=3,
+                                           progress=completed.append))
+        self.assertEqual(result.total, 40)
+        self.assertIsNone(completed[0].total)
+        self.assertLessEqual(state['ahead'], 2 * 3 + 1)
+
+    def test_cancellation(self):
+        """Test that cancelled batch stops taking new items"""
+        async def run():
+            completed = []
+            task = asyncio.ensure_future(generate_many([f"tests/{FIXTURES[0]}.yml"] * 1000, f"{TMP_DIR}/async",
+                                                       concurrency=2, progress=completed.append))
+            while not completed:
+                await asyncio.sleep(0.001)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            return len(completed)
+
+        self.assertLess(asyncio.run(run()), 1000)
+        self.assertTrue(os.path.exists(f"{TMP_DIR}/async/esp12.py"))
+
+    def test_cancellation_cancels_queued_items(self):
+        """Test that items waiting in the executor, own or given, are not generated after cancellation"""
+        for given in [False, True]:
+            with self.subTest(given=given):
+                self.assert_queued_items_cancelled(given)
+
+    def assert_queued_items_cancelled(self, given):
+        """Assert that cancelling generate_many with a single thread executor generates only the first item"""
+        executor = ThreadPoolExecutor(max_workers=1)
+        started = []
+        release = threading.Event()
+
+        def generate_item(job):
+            started.append(job[0])
+            release.wait(5)
+
+        async def run():
+            task = asyncio.ensure_future(generate_many([f"tests/{name}.yml" for name in FIXTURES], f"{TMP_DIR}/async",
+                                                       concurrency=2, executor=executor if given else None))
+            while not started:
+                await asyncio.sleep(0.001)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        with mock.patch.object(async_batch, 'ThreadPoolExecutor', lambda **_: executor), \
+                mock.patch.object(async_batch, 'generate_item', generate_item):
+            asyncio.run(run())
+            release.set()
+            executor.shutdown(wait=True)
+        self.assertEqual(started, [f"tests/{FIXTURES[0]}.yml"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+"""Tests for batch generation of SKiDL programs"""
+
+import unittest
+import sys
+import os
+sys.path.append('.')
+from conftest import TMP_DIR
+from batch import find_settings_files, generate_batch, output_filename, write_chunks, IOV_MAX
+
+
+class TestBatch(unittest.TestCase):
+    """Tests that batch generated programs match single file generation"""
+
+    def setUp(self):
+        os.makedirs(f"{TMP_DIR}/batch/", exist_ok=True)
+
+    def test_output_filename(self):
+        """Test settings to program filename mapping"""
+        self.assertEqual(output_filename("boards/esp12.yml"), os.path.join("boards", "esp12.py"))
+        self.assertEqual(output_filename("boards/esp12.yml", "out"), os.path.join("out", "esp12.py"))
+
+    def test_batch_matches_golden_files(self):
+        """Test that every fixture generated in a process pool matches its expected result"""
+        settings_filenames = find_settings_files("tests")
+        result = generate_batch(settings_filenames, f"{TMP_DIR}/batch", jobs=2)
+
+        self.assertEqual(result.errors, {})
+        self.assertEqual(len(result.generated), len(settings_filenames))
+        for settings_filename in settings_filenames:
+            with open(output_filename(settings_filename, f"{TMP_DIR}/batch")) as generated, \
+                 open(output_filename(settings_filename)) as target:
+                self.assertEqual(generated.read(), target.read())
+
+    def test_failures_are_collected(self):
+        """Test that a broken settings file is reported without aborting the run"""
+        with open(f"{TMP_DIR}/batch/broken.yml", "w") as settings:
+            settings.write("mcu: ATmega328P-P\n")
+        result = generate_batch([f"{TMP_DIR}/batch/broken.yml", "tests/esp12.yml"], f"{TMP_DIR}/batch/out", jobs=1)
+
+        self.assertEqual(result.generated, ["tests/esp12.yml"])
+        self.assertIn("KeyError", result.errors[f"{TMP_DIR}/batch/broken.yml"])
+        self.assertIn("1 errors", result.summary())
+
+    def test_write_chunks(self):
+        """Test that vectored write of more chunks than fit in one call writes all of them"""
+        chunks = [f"line {index} \u00e4\n" for index in range(IOV_MAX + 10)] + ['']
+        write_chunks(f"{TMP_DIR}/batch/chunks.txt", chunks)
+        with open(f"{TMP_DIR}/batch/chunks.txt", encoding='utf-8') as written:
+            self.assertEqual(written.read(), "".join(chunks))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+"""Tests for the generation benchmarks"""
+
+import unittest
+import sys
+sys.path.append('.')
+from bench import format_report, percentile, regressions, run, synthetic_settings
+from generator import generate
+from registry import fragments, plan
+
+
+class TestBench(unittest.TestCase):
+    """Tests for bench"""
+
+    def test_synthetic_settings_cover_every_fragment(self):
+        """Test that synthetic settings generate without errors and together generate every fragment"""
+        generated = set()
+        for settings in synthetic_settings():
+            generate(settings, cache=None)
+            generated.update(fragment.name for fragment in plan(settings))
+        self.assertEqual(generated, set(fragments))
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles"""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.50), 50)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertEqual(percentile(values, 0.0), 1)
+        self.assertEqual(percentile([7, 8], 0.50), 7)
+        self.assertEqual(percentile([7], 0.99), 7)
+
+    def test_run(self):
+        """Test that statistics are reported and compared with baseline"""
+        results = run(rounds=1, names=['generate', 'load_settings_file'])
+        self.assertEqual(sorted(results), ['generate', 'load_settings_file'])
+        stats = results['generate']
+        self.assertGreater(stats['calls'], len(synthetic_settings()))
+        self.assertLessEqual(stats['p50_us'], stats['p99_us'])
+        self.assertGreater(stats['peak_kib'], 0)
+
+        baseline = {'generate': dict(stats, p50_us=stats['p50_us'] / 2)}
+        self.assertEqual(regressions(results, baseline), ['generate'])
+        self.assertIn('REGRESSION', format_report(results, baseline))
+
+
+if __name__ == '__main__':
+    unittest.main()
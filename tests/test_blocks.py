@@ -0,0 +1,76 @@
+"""Tests for serializing nested subcircuit functions from a block tree"""
+
+import unittest
+import sys
+sys.path.append('.')
+from generator_functions import GenerationContext, generate_subcircuit, generate_subcircuit_without_call
+from templates import indent_body
+
+
+def indented_subcircuit(function, args, context):
+    """Reference: subcircuit generated by indenting the rendered body as text"""
+    body = indent_body(function(args, context))
+    return f"""
+@subcircuit
+def {function.__name__}():
+    \"\"\"{function.__doc__}\"\"\"
+    {body}"""
+
+
+def generate_inner(args, context):
+    """Innermost"""
+    return "\nPart('Device', 'R')\n\nx = '''\n  text  \n'''   \n\n      \n"
+
+
+def generate_empty(args, context):
+    """Empty"""
+    return ""
+
+
+def generate_middle(args, context):
+    """Middle"""
+    return f"""
+y = 1{' ' * 8}
+{args['nest'](generate_inner, args, context)}
+    {args['nest'](generate_empty, args, context)}
+z = 2"""
+
+
+def generate_outer(args, context):
+    """Outer"""
+    return f"""
+{args['nest'](generate_middle, args, context)}
+
+{args['nest'](generate_inner, args, context)}
+generate_middle()
+"""
+
+
+class TestBlocks(unittest.TestCase):
+    """Tests for BlockTree"""
+
+    def test_nested_functions_equal_indented_text(self):
+        """Test that nested functions are indented like indenting each body as text"""
+        context = GenerationContext()
+        code = generate_subcircuit_without_call(generate_outer, {'nest': generate_subcircuit_without_call}, context)
+        self.assertEqual(code, indented_subcircuit(generate_outer, {'nest': indented_subcircuit}, None))
+        self.assertNotIn('\0', code)
+        self.assertEqual(context.blocks.blocks, [])
+
+    def test_deep_nesting(self):
+        """Test that functions nested many levels deep are written once at their depth"""
+        def nest(level):
+            def generate_level(args, context):
+                """Level"""
+                if level == 0:
+                    return "pass"
+                return f"a = {level}\n{generate_subcircuit(nest(level - 1), args, context)}"
+            return generate_level
+
+        code = generate_subcircuit(nest(50), {}, GenerationContext())
+        self.assertIn('\n' + '    ' * 50 + 'def generate_level():\n' + '    ' * 51 + '"""Level"""\n'
+                      + '    ' * 51 + 'pass\n', code)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+"""Tests for make-style builds from a manifest"""
+
+import unittest
+import sys
+import os
+import json
+import shutil
+sys.path.append('.')
+from conftest import TMP_DIR
+from build import build, load_manifest, lock_filename, ManifestError
+from skimibowi_gen import main
+
+MANIFEST = """targets:
+  - settings: esp12.yml
+    output: out/esp12.py
+  - settings: zero.yml
+    output: out/zero.py
+  - {settings: arduino-nano.yml, output: out/arduino-nano.py}
+"""
+
+
+class TestBuild(unittest.TestCase):
+    """Tests that only stale targets are built"""
+
+    def setUp(self):
+        shutil.rmtree(f"{TMP_DIR}/build", ignore_errors=True)
+        os.makedirs(f"{TMP_DIR}/build")
+        for name in ['esp12', 'zero', 'arduino-nano']:
+            shutil.copy(f"tests/{name}.yml", f"{TMP_DIR}/build")
+        self.manifest = f"{TMP_DIR}/build/build.yml"
+        with open(self.manifest, "w") as manifest:
+            manifest.write(MANIFEST)
+
+    def assert_golden(self, name):
+        """Assert that built program matches expected result"""
+        with open(f"{TMP_DIR}/build/out/{name}.py") as generated, open(f"tests/{name}.py") as target:
+            self.assertEqual(generated.read(), target.read())
+
+    def test_build_and_rebuild(self):
+        """Test that second build finds every target up to date"""
+        result = build(self.manifest, jobs=2)
+        self.assertEqual(result.errors, {})
+        self.assertEqual(sorted(result.written), ['out/arduino-nano.py', 'out/esp12.py', 'out/zero.py'])
+        for name in ['esp12', 'zero', 'arduino-nano']:
+            self.assert_golden(name)
+        with open(lock_filename(self.manifest)) as lock_file:
+            self.assertEqual(len(json.load(lock_file)['targets']), 3)
+
+        result = build(self.manifest)
+        self.assertEqual(len(result.up_to_date), 3)
+        self.assertEqual(result.written + result.unchanged, [])
+
+    def test_changed_settings(self):
+        """Test that changed settings are built again, and output is written only if it changes"""
+        build(self.manifest)
+        mtime = os.stat(f"{TMP_DIR}/build/out/zero.py").st_mtime_ns
+        with open(f"{TMP_DIR}/build/zero.yml", "a") as settings:
+            settings.write("\nnotes: not read by the generator\n")
+        with open(f"{TMP_DIR}/build/esp12.yml", "a") as settings:
+            settings.write("\nmcurail: +5V\n")
+
+        result = build(self.manifest)
+        self.assertEqual(result.unchanged, ['out/zero.py'])
+        self.assertEqual(result.written, ['out/esp12.py'])
+        self.assertEqual(result.up_to_date, ['out/arduino-nano.py'])
+        self.assertEqual(os.stat(f"{TMP_DIR}/build/out/zero.py").st_mtime_ns, mtime)
+
+    def test_changed_output_or_generator(self):
+        """Test that modified outputs, and every output after a generator change, are built again"""
+        build(self.manifest)
+        with open(f"{TMP_DIR}/build/out/esp12.py", "a") as output:
+            output.write("# edited\n")
+        self.assertEqual(build(self.manifest).written, ['out/esp12.py'])
+        self.assert_golden('esp12')
+
+        with open(lock_filename(self.manifest)) as lock_file:
+            lock = json.load(lock_file)
+        lock['targets']['out/zero.py']['generator'] = 'older'
+        with open(lock_filename(self.manifest), "w") as lock_file:
+            json.dump(lock, lock_file)
+        self.assertEqual(build(self.manifest).unchanged, ['out/zero.py'])
+
+    def test_failures_are_collected(self):
+        """Test that a failing target is reported and built again next time"""
+        with open(f"{TMP_DIR}/build/zero.yml", "w") as settings:
+            settings.write("mcu: ATmega328P-P\n")
+        result = build(self.manifest, jobs=1)
+        self.assertIn("KeyError", result.errors['out/zero.py'])
+        self.assertEqual(len(result.written), 2)
+        self.assertIn("out/zero.py", build(self.manifest).errors)
+
+    def test_manifest_errors(self):
+        """Test that invalid manifests are rejected"""
+        with open(self.manifest, "w") as manifest:
+            manifest.write("targets:\n  - {settings: esp12.yml, output: a.py}\n"
+                           "  - {settings: zero.yml, output: a.py}\n")
+        self.assertRaises(ManifestError, load_manifest, self.manifest)
+        with open(self.manifest, "w") as manifest:
+            manifest.write("targets:\n  - {settings: esp12.yml, output: a.txt, format: pdf}\n")
+        self.assertRaises(ManifestError, load_manifest, self.manifest)
+
+    def test_command(self):
+        """Test build command exit status"""
+        self.assertEqual(main(["build", self.manifest, "-j", "1"]), 0)
+        self.assertTrue(os.path.exists(f"{TMP_DIR}/build/out/zero.py"))
+
+
+if __name__ == '__main__':
+    unittest.main()
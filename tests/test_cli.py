@@ -0,0 +1,48 @@
+"""Tests for headless command line generation"""
+
+import unittest
+import sys
+import os
+import subprocess
+sys.path.append('.')
+from conftest import TMP_DIR
+from skimibowi_gen import main
+
+# Seconds the headless entry point may take to import, measured in a fresh interpreter
+IMPORT_BUDGET = float(os.environ.get('SKIMIBOWI_IMPORT_BUDGET', '1.0'))
+
+IMPORT_CHECK = """
+import sys, time
+start = time.perf_counter()
+import skimibowi_gen
+import skimibowi
+print(time.perf_counter() - start)
+print(any(module.split('.')[0] == 'PySide2' for module in sys.modules))
+print(sorted({'netlist', 'bom', 'pin_check'} & set(sys.modules)))
+"""
+
+
+class TestCli(unittest.TestCase):
+    """Tests for skimibowi_gen entry point"""
+
+    def setUp(self):
+        os.makedirs(f"{TMP_DIR}/", exist_ok=True)
+
+    def test_generate_file(self):
+        """Test that program generated from command line matches expected result"""
+        self.assertEqual(main([f"{TMP_DIR}/cli-esp12.py", "-f", "tests/esp12.yml"]), 0)
+        with open(f"{TMP_DIR}/cli-esp12.py") as generated, open("tests/esp12.py") as target:
+            self.assertEqual(generated.read(), target.read())
+
+    def test_headless_import_budget(self):
+        """Test that headless entry points import quickly and never import Qt, nor the netlist, BOM
+        and pin check modules before they are used"""
+        output = subprocess.run([sys.executable, "-c", IMPORT_CHECK], check=True,
+                                capture_output=True, text=True).stdout.split('\n')
+        self.assertEqual(output[1], 'False')
+        self.assertEqual(output[2], '[]')
+        self.assertLess(float(output[0]), IMPORT_BUDGET)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+"""Tests for generating from snapshots of wizard fields"""
+
+import unittest
+import sys
+import os
+sys.path.append('.')
+from conftest import TMP_DIR
+from controller import WIZARD_FIELDS, BackgroundRequests, snapshot_fields, write_skidl
+from generator import generate
+from option_space import OptionSpace
+from settings_cache import parse_settings
+
+
+class FakeWizard:
+    """Wizard whose fields are a dict, counting field() calls"""
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.calls = 0
+
+    def field(self, name):
+        """Return value of field"""
+        self.calls += 1
+        return self.fields[name]
+
+
+class TestWizardSnapshot(unittest.TestCase):
+    """Tests for snapshot_fields and write_skidl"""
+
+    def setUp(self):
+        os.makedirs(f"{TMP_DIR}/", exist_ok=True)
+        fields = next(iter(OptionSpace(fixed={'mcu': 'ESP-12E', 'led': True}).field_values()))
+        self.fields = dict(fields, filename=f"{TMP_DIR}/wizard-mcu.py")
+
+    def test_fields_are_read_once(self):
+        """Test that snapshot reads every field once"""
+        wizard = FakeWizard(self.fields)
+        self.assertEqual(snapshot_fields(wizard), self.fields)
+        self.assertEqual(wizard.calls, len(WIZARD_FIELDS))
+
+    def test_write_skidl(self):
+        """Test that snapshot generates the program and settings it describes"""
+        self.assertEqual(write_skidl(self.fields, f"{TMP_DIR}/wizard-settings.yml"), f"{TMP_DIR}/wizard-mcu.py")
+        with open(f"{TMP_DIR}/wizard-settings.yml") as settings_file:
+            settings = parse_settings(settings_file.read())
+        with open(f"{TMP_DIR}/wizard-mcu.py") as program:
+            self.assertEqual(program.read(), generate(settings))
+        self.assertEqual(settings['mcu'], 'ESP-12E')
+
+
+class FakePool:
+    """Thread pool running one worker at a time from a queue, like the preview pool"""
+
+    def __init__(self):
+        self.queue = []
+
+    def start(self, worker):
+        """Queue worker"""
+        self.queue.append(worker)
+
+    def try_take(self, worker):
+        """Remove worker from queue if it has not started"""
+        if worker in self.queue[1:]:
+            self.queue.remove(worker)
+            return True
+        return False
+
+
+class TestBackgroundRequests(unittest.TestCase):
+    """Tests for numbering requests and keeping running workers referenced"""
+
+    def test_superseded_results_are_dropped(self):
+        """Test that only the result of the latest request is current"""
+        requests = BackgroundRequests()
+        pool = FakePool()
+        for _ in range(3):
+            requests.cancel_waiting(pool.try_take)
+            pool.start(requests.start(lambda number: ("worker", number)))
+        self.assertEqual(pool.queue, [("worker", 1), ("worker", 3)])
+        self.assertEqual(sorted(requests.running), [1, 3])
+        self.assertFalse(requests.finish(1))
+        self.assertTrue(requests.finish(3))
+        self.assertEqual(requests.running, {})
+
+    def test_running_worker_is_kept(self):
+        """Test that a worker that could not be cancelled stays referenced until it finishes"""
+        requests = BackgroundRequests()
+        pool = FakePool()
+        first = requests.start(lambda number: ["worker", number])
+        pool.start(first)
+        requests.cancel_waiting(pool.try_take)
+        requests.start(lambda number: ["worker", number])
+        self.assertIs(requests.running[1], first)
+        requests.finish(1)
+        self.assertNotIn(1, requests.running)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+"""Tests for board families sharing one module"""
+
+import unittest
+import sys
+import os
+import runpy
+sys.path.append('.')
+from conftest import TMP_DIR
+from batch import find_settings_files
+from controller import load_settings_file
+from family import Family, generate_family, generate_family_batch, split_program
+from generator import generate
+
+PROGRAM = '''"""Counts"""
+import itertools
+
+
+def repeat(steps):
+    """Return list of steps items"""
+    return list(itertools.repeat(None, steps))
+
+
+def count():
+    """Count to three"""
+    global COUNT
+    COUNT = len(repeat(STEPS))
+
+
+STEPS = 3
+count()
+'''
+
+
+class TestFamily(unittest.TestCase):
+    """Tests for Family"""
+
+    def setUp(self):
+        os.makedirs(f"{TMP_DIR}/family/", exist_ok=True)
+
+    def test_split_program(self):
+        """Test that imports and functions are separated from the top level statements"""
+        program = split_program(generate(load_settings_file("tests/esp12.yml")))
+        self.assertEqual(program.docstring, '"""Creates Kicad netlist file for a microcontroller board"""')
+        self.assertIn('from skidl import Part', program.imports)
+        self.assertTrue(program.definitions['generate_esp'][1])
+        self.assertFalse(program.definitions['R'][1])
+        self.assertTrue(program.definitions['generate_esp'][0].startswith('def generate_esp():'))
+        self.assertNotIn('def ', program.body)
+        self.assertIn('generate_esp()\n', program.body)
+
+    def test_distinct_functions_are_shared_once(self):
+        """Test that equal functions are defined once and differing ones under new names"""
+        settings = load_settings_file("tests/esp12.yml")
+        shared, programs = generate_family([settings, dict(settings, title='Other'),
+                                            dict(settings, mcurail='+5V')])
+        self.assertEqual(programs[0], programs[1])
+        self.assertEqual(shared.count('def generate_esp():'), 1)
+        self.assertEqual(shared.count('def generate_esp_2():'), 1)
+        self.assertIn("from board_family import generate_esp_2 as generate_esp\n", programs[2])
+        self.assertIn("@subcircuit\n@named('generate_esp')\ndef generate_esp_2():", shared)
+        self.assertNotIn('def ', programs[0])
+        self.assertNotIn('MIT license', programs[0])
+
+    def test_calls_of_renamed_functions(self):
+        """Test that shared functions call the versions of the functions of their program"""
+        settings = load_settings_file("tests/esp12.yml")
+        shared, programs = generate_family([settings, dict(settings, resistor_footprint='R_0805')])
+        self.assertIn("def R_2(value):", shared)
+        self.assertIn("def generate_esp_2():", shared)
+        self.assertIn("U1['EN'] & R_2('10k')", shared)
+        self.assertIn("from board_family import generate_esp_2 as generate_esp\n", programs[1])
+
+    def test_family_is_smaller(self):
+        """Test that the programs of the fixtures compile and are smaller as a family"""
+        codes = [generate(load_settings_file(filename) or {}) for filename in find_settings_files("tests")]
+        family = Family()
+        programs = [family.add(code) for code in codes]
+        shared = family.shared_module()
+        for program in programs + [shared]:
+            compile(program, 'program', 'exec')
+        self.assertLess(len(shared) + sum(map(len, programs)), sum(map(len, codes)))
+
+    def test_functions_using_program_globals(self):
+        """Test that functions using globals of the program stay in the program and import the
+        shared functions they call"""
+        family = Family('counting_family')
+        program = family.add(PROGRAM)
+        shared = family.shared_module()
+        self.assertIn("from counting_family import repeat\n\n\ndef count():", program)
+        self.assertNotIn("import itertools", program)
+        self.assertIn("import itertools\n\n\ndef repeat(steps):", shared)
+        with open(f"{TMP_DIR}/family/counting.py", "w") as program_file:
+            program_file.write(program)
+        with open(f"{TMP_DIR}/family/counting_family.py", "w") as shared_file:
+            shared_file.write(shared)
+        sys.path.insert(0, f"{TMP_DIR}/family")
+        try:
+            namespace = runpy.run_path(f"{TMP_DIR}/family/counting.py")
+        finally:
+            sys.path.remove(f"{TMP_DIR}/family")
+            sys.modules.pop("counting_family", None)
+        self.assertEqual(namespace['COUNT'], 3)
+
+    def test_family_batch(self):
+        """Test that batch writes a program of every settings file and the shared module"""
+        for jobs in (1, 2):
+            output_dir = f"{TMP_DIR}/family/out{jobs}"
+            result = generate_family_batch(["tests/esp12.yml", "tests/basic-esp12.yml"], output_dir, 'esp', jobs)
+            self.assertEqual(result.errors, {})
+            self.assertEqual(result.generated, ["tests/esp12.yml", "tests/basic-esp12.yml"])
+            self.assertTrue(os.path.exists(f"{output_dir}/esp.py"))
+            with open(f"{output_dir}/esp12.py") as program:
+                self.assertIn("from esp import generate_esp\n", program.read())
+
+    def test_failed_family_batch(self):
+        """Test that no shared module is written when no program was generated"""
+        result = generate_family_batch([f"{TMP_DIR}/family/missing.yml"], f"{TMP_DIR}/family/failed", 'failed', 1)
+        self.assertEqual(list(result.errors), [f"{TMP_DIR}/family/missing.yml"])
+        self.assertFalse(os.path.exists(f"{TMP_DIR}/family/failed/failed.py"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+"""Tests for streaming S-expression reading, footprint index and footprint pad checks"""
+
+import unittest
+import sys
+import os
+import shutil
+from unittest import mock
+sys.path.append('.')
+from conftest import TMP_DIR
+import footprints
+import sexpr
+from footprints import FootprintIndex, FootprintNotFoundError
+from symbols import SymbolLibraries
+from pin_check import check_footprint_pads, check_many_footprint_pads, validate_pin_references, PinReferenceError
+from generator import generate
+from controller import load_settings_file
+
+LIBRARIES = SymbolLibraries(dirs=[], cache_dir='')
+FOOTPRINTS = FootprintIndex(cache_dir='')
+
+
+class TestStreamingReader(unittest.TestCase):
+    """Tests for sexpr.tokens and sexpr.iterparse"""
+
+    def test_bytes_and_text_give_same_tokens(self):
+        """Test that bytes are tokenized like text, quoted atoms included"""
+        text = '(pad "1" smd (at 1 -2) (net 1 "A \\"B\\""))'
+        self.assertEqual(list(sexpr.tokens(text.encode())), list(sexpr.tokens(text)))
+        self.assertEqual(list(sexpr.iterparse(text, {'at', 'net'})), [['at', '1', '-2'], ['net', '1', 'A "B"']])
+
+    def test_only_matching_expressions_are_built(self):
+        """Test that subexpressions of matching expressions are kept and others are skipped"""
+        text = '(module x (pad 1 (at 0 0)) (fp_text value x (at 1 1)) (pad 2 (at 2 0)))'
+        self.assertEqual(list(sexpr.iterparse(text, {'pad'})), [['pad', '1', ['at', '0', '0']],
+                                                                ['pad', '2', ['at', '2', '0']]])
+
+
+class TestFootprintIndex(unittest.TestCase):
+    """Tests for FootprintIndex"""
+
+    def test_skimibowi_footprints(self):
+        """Test that pads and courtyards of the Skimibowi footprints are read"""
+        header = FOOTPRINTS.footprint('Skimibowi:FTDI_Header')
+        self.assertEqual(header.pad_numbers, frozenset('123456'))
+        self.assertEqual(header.courtyard, (-1.27, -7.62, 1.27, 7.62))
+        self.assertEqual(FOOTPRINTS.footprint('Skimibowi:HC-12').pads[0],
+                         ('1', 'smd', 'rect', -13.9, -5.08, 2.5, 1.3))
+        self.assertEqual(len(FOOTPRINTS.footprint('Skimibowi:Adafruit_Feather').pad_numbers), 28)
+        self.assertEqual(FOOTPRINTS.footprint('Skimibowi:label3').pads, ())
+        self.assertRaises(FootprintNotFoundError, FOOTPRINTS.footprint, 'Skimibowi:HC-13')
+        self.assertRaises(FootprintNotFoundError, FOOTPRINTS.footprint, 'NoSuchLibrary:HC-12')
+
+    def test_cache_is_keyed_by_mtime(self):
+        """Test that an unchanged footprint is read from the cache, and a large one through mmap"""
+        shutil.rmtree(f'{TMP_DIR}/footprint-cache', ignore_errors=True)
+        os.makedirs(f'{TMP_DIR}/footprint-cache/Test.pretty')
+        filename = f'{TMP_DIR}/footprint-cache/Test.pretty/HC-12.kicad_mod'
+        shutil.copy('Skimibowi.pretty/HC-12.kicad_mod', filename)
+        with mock.patch('footprints.parse_kicad_mod', wraps=footprints.parse_kicad_mod) as parse, \
+                mock.patch('footprints.MMAP_THRESHOLD', 0):
+            index = FootprintIndex(cache_dir=f'{TMP_DIR}/footprint-cache/cache')
+            pads = index.load(filename).pads
+            self.assertEqual(FootprintIndex(cache_dir=f'{TMP_DIR}/footprint-cache/cache').load(filename).pads, pads)
+            self.assertEqual(parse.call_count, 1)
+            self.assertNotIsInstance(parse.call_args[0][0], bytes)
+
+            os.utime(filename, ns=(1, 1))
+            index = FootprintIndex(dirs=[f'{TMP_DIR}/footprint-cache'], cache_dir=f'{TMP_DIR}/footprint-cache/cache')
+            self.assertEqual(index.footprint('Test:HC-12').pads, pads)
+            self.assertEqual(parse.call_count, 2)
+
+
+class TestFootprintPads(unittest.TestCase):
+    """Tests for checking that symbol pins have footprint pads"""
+
+    def test_missing_pads_are_reported(self):
+        """Test that pins without pads are reported once per part and unknown footprints are skipped"""
+        code = ("HC12 = Part('./library/Skimibowi.lib', 'HC-12', footprint='Skimibowi:FTDI_Header')\n"
+                "X = Part('./library/Skimibowi.lib', 'HC-12', footprint='Other:HC-12')\n"
+                "Part('./library/Skimibowi.lib', 'HC-12', footprint=f'Skimibowi:{name}')\n")
+        problems = check_footprint_pads(code, LIBRARIES, FOOTPRINTS)
+        self.assertEqual([(problem.line, problem.pin) for problem in problems], [(1, '7'), (1, '8')])
+        self.assertIn("has no pad in 'Skimibowi:FTDI_Header'", str(problems[0]))
+        self.assertRaises(PinReferenceError, validate_pin_references, code, LIBRARIES, FOOTPRINTS)
+
+    def test_generated_programs(self):
+        """Test that parts of the test cases have a pad for every pin, checked in one pass"""
+        codes = []
+        for name in ['esp-12-mcp73831-ap2112k-cp2104-feather', 'esp12-ftdi-header', 'arduino-nano']:
+            codes.append(generate(load_settings_file(f'tests/{name}.yml')))
+        with mock.patch.object(FOOTPRINTS, 'load', wraps=FOOTPRINTS.load) as read:
+            self.assertEqual(check_many_footprint_pads(codes * 50, LIBRARIES, FOOTPRINTS), [])
+            self.assertLessEqual(read.call_count, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+"""Tests for memoized fragment rendering"""
+
+import unittest
+import sys
+sys.path.append('.')
+from controller import load_settings_file
+from fragment_cache import FragmentCache
+from generator import generate, plan
+
+
+class TestFragmentCache(unittest.TestCase):
+    """Tests for FragmentCache"""
+
+    def test_equivalent_settings_share_fragments(self):
+        """Test that fragments are not re-rendered for keys they never read"""
+        cache = FragmentCache()
+        settings = load_settings_file('tests/esp-12-mcp73831-ap2112k-cp2104-feather.yml')
+        self.assertEqual(generate(settings, cache=cache), generate(settings, cache=None))
+        misses = cache.cache_info().misses
+        other = dict(settings, notes='Not read by any fragment')
+        self.assertEqual(generate(other, cache=cache), generate(other, cache=None))
+        self.assertEqual(cache.cache_info().misses, misses)
+        self.assertEqual(cache.cache_info().hits, len(plan(other)))
+
+    def test_changed_key_renders_again(self):
+        """Test that fragment reading changed key is rendered again"""
+        cache = FragmentCache()
+        settings = load_settings_file('tests/basic-esp12.yml')
+        generate(settings, cache=cache)
+        settings = dict(settings, mcurail='+3V3')
+        self.assertEqual(generate(settings, cache=cache), generate(settings, cache=None))
+        self.assertEqual(cache.cache_info().misses, 2 * len(plan(settings)))
+
+    def test_size_is_bounded(self):
+        """Test that least recently used fragments are evicted"""
+        cache = FragmentCache(maxsize=1)
+        generate(load_settings_file('tests/esp-12-mcp73831-ap2112k-cp2104-feather.yml'), cache=cache)
+        self.assertEqual(cache.cache_info().currsize, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
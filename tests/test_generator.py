@@ -1,10 +1,16 @@
 """Tests for SKiDL generator functions"""
 
+import ast
 import unittest
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from glob import glob
 sys.path.append('.')
-from controller import generate_from_settings
+from conftest import TMP_DIR
+from controller import generate_from_settings, load_settings_file
+from generator import generate, generate_to
 
 class TestGenerator(unittest.TestCase):
     """Tests that compare complete generated SDiDL programs to expected results"""
@@ -23,58 +29,91 @@ class TestGenerator(unittest.TestCase):
 
     def setUp(self):
         try:
-            os.mkdir("tests/tmp/")
+            os.mkdir(f"{TMP_DIR}/")
         except:
             pass
 
     def test_empty_settings(self):
         """Test empty board"""
 
-        generate_from_settings("tests/tmp/zero.py", "tests/zero.yml")
-        self.assertEqualsFile("tests/tmp/zero.py", "tests/zero.py")
+        generate_from_settings(f"{TMP_DIR}/zero.py", "tests/zero.yml")
+        self.assertEqualsFile(f"{TMP_DIR}/zero.py", "tests/zero.py")
 
     def test_empty_board(self):
         """Test empty board"""
 
-        generate_from_settings("tests/tmp/empty.py", "tests/empty.yml")
-        self.assertEqualsFile("tests/tmp/empty.py", "tests/empty.py")
+        generate_from_settings(f"{TMP_DIR}/empty.py", "tests/empty.yml")
+        self.assertEqualsFile(f"{TMP_DIR}/empty.py", "tests/empty.py")
 
     def test_esp12(self):
         """Test basic ESP12"""
 
-        generate_from_settings("tests/tmp/esp12.py", "tests/esp12.yml")
-        self.assertEqualsFile("tests/tmp/esp12.py", "tests/esp12.py")
+        generate_from_settings(f"{TMP_DIR}/esp12.py", "tests/esp12.yml")
+        self.assertEqualsFile(f"{TMP_DIR}/esp12.py", "tests/esp12.py")
 
     def test_basic_esp12(self):
         """Test basic ESP12 breakout with FTDI -header"""
 
-        generate_from_settings("tests/tmp/basic-esp12.py", "tests/basic-esp12.yml")
-        self.assertEqualsFile("tests/tmp/basic-esp12.py", "tests/basic-esp12.py")
+        generate_from_settings(f"{TMP_DIR}/basic-esp12.py", "tests/basic-esp12.yml")
+        self.assertEqualsFile(f"{TMP_DIR}/basic-esp12.py", "tests/basic-esp12.py")
 
     def test_esp12_reset_and_flash(self):
         """Test generation of ESP12 breakout with reset line, reset button and flash button"""
 
-        generate_from_settings("tests/tmp/esp12-reset-flash.py", "tests/esp12-reset-flash.yml")
-        self.assertEqualsFile("tests/tmp/esp12-reset-flash.py", "tests/esp12-reset-flash.py")
+        generate_from_settings(f"{TMP_DIR}/esp12-reset-flash.py", "tests/esp12-reset-flash.yml")
+        self.assertEqualsFile(f"{TMP_DIR}/esp12-reset-flash.py", "tests/esp12-reset-flash.py")
 
     def test_esp12_ftdi_header(self):
         """Test ESP FTDI header generation"""
 
-        generate_from_settings("tests/tmp/esp12-ftdi-header.py", "tests/esp12-ftdi-header.yml")
-        self.assertEqualsFile("tests/tmp/esp12-ftdi-header.py", "tests/esp12-ftdi-header.py")
+        generate_from_settings(f"{TMP_DIR}/esp12-ftdi-header.py", "tests/esp12-ftdi-header.yml")
+        self.assertEqualsFile(f"{TMP_DIR}/esp12-ftdi-header.py", "tests/esp12-ftdi-header.py")
     
     def test_esp_12_mcp73831_ap2112k_cp2104_feather(self):
         """Test ESP12 board with mcp73831, ap2112"""
 
-        generate_from_settings("tests/tmp/esp-12-mcp73831-ap2112k-cp2104-feather.py", "tests/esp-12-mcp73831-ap2112k-cp2104-feather.yml")
-        self.assertEqualsFile("tests/tmp/esp-12-mcp73831-ap2112k-cp2104-feather.py", "tests/esp-12-mcp73831-ap2112k-cp2104-feather.py")
+        generate_from_settings(f"{TMP_DIR}/esp-12-mcp73831-ap2112k-cp2104-feather.py", "tests/esp-12-mcp73831-ap2112k-cp2104-feather.yml")
+        self.assertEqualsFile(f"{TMP_DIR}/esp-12-mcp73831-ap2112k-cp2104-feather.py", "tests/esp-12-mcp73831-ap2112k-cp2104-feather.py")
 
     def test_wemos_d1_mini_18b20u(self):
         """Test ESP12 board 1"""
 
-        generate_from_settings("tests/tmp/wemos_d1_mini_18b20u.py", "tests/wemos_d1_mini_18b20u.yml")
-        self.assertEqualsFile("tests/tmp/wemos_d1_mini_18b20u.py", "tests/wemos_d1_mini_18b20u.py")
-    
+        generate_from_settings(f"{TMP_DIR}/wemos_d1_mini_18b20u.py", "tests/wemos_d1_mini_18b20u.yml")
+        self.assertEqualsFile(f"{TMP_DIR}/wemos_d1_mini_18b20u.py", "tests/wemos_d1_mini_18b20u.py")
+
+    def test_concurrent_generation(self):
+        """Test that generations running in parallel threads do not interfere with each other"""
+
+        settings = []
+        for settings_filename in sorted(glob("tests/*.yml")):
+            settings.append(load_settings_file(settings_filename))
+        expected = [generate(args) for args in settings]
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(generate, settings * 20))
+
+        self.assertEqual(results, expected * 20)
+
+    def test_generate_to_stream(self):
+        """Test that program written to stream equals generated program"""
+
+        settings = load_settings_file("tests/esp-12-mcp73831-ap2112k-cp2104-feather.yml")
+        stream = StringIO()
+        generate_to(stream, settings)
+        with open("tests/esp-12-mcp73831-ap2112k-cp2104-feather.py", 'r') as target:
+            self.assertEqual(stream.getvalue(), target.read())
+
+    def test_quoted_labels(self):
+        """Test that title and author with quotes and newlines are emitted as string literals"""
+
+        title = "It's a \"board\"\nwith two lines"
+        author = "O'Brien'); import os; ('"
+        code = generate({'title': title, 'author': author, 'generate_labels': True})
+        values = [ast.literal_eval(keyword.value) for node in ast.walk(ast.parse(code))
+                  if isinstance(node, ast.Call) for keyword in node.keywords if keyword.arg == 'value']
+        self.assertEqual(values, [title, author])
+        self.assertNotIn('import os', code.replace(repr(author), ''))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,47 @@
+"""Tests for incremental regeneration"""
+
+import unittest
+import sys
+sys.path.append('.')
+from controller import load_settings_file
+from incremental import IncrementalGenerator
+from generator import generate
+
+
+class TestIncrementalGenerator(unittest.TestCase):
+    """Tests for IncrementalGenerator"""
+
+    def setUp(self):
+        self.generator = IncrementalGenerator()
+        self.settings = load_settings_file('tests/esp-12-mcp73831-ap2112k-cp2104-feather.yml')
+        self.generator.generate(self.settings)
+
+    def test_changed_key_renders_only_reader(self):
+        """Test that only the fragment reading changed key is rendered again"""
+        settings = dict(self.settings, regulator_vout_bypass_cap='4u7F')
+        self.assertEqual(self.generator.generate(settings), generate(settings, cache=None))
+        self.assertEqual(self.generator.rendered, ['regulator'])
+
+    def test_unchanged_settings_render_nothing(self):
+        """Test that unchanged settings reuse the previous program"""
+        self.assertEqual(self.generator.generate(self.settings), generate(self.settings, cache=None))
+        self.assertEqual(self.generator.rendered, [])
+
+    def test_plan_key_changes_plan(self):
+        """Test that fragments are added and removed when a plan key changes"""
+        settings = dict(self.settings, DS18B20=True)
+        self.assertEqual(self.generator.generate(settings), generate(settings, cache=None))
+        self.assertIn('18b20', self.generator.rendered)
+        self.assertEqual(self.generator.generate(self.settings), generate(self.settings, cache=None))
+
+    def test_successive_test_cases(self):
+        """Test that switching between test cases matches full generation"""
+        for name in ['esp12', 'arduino-nano', 'wemos_d1_mini_18b20u', 'zero', 'esp12']:
+            with self.subTest(name=name):
+                settings = load_settings_file(f'tests/{name}.yml')
+                with open(f'tests/{name}.py') as target:
+                    self.assertEqual(self.generator.generate(settings), target.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
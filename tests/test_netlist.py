@@ -0,0 +1,123 @@
+"""Tests for KiCad netlist backend"""
+
+import unittest
+import sys
+sys.path.append('.')
+from controller import load_settings_file
+from bom import render_bom
+from circuit import Circuit
+from program import ProgramError
+from netlist import build_circuit, generate_netlist, render_netlist
+from skidl_renderer import render_skidl
+from symbols import SymbolLibraries, SymbolNotFoundError
+
+# Test symbol libraries with the symbols of the test boards
+LIBRARIES = SymbolLibraries(dirs=['tests/symbols'], cache_dir='')
+
+
+def net_nodes(circuit):
+    """Return dict of net names to sorted (ref, pin number) tuples"""
+    return {net.name: sorted(map(circuit.pin_ref, pins)) for net, pins in circuit.net_pins()}
+
+
+class TestNetlist(unittest.TestCase):
+    """Tests for building circuits from generated programs"""
+
+    def test_esp12_netlist(self):
+        """Test that parts and nets of generated ESP12 board match running it with SKiDL"""
+        settings = load_settings_file("tests/esp12.yml")
+        text = generate_netlist(settings, "esp12.py", LIBRARIES)
+
+        self.assertIn('(comp (ref "U1")\n      (value "ESP-12E")\n      (footprint "RF_Module:ESP-12E")', text)
+        self.assertIn('(net (code "5") (name "N$3")\n      (node (ref "D1") (pin "1"))\n'
+                      '      (node (ref "R3") (pin "2")))', text)
+        self.assertEqual(text.count('(comp '), 5)
+
+    def test_series_and_parallel(self):
+        """Test SKiDL connection operators"""
+        circuit = Circuit(LIBRARIES).run("""
+from skidl import Part, Net, subcircuit
+
+@subcircuit
+def generate_divider():
+    global U1
+    U1 = Part('RF_Module', 'ESP-12E')
+    Net.fetch('+3V3') & Part('Device', 'R', value='10k') & U1['ADC'] & Part('Device', 'R_Test') & Net.fetch('GND')
+    U1['GND'] += Net.fetch('GND')
+    Net.fetch('GND') & Part('Device', 'LED') & (U1['GPIO4'] | U1['GPIO5'])
+
+generate_divider()
+Part('./library/Skimibowi.lib', 'Label', ref=" ", value='a')
+Part('./library/Skimibowi.lib', 'Label', ref=" ", value='b')
+""")
+        self.assertEqual(net_nodes(circuit), {
+            '+3V3': [('R1', '1')],
+            'GND': [('D1', '1'), ('R2', '2'), ('U1', '15')],
+            'N$1': [('R1', '2'), ('R2', '1'), ('U1', '2')],
+            'N$2': [('D1', '2'), ('U1', '19'), ('U1', '20')]})
+        self.assertEqual(sorted(part.ref for part in circuit.parts), [' ', ' _1', 'D1', 'R1', 'R2', 'U1'])
+        self.assertEqual(circuit.parts[0].hierarchy, ('generate_divider',))
+        self.assertEqual(circuit.parts[-1].hierarchy, ())
+        self.assertEqual(circuit.parts[2].footprint, 'Resistor_SMD:R_0603_1608Metric')
+        self.assertIn('(nets\n    (net (code "1") (name "+3V3")', render_netlist(circuit))
+
+    def test_renderers(self):
+        """Test BOM and flat SKiDL program rendered from circuit"""
+        circuit = build_circuit(load_settings_file("tests/esp12.yml"), LIBRARIES)
+
+        self.assertEqual(render_bom(circuit).splitlines()[1:], [
+            'D1,1,LED,LED_SMD:LED_1206_3216Metric,Device,LED',
+            'R1,1,10k,Resistor_SMD:R_1206_3216Metric,Device,R',
+            'R2,1,4k7,Resistor_SMD:R_1206_3216Metric,Device,R',
+            'R3,1,1k,Resistor_SMD:R_1206_3216Metric,Device,R',
+            'U1,1,ESP-12E,RF_Module:ESP-12E,RF_Module,ESP-12E'])
+        flat = Circuit(LIBRARIES).run(render_skidl(circuit))
+        self.assertEqual(net_nodes(flat), net_nodes(circuit))
+        self.assertEqual(render_netlist(flat).split('(nets')[1], render_netlist(circuit).split('(nets')[1])
+
+    def test_program_constructs(self):
+        """Test the statements and expressions generated programs use"""
+        circuit = Circuit(LIBRARIES).run("""
+import itertools
+from skidl import Part, Net
+
+def Resistor(value, footprint=None):
+    return Part('Device', 'R', value=value, footprint=footprint or f"R_{value}")
+
+def connect(names, nets=list()):
+    global LAST
+    for name in names:
+        if name not in nets and not name in ('x',):
+            nets += [Net.fetch(name)]
+    LAST = nets[-1]
+    return nets
+
+flatten = itertools.chain.from_iterable
+nets = connect(list(flatten([pin.split('/') for pin in ['+3V3/GND']])))
+first, last = nets[0], LAST
+R1 = Resistor('10k')
+R1[1] += first
+R1[2] += last
+""")
+        self.assertEqual(net_nodes(circuit), {'+3V3': [('R1', '1')], 'GND': [('R1', '2')]})
+        self.assertEqual(circuit.parts[0].footprint, 'R_10k')
+
+    def test_missing_symbol(self):
+        """Test that parts of unknown libraries and symbols are reported"""
+        with self.assertRaises(SymbolNotFoundError):
+            Circuit(LIBRARIES).run("from skidl import Part\nPart('Interface_USB', 'CP2104')")
+        with self.assertRaises(SymbolNotFoundError):
+            Circuit(LIBRARIES).run("from skidl import Part\nPart('Device', 'Q_NPN_BEC')")
+
+    def test_program_is_confined(self):
+        """Test that programs are interpreted without builtins, imports and constructs they do not need"""
+        for code in ("open('confined', 'w')", "import os", "from skidl import Part\nPart.__globals__",
+                     "__import__('os')", "eval('1')", "'{0.__class__}'.format(1)", "(lambda: 0)()",
+                     "class Board:\n    pass", "from skidl import *", "while True:\n    pass",
+                     "from skidl import Part\nPart.__call__", "[x for x in (1, 2)].pop()"):
+            with self.subTest(code=code), self.assertRaises((NameError, ImportError, ProgramError)):
+                Circuit(LIBRARIES).run(code)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+"""Tests for net hoisting of generated programs"""
+
+import unittest
+import sys
+sys.path.append('.')
+from controller import load_settings_file
+from generator import generate
+from incremental import IncrementalGenerator
+from netlist import generate_netlist
+from nets import NET_FETCH, hoist_nets, net_variable
+from symbols import SymbolLibraries
+
+# Test symbol libraries with the symbols of the test boards
+LIBRARIES = SymbolLibraries(dirs=['tests/symbols'], cache_dir='')
+
+
+class TestNetHoisting(unittest.TestCase):
+    """Tests for the hoist_nets setting"""
+
+    def test_variables_are_unique(self):
+        """Test that net names are turned into distinct variables"""
+        taken = set()
+        self.assertEqual([net_variable(name, taken) for name in ['+3V3', 'USBD-', 'rx', 'RX', 'a.b', 'a_b']],
+                         ['net_P3V3', 'net_USBDN', 'net_rx', 'net_RX', 'net_a_b', 'net_a_b_2'])
+
+    def test_nets_are_fetched_once(self):
+        """Test that every net is fetched once in the prelude and computed names are kept"""
+        settings = load_settings_file('tests/esp-12-mcp73831-ap2112k-cp2104-feather.yml')
+        code = generate(dict(settings, hoist_nets=True))
+        names = [match.group(2) for match in NET_FETCH.finditer(code)]
+        self.assertIn('GND', names)
+        self.assertEqual(len(names), len(set(names)))
+        self.assertIn("\nnet_GND = Net.fetch('GND')\n", code)
+        self.assertIn("Net.fetch(pin_name)", code)
+        self.assertLess(code.index('# Nets'), code.index('@subcircuit'))
+        self.assertEqual(generate(settings), generate(dict(settings, hoist_nets=False)))
+
+    def test_netlist_is_unchanged(self):
+        """Test that hoisted programs describe the same board"""
+        settings = load_settings_file('tests/esp12.yml')
+        self.assertEqual(generate_netlist(dict(settings, hoist_nets=True), 'esp12.py', LIBRARIES),
+                         generate_netlist(settings, 'esp12.py', LIBRARIES))
+
+    def test_incremental_generation(self):
+        """Test that incremental generator hoists nets like generate"""
+        settings = dict(load_settings_file('tests/esp12.yml'), hoist_nets=True)
+        generator = IncrementalGenerator()
+        generator.generate(settings)
+        settings['mcurail'] = '+3V3'
+        self.assertEqual(generator.generate(settings), generate(settings))
+        self.assertEqual(hoist_nets(["pass\n"]), ('', ["pass\n"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
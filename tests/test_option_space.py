@@ -0,0 +1,56 @@
+"""Tests for lazy enumeration of wizard configurations"""
+
+import unittest
+import sys
+sys.path.append('.')
+from controller import footprints
+from generator import ATMEGA328P_MCUS, ATTINY85_MCUS, generate
+from option_space import OptionSpace, configurations
+
+
+class TestOptionSpace(unittest.TestCase):
+    """Tests for OptionSpace"""
+
+    def test_irrelevant_fields_keep_default(self):
+        """Test that ICSP is varied only on AVR boards"""
+        values = list(OptionSpace(vary=['mcu', 'icsp']).field_values())
+        avr = ATMEGA328P_MCUS + ATTINY85_MCUS
+        self.assertEqual(len(values), len(footprints) + len(avr))
+        self.assertEqual(sorted(fields['mcu'] for fields in values if fields['icsp']), sorted(avr))
+
+    def test_constraints_prune(self):
+        """Test that invalid combinations are never produced"""
+        for fields in OptionSpace(vary=['mcu', 'usb_uart', 'usb_connector', 'board_footprint']).field_values():
+            if fields['usb_uart'] == 'VUSB-AVR':
+                self.assertTrue(fields['mcu'].startswith(('ATmega', 'ATtiny')))
+            if fields['usb_uart'] != 'No USB':
+                self.assertNotEqual(fields['usb_connector'], 'No USB connector')
+            if fields['board_footprint'] == 'Adafruit Feather':
+                self.assertTrue(fields['mcu'].startswith(('ESP', 'WeMos')))
+
+    def test_configurations_generate(self):
+        """Test that enumerated settings are ready for generation"""
+        count = 0
+        for settings in configurations(fixed={'common_footprint': 'SMD 0805'}, vary=['mcu', 'usb_uart', 'hc12']):
+            self.assertEqual(settings['resistor_footprint'], 'Resistor_SMD:R_0805_2012Metric')
+            self.assertIn("generate_netlist()", generate(settings))
+            count += 1
+        self.assertGreater(count, len(footprints))
+
+    def test_avr_mcus_generate_mcu(self):
+        """Test that every AVR choice of the wizard generates its MCU"""
+        for settings in configurations(vary=['mcu']):
+            if settings['mcu'] in ATMEGA328P_MCUS + ATTINY85_MCUS:
+                self.assertIn(f"'{settings['mcu']}', footprint='{settings['mcu_footprint']}'", generate(settings))
+
+    def test_full_space_is_lazy(self):
+        """Test that the first configuration of the whole space is produced without walking it"""
+        self.assertEqual(next(configurations())['mcu'], next(iter(footprints)))
+
+    def test_unknown_field(self):
+        """Test that unknown fields are rejected"""
+        self.assertRaises(ValueError, OptionSpace, vary=['no such field'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+"""Tests for legacy symbol library index and pin reference checks"""
+
+import unittest
+import sys
+import os
+import shutil
+from unittest import mock
+sys.path.append('.')
+from conftest import TMP_DIR
+import symbols
+from symbols import SymbolLibraries, parse_lib
+from pin_check import check_pin_references, validate_pin_references, PinReferenceError
+from generator import generate
+from controller import load_settings_file
+
+# Only the Skimibowi libraries referred to by path are checked
+LIBRARIES = SymbolLibraries(dirs=[], cache_dir='')
+
+PROGRAM = """
+HC12 = Part('./library/Skimibowi.lib', 'HC-12', footprint="Skimibowi:HC-12")
+HC12['VCC'] += Net.fetch('+3V3')
+HC12['RDX', 'TXD'] += Net.fetch('RX')
+HC12['RX', 'T.D'] += Net.fetch('RX')
+BOARD = Part('./library/feather.lib', 'Adafruit_Feather')
+BOARD['3V3', 2, 'GPIO'] += Net.fetch('+3V3')
+BOARD[40] += Net.fetch('GND')
+U1 = Part('MCU_Microchip_ATmega', 'ATmega328P-AU')
+U1['NOT CHECKED'] += Net.fetch('GND')
+"""
+
+
+class TestLibIndex(unittest.TestCase):
+    """Tests for parsing and caching legacy .lib libraries"""
+
+    def test_pins_have_types(self):
+        """Test that pin numbers, names and electrical types are read"""
+        with open('library/hc12.lib') as library:
+            hc12 = parse_lib(library)['HC-12']
+        self.assertEqual(hc12.value, 'HC-12')
+        self.assertEqual(hc12.footprint, 'Skimibowi:HC-12')
+        self.assertIn(('3', 'RXD', 'input'), hc12.pins)
+        self.assertIn(('4', 'TXD', 'output'), hc12.pins)
+        self.assertIn(('1', 'VCC', 'power_in'), hc12.pins)
+
+    def test_cache_is_keyed_by_content(self):
+        """Test that a touched library is not parsed again, but a changed one is"""
+        shutil.rmtree(f'{TMP_DIR}/lib-cache', ignore_errors=True)
+        os.makedirs(f'{TMP_DIR}/lib-cache/cache')
+        shutil.copy('library/hc12.lib', f'{TMP_DIR}/lib-cache/hc12.lib')
+        filename = f'{TMP_DIR}/lib-cache/hc12.lib'
+        libraries = SymbolLibraries(dirs=[], cache_dir=f'{TMP_DIR}/lib-cache/cache')
+        with mock.patch('symbols.parse_lib', wraps=symbols.parse_lib) as parse:
+            pins = libraries.load(filename)['HC-12'].pins
+            os.utime(filename, ns=(1, 1))
+            self.assertEqual(libraries.load(filename)['HC-12'].pins, pins)
+            self.assertEqual(libraries.load(filename)['HC-12'].pins, pins)
+            self.assertEqual(parse.call_count, 1)
+
+            with open(filename, 'a') as library:
+                library.write("DEF EXTRA U 0 40 Y Y 1 L N\nX A 1 0 0 200 R 50 50 1 1 P\nENDDEF\n")
+            self.assertEqual(libraries.load(filename)['EXTRA'].pins, (('1', 'A', 'passive'),))
+            self.assertEqual(parse.call_count, 2)
+
+
+class TestPinCheck(unittest.TestCase):
+    """Tests for checking pin references of generated programs"""
+
+    def test_unknown_pins_are_reported(self):
+        """Test that misspelled pins are found, and that pins match only an exact pin number or name"""
+        problems = check_pin_references(PROGRAM, LIBRARIES)
+        self.assertEqual([(problem.line, problem.variable, problem.pin) for problem in problems],
+                         [(4, 'HC12', 'RDX'), (5, 'HC12', 'RX'), (5, 'HC12', 'T.D'),
+                          (7, 'BOARD', 'GPIO'), (8, 'BOARD', '40')])
+        self.assertIn("HC12['RDX']", str(problems[0]))
+        self.assertRaises(PinReferenceError, validate_pin_references, PROGRAM, LIBRARIES)
+
+    def test_unknown_symbol_is_reported(self):
+        """Test that symbols missing from a library that exists are reported"""
+        problems = check_pin_references("X = Part('./library/hc12.lib', 'HC-13')\nX['VCC'] += gnd\n", LIBRARIES)
+        self.assertEqual(len(problems), 1)
+        self.assertIsNone(problems[0].pin)
+
+    def test_generated_programs(self):
+        """Test that programs of the test cases refer to existing pins only"""
+        for name in ['esp-12-mcp73831-ap2112k-cp2104-feather', 'esp12', 'arduino-nano', 'zero']:
+            with self.subTest(name=name):
+                settings = load_settings_file(f'tests/{name}.yml') or {}
+                self.assertEqual(check_pin_references(generate(settings), LIBRARIES), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+"""Tests for fragment profiling hooks"""
+
+import unittest
+import sys
+import os
+import json
+import tracemalloc
+from types import SimpleNamespace
+from unittest import mock
+sys.path.append('.')
+from conftest import TMP_DIR
+import profiling
+from profiling import Profiler
+from generator import generate, plan
+from skimibowi_gen import main
+from controller import load_settings_file
+
+
+class TestProfiling(unittest.TestCase):
+    """Tests for Profiler"""
+
+    def setUp(self):
+        self.settings = load_settings_file('tests/esp-12-mcp73831-ap2112k-cp2104-feather.yml')
+
+    def test_fragments_are_measured(self):
+        """Test that every fragment is measured and the program does not change"""
+        with Profiler() as profiler:
+            self.assertIs(profiling.profiler, profiler)
+            program = generate(self.settings, cache=None)
+        self.assertIsNone(profiling.profiler)
+
+        with open('tests/esp-12-mcp73831-ap2112k-cp2104-feather.py') as target:
+            self.assertEqual(program, target.read())
+        fragments = {name for name, stats in profiler.stats.items() if stats.category == 'fragment'}
+        self.assertEqual(fragments, {fragment.name for fragment in plan(self.settings)})
+        self.assertEqual(profiler.stats['esp'].calls, 1)
+        self.assertGreater(profiler.stats['esp'].bytes, 0)
+        self.assertGreater(profiler.stats['esp'].peak, 0)
+        self.assertIn('generate_r', profiler.format_table())
+
+    def test_without_reset_peak(self):
+        """Test that allocation is measured on Python versions without tracemalloc.reset_peak()"""
+        python38 = SimpleNamespace(**{name: getattr(tracemalloc, name) for name in dir(tracemalloc)
+                                      if name != 'reset_peak'})
+        with mock.patch.object(profiling, 'tracemalloc', python38), Profiler() as profiler:
+            profiler.call('list', 'helper', list, range(10000))
+            self.assertTrue(tracemalloc.is_tracing())
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertGreater(profiler.stats['list'].peak, 0)
+
+    def test_reports(self):
+        """Test JSON and Chrome trace event reports"""
+        with Profiler(memory=False) as profiler:
+            generate(self.settings)
+            generate(self.settings)
+        stats = {entry['name']: entry for entry in json.loads(profiler.report('json'))}
+        self.assertEqual(stats['esp']['calls'], 2)
+        events = json.loads(profiler.report('trace'))['traceEvents']
+        self.assertEqual(len(events), len(profiler.events))
+        self.assertEqual({event['ph'] for event in events}, {'X'})
+
+    def test_command_line(self):
+        """Test --profile option"""
+        os.makedirs(f"{TMP_DIR}/", exist_ok=True)
+        self.assertEqual(main([f"{TMP_DIR}/profile-esp12.py", "-f", "tests/esp12.yml", "--profile", "trace",
+                               "--profile-file", f"{TMP_DIR}/profile-esp12.json"]), 0)
+        with open(f"{TMP_DIR}/profile-esp12.json") as trace:
+            self.assertIn('esp', {event['name'] for event in json.load(trace)['traceEvents']})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+"""Tests for fragment registry and execution plans"""
+
+import unittest
+import sys
+sys.path.append('.')
+from generator import generate, plan
+from registry import fragment, unregister_fragment
+
+
+class TestRegistry(unittest.TestCase):
+    """Tests for plan() and registering fragments outside of generator module"""
+
+    def test_plan(self):
+        """Test that plan lists generated fragments in order"""
+        settings = {'mcu': 'ESP-12E', 'usb_uart': 'CP2104', 'hc12': True}
+        self.assertEqual([fragment.name for fragment in plan(settings)],
+                         ['esp', 'cp2104', 'cp2104_esp_uart_reset', 'hc12', 'esp_software_serial'])
+
+    def test_dependent_fragment_needs_requirement(self):
+        """Test that fragment is not generated without the fragment it requires"""
+        self.assertEqual([fragment.name for fragment in plan({'mcu': 'ATmega328P-P', 'icsp': True})],
+                         ['atmega328p', 'icsp'])
+        self.assertEqual(plan({'mcu': 'ESP-12E', 'icsp': True})[0].name, 'esp')
+        self.assertEqual(len(plan({'mcu': 'ESP-12E', 'icsp': True})), 1)
+
+    def test_plan_is_computed_once_per_configuration(self):
+        """Test that settings differing only in keys no trigger reads share a plan"""
+        first = plan({'mcu': 'ESP-12E', 'mcurail': '+3V3'})
+        second = plan({'mcu': 'ESP-12E', 'mcurail': '+5V'})
+        self.assertIs(first, second)
+
+    def test_registered_fragment_is_generated(self):
+        """Test that third-party fragment is generated at its position"""
+
+        @fragment('test_mounting_hole', lambda args: args.get('mounting_holes'), ['mounting_holes'], order=1)
+        def generate_mounting_hole(args, context):
+            """Generate mounting hole"""
+            return "\nHOLE = Part('Mechanical', 'MountingHole', footprint='MountingHole:MountingHole_3.2mm_M3')\n"
+
+        try:
+            self.assertEqual(plan({'mcu': 'ESP-12E', 'mounting_holes': True})[0].name, 'test_mounting_hole')
+            self.assertIn("HOLE = Part('Mechanical'", generate({'mounting_holes': True}))
+        finally:
+            unregister_fragment('test_mounting_hole')
+        self.assertNotIn("HOLE = Part('Mechanical'", generate({'mounting_holes': True}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+"""Tests for the generation server and its client"""
+
+import unittest
+import sys
+import os
+import json
+import threading
+import subprocess
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append('.')
+from conftest import TMP_DIR
+from settings_cache import parse_settings
+from client import ServerError, client_main, request_generation
+from server import make_server
+
+
+def post(port, body, headers):
+    """Post body with headers to /generate and return (status, response text)"""
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    try:
+        connection.request('POST', '/generate', body, headers)
+        response = connection.getresponse()
+        return response.status, response.read().decode('utf-8')
+    finally:
+        connection.close()
+
+
+def start(server):
+    """Serve in a background thread"""
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return thread
+
+
+class TestServer(unittest.TestCase):
+    """Tests for serving generation over HTTP and a Unix socket"""
+
+    @classmethod
+    def setUpClass(cls):
+        os.makedirs(f"{TMP_DIR}/", exist_ok=True)
+        cls.server = make_server(port=0, quiet=True)
+        cls.port = cls.server.server_address[1]
+        start(cls.server)
+        with open("tests/esp12.yml") as settings_file:
+            cls.settings = settings_file.read()
+        with open("tests/esp12.py") as target:
+            cls.target = target.read()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_yaml_and_json_settings(self):
+        """Test that YAML and JSON settings generate the program of the settings"""
+        self.assertEqual(request_generation(self.settings, port=self.port), self.target)
+        settings = json.dumps(parse_settings(self.settings))
+        self.assertEqual(request_generation(settings, json_settings=True, port=self.port), self.target)
+
+    def test_concurrent_requests(self):
+        """Test that concurrent requests are answered with their own programs"""
+        names = ['esp12', 'arduino-nano', 'esp-12-mcp73831-ap2112k-cp2104-feather', 'zero'] * 4
+        with ThreadPoolExecutor(8) as executor:
+            programs = list(executor.map(self._generate_fixture, names))
+        for name, program in zip(names, programs):
+            with open(f"tests/{name}.py") as target:
+                self.assertEqual(program, target.read())
+
+    def _generate_fixture(self, name):
+        with open(f"tests/{name}.yml") as settings_file:
+            return request_generation(settings_file.read(), port=self.port)
+
+    def test_errors(self):
+        """Test that invalid requests are answered with an error status"""
+        with self.assertRaises(ServerError) as error:
+            request_generation("mcu: [unterminated", port=self.port)
+        self.assertEqual(error.exception.status, 400)
+        with self.assertRaises(ServerError) as error:
+            request_generation("- not a mapping", port=self.port)
+        self.assertEqual(error.exception.status, 400)
+        with self.assertRaises(ServerError) as error:
+            request_generation(self.settings, output_format='pdf', port=self.port)
+        self.assertEqual(error.exception.status, 400)
+        with self.assertRaises(ServerError) as error:
+            request_generation("mcu: ESP-12F\ntitle: 1\n", port=self.port)
+        self.assertEqual(error.exception.status, 422)
+        self.assertIn("mcu: 'ESP-12F' is not one of", str(error.exception))
+        self.assertIn("title: 1 is not str", str(error.exception))
+
+    def test_requests_from_web_pages_are_refused(self):
+        """Test that only local JSON or YAML requests without Origin are answered"""
+        headers = {'Content-Type': 'application/yaml', 'Host': 'localhost'}
+        self.assertEqual(post(self.port, self.settings, headers)[0], 200)
+        self.assertEqual(post(self.port, self.settings, dict(headers, **{'Content-Type': 'text/plain'}))[0], 415)
+        self.assertEqual(post(self.port, self.settings, dict(headers, Origin='http://example.com'))[0], 403)
+        self.assertEqual(post(self.port, self.settings, dict(headers, Host='attacker.example:8765'))[0], 403)
+
+    def test_token(self):
+        """Test that a server with a token answers only requests carrying it"""
+        server = make_server(port=0, quiet=True, token='secret')
+        start(server)
+        port = server.server_address[1]
+        try:
+            self.assertEqual(request_generation(self.settings, port=port, token='secret'), self.target)
+            with self.assertRaises(ServerError) as error:
+                request_generation(self.settings, port=port, token='guess')
+            self.assertEqual(error.exception.status, 401)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_client_writes_output(self):
+        """Test that client command writes generated program and fails without a server"""
+        self.assertEqual(client_main([f"{TMP_DIR}/client-esp12.py", "-f", "tests/esp12.yml",
+                                      "--port", str(self.port)]), 0)
+        with open(f"{TMP_DIR}/client-esp12.py") as generated:
+            self.assertEqual(generated.read(), self.target)
+        with open(os.devnull, 'w') as devnull:
+            stderr, sys.stderr = sys.stderr, devnull
+            try:
+                status = client_main([f"{TMP_DIR}/client-none.py", "-f", "tests/esp12.yml",
+                                      "--socket", f"{TMP_DIR}/no-server.sock"])
+            finally:
+                sys.stderr = stderr
+        self.assertEqual(status, 2)
+
+    def test_unix_socket(self):
+        """Test that server listens on a Unix socket and removes it when closed"""
+        path = os.path.abspath(f"{TMP_DIR}/server.sock")
+        server = make_server(socket_path=path, quiet=True)
+        start(server)
+        try:
+            self.assertEqual(request_generation(self.settings, socket_path=path), self.target)
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertFalse(os.path.exists(path))
+
+    def test_client_imports_only_standard_library(self):
+        """Test that client starts without importing the generator"""
+        output = subprocess.run([sys.executable, "-c", "import sys, client; "
+                                 "print(sorted({'yaml', 'generator', 'controller'} & set(sys.modules)))"],
+                                check=True, capture_output=True, text=True).stdout
+        self.assertEqual(output.strip(), '[]')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+"""Tests for cached settings loading"""
+
+import unittest
+import sys
+import os
+import shutil
+sys.path.append('.')
+from conftest import TMP_DIR
+from settings_cache import SettingsCache, parse_settings
+
+
+class TestSettingsCache(unittest.TestCase):
+    """Tests that cached settings match parsed settings files"""
+
+    def setUp(self):
+        shutil.rmtree(f"{TMP_DIR}/settings_cache", ignore_errors=True)
+        os.makedirs(f"{TMP_DIR}/settings_cache")
+        self.cache = SettingsCache(f"{TMP_DIR}/settings_cache/cache")
+        self.settings_filename = f"{TMP_DIR}/settings_cache/board.yml"
+        shutil.copy("tests/basic-esp12.yml", self.settings_filename)
+
+    def test_cached_settings_equal_parsed(self):
+        """Test that settings loaded from cache equal settings parsed from file"""
+        with open(self.settings_filename) as settings_file:
+            expected = parse_settings(settings_file)
+        self.assertEqual(self.cache.load(self.settings_filename), expected)
+        self.assertTrue(os.path.exists(self.cache.entry_filename(self.settings_filename)))
+        self.assertEqual(self.cache.load(self.settings_filename), expected)
+
+    def test_changed_file_is_parsed_again(self):
+        """Test that modified settings file invalidates cache entry"""
+        self.cache.load(self.settings_filename)
+        with open(self.settings_filename, 'a') as settings_file:
+            settings_file.write("title: Changed\n")
+        self.assertEqual(self.cache.load(self.settings_filename)['title'], 'Changed')
+
+    def test_corrupt_entry_is_ignored(self):
+        """Test that unreadable cache entry is replaced"""
+        self.cache.load(self.settings_filename)
+        with open(self.cache.entry_filename(self.settings_filename), 'wb') as entry_file:
+            entry_file.write(b'garbage')
+        self.assertEqual(self.cache.load(self.settings_filename)['mcu'], 'ESP-12E')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+"""Tests for the settings schema validator"""
+
+import unittest
+import sys
+import os
+import time
+sys.path.append('.')
+from conftest import TMP_DIR
+from batch import find_settings_files, generate_batch
+from bench import synthetic_settings
+from controller import load_settings_file
+from generator import generate
+from option_space import configurations
+from settings_cache import dump_settings
+from settings_schema import SettingsError, check_settings_files, compile_schema, validate_settings
+
+
+class TestSettingsSchema(unittest.TestCase):
+    """Tests for validate_settings"""
+
+    def setUp(self):
+        os.makedirs(f"{TMP_DIR}/schema/", exist_ok=True)
+
+    def test_fixtures_are_valid(self):
+        """Test that every fixture and synthetic settings document validates"""
+        self.assertEqual(check_settings_files(find_settings_files("tests")), {})
+        for settings in synthetic_settings():
+            self.assertEqual(validate_settings(settings), [])
+
+    def test_all_errors_are_reported(self):
+        """Test that every invalid value and missing field of a document is reported"""
+        settings = dict(load_settings_file("tests/esp12.yml"), mcu='ESP-12F', led='yes', regulator_data={'part': 'X'})
+        del settings['mcurail']
+        self.assertCountEqual([error.key for error in validate_settings(settings)],
+                              ['mcu', 'led', 'regulator_data', 'mcurail'])
+        self.assertIn(SettingsError('mcurail', 'missing'), validate_settings(settings))
+
+    def test_missing_fields_that_generate_reads(self):
+        """Test that removing a field generate() needs is reported instead of raising in generate()"""
+        for filename in find_settings_files("tests"):
+            settings = load_settings_file(filename) or {}
+            for key in settings:
+                incomplete = dict(settings)
+                del incomplete[key]
+                try:
+                    generate(incomplete, cache=None)
+                except KeyError:
+                    self.assertTrue(validate_settings(incomplete), f"{filename} without {key}")
+
+    def test_unknown_keys(self):
+        """Test that unknown keys are errors only when not allowed"""
+        self.assertEqual(validate_settings({'key': 'value'}), [])
+        strict = compile_schema(allow_unknown=False)
+        self.assertEqual(strict({'key': 'value'}), [SettingsError('key', 'unknown setting')])
+
+    def test_batch_rejects_invalid_files(self):
+        """Test that a validated batch does not generate files with errors"""
+        with open(f"{TMP_DIR}/schema/typo.yml", "w") as settings:
+            settings.write("mcu: ESP-12F\nmcurail: +3V3\n")
+        result = generate_batch([f"{TMP_DIR}/schema/typo.yml", "tests/esp12.yml"], f"{TMP_DIR}/schema/out", jobs=1,
+                                validate=True)
+
+        self.assertEqual(result.generated, ["tests/esp12.yml"])
+        self.assertIn("mcu: 'ESP-12F' is not one of", result.errors[f"{TMP_DIR}/schema/typo.yml"])
+        self.assertFalse(os.path.exists(f"{TMP_DIR}/schema/out/typo.py"))
+
+    def test_legacy_mcu_names(self):
+        """Test that settings saved with the order codes of AVR MCUs load under the generator names"""
+        settings = next(configurations(fixed={'mcu': 'ATmega328P-A'}))
+        with open(f"{TMP_DIR}/schema/legacy.yml", "w") as settings_file:
+            settings_file.write(dump_settings(dict(settings, mcu='ATmega328P-AU')))
+        self.assertEqual(check_settings_files([f"{TMP_DIR}/schema/legacy.yml"]), {})
+        loaded = load_settings_file(f"{TMP_DIR}/schema/legacy.yml")
+        self.assertEqual(loaded['mcu'], 'ATmega328P-A')
+        self.assertEqual(validate_settings(dict(settings, mcu='ATmega328P-AU')), [])
+        self.assertEqual(generate(loaded), generate(settings))
+
+    def test_throughput(self):
+        """Test that tens of thousands of documents are validated per second"""
+        documents = list(synthetic_settings()) * 1000
+        start = time.perf_counter()
+        for settings in documents:
+            validate_settings(settings)
+        self.assertGreater(len(documents) / (time.perf_counter() - start), 10000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+"""Tests for compiled code templates"""
+
+import unittest
+import sys
+sys.path.append('.')
+from templates import Template, renders
+
+
+class TestTemplates(unittest.TestCase):
+    """Tests that compiled templates render like str.format"""
+
+    source = '''
+FTDI_HEADER = Part('Connector', 'Conn_01x06_Pin', footprint='{footprint}')
+FTDI_HEADER['~{{RTS}}'] += Net.fetch('{mcurail}')
+
+FTDI_HEADER[1] += Net.fetch('GND')  # 100%
+'''
+    values = {'footprint': 'Skimibowi:FTDI_Header', 'mcurail': '+3V3'}
+
+    def test_render(self):
+        """Test that template renders equal to str.format"""
+        self.assertEqual(Template(self.source).render(self.values), self.source.format(**self.values))
+
+    def test_renders_decorator(self):
+        """Test that decorated fragment renders with mapping it returns"""
+
+        @renders("\nPart('{part}')\n")
+        def generate_part(args, context):
+            """Generate part"""
+            return {'part': args['mcu'].lower()}
+
+        self.assertEqual(generate_part({'mcu': 'ESP'}, None), "\nPart('esp')\n")
+        self.assertEqual(generate_part.__doc__, "Generate part")
+
+
+if __name__ == '__main__':
+    unittest.main()
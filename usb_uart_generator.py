@@ -23,17 +23,11 @@
 
 """Generates USB UART nets"""
 
-from generator_functions import requirements
+from templates import renders
 from passives_generator import generate_r, generate_c, generate_d, generate_device
-from generator_functions import import_statements
 
 
-def generate_ftdi230(args):
-    """Generate FTDI uart circuitry"""
-
-    requirements.add(generate_c)
-
-    return '''
+@renders('''
 FTDI230 = Part('Interface_USB', 'FT231XS', footprint="Package_SO:SSOP-20_3.9x8.7mm_P0.635mm")
 FTDI230['VCC'] += Net.fetch('{mcurail}')
 FTDI230['GND'] += Net.fetch('GND')
@@ -45,12 +39,13 @@ FTDI230['USBDP'] += Net.fetch('USBD+')
 FTDI230['~{{DTR}}'] += Net.fetch('DTR')
 FTDI230['~{{RTS}}'] += Net.fetch('RTS')
 Net.fetch('GND') & C('100nF') & FTDI230['3V3OUT']
-'''.format(**args)
+''')
+def generate_ftdi230(args, context):
+    """Generate FTDI uart circuitry"""
+    context.requirements.add(generate_c)
 
 
-def generate_ftdi232rl(args):
-    """Generate FTDI uart circuitry"""
-    return '''
+@renders('''
 FTDI230 = Part('Interface_USB', 'FT232RL', footprint="Package_SO:SSOP-28_5.3x10.2mm_P0.65mm")
 FTDI230['VCC'] += Net.fetch('{mcurail}')
 FTDI230['VCCIO'] += Net.fetch('{mcurail}')
@@ -64,12 +59,12 @@ FTDI230['~{{DTR}}'] += Net.fetch('DTR')
 FTDI230['TEST'] += Net.fetch('GND')
 C_3V3 = Part('Device', 'C', value='100nF', footprint='{capacitor_footprint}')
 Net.fetch('GND') & C_3V3 & FTDI230['3V3OUT']
-'''.format(**args)
+''')
+def generate_ftdi232rl(args, context):
+    """Generate FTDI uart circuitry"""
 
 
-def generate_cp2102(args):
-    """Generate CP2102 usb uart circuitry"""
-    return '''
+@renders('''
 CP2102 = Part('Interface_USB', 'CP2102N-A01-GQFN24', footprint="Package_DFN_QFN:QFN-24-1EP_4x4mm_P0.5mm_EP2.6x2.6mm")
 CP2102['VDD'] += Net.fetch('{mcurail}')
 CP2102['GND'] += Net.fetch('GND')
@@ -80,16 +75,12 @@ CP2102['TXD'] += Net.fetch('rx')
 CP2102['RXD'] += Net.fetch('tx')
 CP2102['DTR'] += Net.fetch('DTR')
 CP2102['RTS'] += Net.fetch('RTS')
-'''.format(**args)
-
-
-def generate_cp2104(args):
-    """Generate CP2104 usb uart circuitry"""
+''')
+def generate_cp2102(args, context):
+    """Generate CP2102 usb uart circuitry"""
 
-    requirements.add(generate_r)
-    requirements.add(generate_c)
 
-    return '''
+@renders('''
 cp2104 = Part('Interface_USB', 'CP2104', footprint="Package_DFN_QFN:QFN-24-1EP_4x4mm_P0.5mm_EP2.6x2.6mm")
 cp2104['VIO'] += Net.fetch('{mcurail}')
 cp2104['VDD'] += Net.fetch('{mcurail}')
@@ -112,30 +103,35 @@ cp2104['VPP'] & C('4.7uF') & Net.fetch('GND')
 # Optional, improves stability
 cp2104['RST'] & R('4k7') & Net.fetch('{mcurail}')
 
-'''.format(**args)
+''')
+def generate_cp2104(args, context):
+    """Generate CP2104 usb uart circuitry"""
+    context.requirements.add(generate_r)
+    context.requirements.add(generate_c)
 
 
-def generate_vusb_avr(args):
-    """Generate Virtual USB circuit for AVR"""
-    requirements.add(generate_r)
-    requirements.add(generate_device)
-    requirements.add(generate_d)
-    import_statements.add("from skidl import show")
-    return '''
+@renders('''
 Net.fetch('USBD-') & R('68') & U1['PD7']
 Net.fetch('USBD+') & R('68') & U1['PD2']
 Net.fetch('USBD-') & D('BZT52Bxx', value="BZT52B3V6") & Net.fetch('GND')
 Net.fetch('USBD+') & D('BZT52Bxx', value="BZT52B3V6") & Net.fetch('GND')
 Net.fetch('USBD-') & R('1k5') & Net.fetch('{mcurail}')
-'''.format(**args)
+''')
+def generate_vusb_avr(args, context):
+    """Generate Virtual USB circuit for AVR"""
+    context.requirements.add(generate_r)
+    context.requirements.add(generate_device)
+    context.requirements.add(generate_d)
+    context.import_statements.add("from skidl import show")
 
 
-def generate_usb_connector(args):
-    """Generate USB connector"""
-    return '''
+@renders('''
 USBMICRO = Part('Connector', '{part}', footprint='{footprint}')
 USBMICRO['VBUS'] += Net.fetch('+VBus')
 USBMICRO['GND'] += Net.fetch('GND')
 USBMICRO['D-'] += Net.fetch('USBD-')
 USBMICRO['D+'] += Net.fetch('USBD+')
-'''.format(**(args['usb_connector_footprint']))
+''')
+def generate_usb_connector(args, context):
+    """Generate USB connector"""
+    return args['usb_connector_footprint']
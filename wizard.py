@@ -0,0 +1,518 @@
+#!/usr/bin/env python
+
+# MIT license
+#
+# Skimibowi - SKiDL Microcontroller Board Wizard
+# Copyright (C) 2019  Jussi Vestman
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""Qt wizard user interface of Skimibowi"""
+
+import sys
+from PySide2 import QtCore
+from PySide2 import QtGui
+from PySide2 import QtWidgets
+from controller import footprints
+from controller import battery_footprints
+from controller import regulators
+from controller import resistor_footprints
+from controller import usb_connector_footprints
+from controller import fuse_footprints
+from controller import onewire_connector_footprints
+from controller import mcu_rails
+from controller import battery_management_ics
+from controller import usb_uarts
+from controller import board_footprints
+from controller import transistor_footprints
+from controller import crystal_footprints
+from controller import crystal_frequencies
+from controller import load_settings
+from controller import settings_from_fields
+from controller import snapshot_fields
+from controller import write_skidl
+from controller import BackgroundRequests
+from incremental import IncrementalGenerator
+
+# Milliseconds the fields must stay unchanged before the preview is regenerated
+PREVIEW_DELAY_MS = 100
+
+
+class QIComboBox(QtWidgets.QComboBox):
+    def __init__(self, parent=None):
+        super(QIComboBox, self).__init__(parent)
+
+
+class WorkerSignals(QtCore.QObject):
+    """Signals of Worker, delivered in the GUI thread: request number and result or error message"""
+    finished = QtCore.Signal(int, str)
+    failed = QtCore.Signal(int, str)
+
+
+class Worker(QtCore.QRunnable):
+    """Runs function with a snapshot of the wizard fields in a thread pool, so that the GUI thread
+    never waits for generation or file I/O. The request number tells stale results apart. The
+    pool does not delete workers; BackgroundRequests keeps them until their signal is handled"""
+
+    def __init__(self, number, function, fields):
+        super(Worker, self).__init__()
+        self.setAutoDelete(False)
+        self.number = number
+        self.function = function
+        self.fields = fields
+        self.signals = WorkerSignals()
+
+    def run(self):
+        try:
+            result = self.function(self.fields)
+        except Exception as error:  # pylint: disable=broad-except
+            self.signals.failed.emit(self.number, f"{type(error).__name__}: {error}")
+        else:
+            self.signals.finished.emit(self.number, result)
+
+
+class PreviewPane(QtWidgets.QPlainTextEdit):
+    """Window showing the SKiDL code of the current wizard fields. The code is regenerated in the
+    background PREVIEW_DELAY_MS after the fields stop changing, by an incremental generator that
+    re-renders only the fragments of the changed fields. A request that has not started when the
+    fields change again is cancelled, and results of superseded requests are dropped"""
+
+    def __init__(self, wizard):
+        super(PreviewPane, self).__init__()
+        self.wizard = wizard
+        self.setWindowTitle("SKiDL preview")
+        self.setReadOnly(True)
+        self.setLineWrapMode(QtWidgets.QPlainTextEdit.NoWrap)
+        self.setFont(QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.FixedFont))
+        self.resize(640, 720)
+        self.generator = IncrementalGenerator()
+        self.pool = QtCore.QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.timer = QtCore.QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(PREVIEW_DELAY_MS)
+        self.timer.timeout.connect(self.regenerate)
+        self.requests = BackgroundRequests()
+
+    def schedule(self, *_):
+        """Regenerate preview once the fields have not changed for PREVIEW_DELAY_MS"""
+        if self.isVisible():
+            self.timer.start()
+
+    def regenerate(self):
+        """Start generating preview of a snapshot of the fields, cancelling the pending request"""
+        self.requests.cancel_waiting(self.pool.tryTake)
+        worker = self.requests.start(lambda number: Worker(number, self.render, snapshot_fields(self.wizard)))
+        worker.signals.finished.connect(self.show_code)
+        worker.signals.failed.connect(self.show_error)
+        self.pool.start(worker)
+
+    def render(self, fields):
+        """Return code of snapshot of fields; runs in the worker thread"""
+        return self.generator.generate(settings_from_fields(fields.__getitem__))
+
+    def show_code(self, number, code):
+        """Show code of the latest request, keeping the scroll position"""
+        if not self.requests.finish(number):
+            return
+        scroll_bar = self.verticalScrollBar()
+        position = scroll_bar.value()
+        self.setPlainText(code)
+        scroll_bar.setValue(position)
+
+    def show_error(self, number, message):
+        """Show why the latest request could not be generated"""
+        if self.requests.finish(number):
+            self.setPlainText(f"# {message}")
+
+    def showEvent(self, event):  # pylint: disable=invalid-name
+        super(PreviewPane, self).showEvent(event)
+        self.timer.start()
+
+
+class Skimibowi(QtWidgets.QWizard):
+    def __init__(self, parent=None):
+        super(Skimibowi, self).__init__(parent)
+        self.addPage(MCU(self))
+        self.addPage(PowerManagementPage(self))
+        self.addPage(PeripheralsPage(self))
+        self.addPage(SerialSettingsPage(self))
+        self.addPage(I2CSettingsPage(self))
+        self.addPage(SpiSettingsPage(self))
+        self.addPage(FootprintsPage(self))
+        self.addPage(FinalPage(self))
+        self.setWindowTitle("Skidl Microcontroller Board  Wizard")
+        self.label = QtWidgets.QLabel("")
+        self.label.setAlignment(QtCore.Qt.AlignTop)
+        self.setSideWidget(self.label)
+        self.currentIdChanged.connect(self.id_changed)
+        self.resize(640, 480)
+        self.preview = PreviewPane(self)
+        self.setButtonText(QtWidgets.QWizard.CustomButton1, "&Preview")
+        self.setOption(QtWidgets.QWizard.HaveCustomButton1, True)
+        self.customButtonClicked.connect(self.toggle_preview)
+        self.watch_fields()
+
+    def watch_fields(self):
+        """Schedule preview when the value of any field widget changes"""
+        for combo_box in self.findChildren(QtWidgets.QComboBox):
+            combo_box.currentTextChanged.connect(self.preview.schedule)
+        for button in self.findChildren(QtWidgets.QAbstractButton):
+            if button.isCheckable():
+                button.toggled.connect(self.preview.schedule)
+        for line_edit in self.findChildren(QtWidgets.QLineEdit):
+            line_edit.textChanged.connect(self.preview.schedule)
+
+    def toggle_preview(self, which):
+        """Show or hide the preview window"""
+        if which == QtWidgets.QWizard.CustomButton1:
+            self.preview.setVisible(not self.preview.isVisible())
+
+    def id_changed(self):
+        """Update wizard pages list in the left side pane of the Wizard"""
+        titles = ""
+        for page_id in self.pageIds():
+            pagename = self.page(page_id).title()
+            if page_id == self.currentId():
+                pagename = '<b>' + pagename + '</b>'
+            titles += '<p>' + pagename + '</p>'
+        self.label.setText(titles)
+
+
+class MCU(QtWidgets.QWizardPage):
+    """Wizard page for configuring the MCU being used"""
+
+    def __init__(self, parent=None):
+        super(MCU, self).__init__(parent)
+        self.setTitle("Microcontroller")
+        self.comboBox = QIComboBox(self)
+        self.comboBox.addItems(footprints.keys())
+        self.resetButton = QtWidgets.QCheckBox("Reset button")
+        self.resetLine = QtWidgets.QCheckBox("Reset line")
+        self.flashButton = QtWidgets.QCheckBox("Flash button")
+        self.ftdi_header = QtWidgets.QCheckBox("FTDI header")
+        self.led = QtWidgets.QCheckBox("Power-on led on GPIO0")
+        self.icsp = QtWidgets.QCheckBox("ICSP header")
+        self.crystal_frequency_label = QtWidgets.QLabel("Crystal Frequency")
+        self.crystal_frequency = QIComboBox(self)
+        self.crystal_frequency.addItems(crystal_frequencies)
+        layout = QtWidgets.QVBoxLayout()
+        layout.addWidget(self.comboBox)
+        layout.addWidget(self.resetButton)
+        layout.addWidget(self.resetLine)
+        layout.addWidget(self.flashButton)
+        layout.addWidget(self.ftdi_header)
+        layout.addWidget(self.led)
+        layout.addWidget(self.icsp)
+        layout.addWidget(self.crystal_frequency_label)
+        layout.addWidget(self.crystal_frequency)
+        self.registerField("mcu", self.comboBox, "currentText")
+        self.registerField("reset", self.resetLine)
+        self.registerField("Reset button", self.resetButton)
+        self.registerField("Flash button", self.flashButton)
+        self.registerField("FTDI header", self.ftdi_header)
+        self.registerField("led", self.led)
+        self.registerField("icsp", self.icsp)
+        self.registerField("crystal_frequency", self.crystal_frequency, "currentText")
+        self.setLayout(layout)
+
+
+class PowerManagementPage(QtWidgets.QWizardPage):
+    """Wizard page for configuring board power management devices and networks"""
+
+    def __init__(self, parent=None):
+        super(PowerManagementPage, self).__init__(parent)
+        self.setTitle('Power Management')
+        self.label1 = QtWidgets.QLabel('Battery')
+        self.powersource = QIComboBox(self)
+        self.powersource.addItems(battery_footprints.keys())
+        self.layout = QtWidgets.QVBoxLayout()
+        self.layout.addWidget(self.label1)
+        self.layout.addWidget(self.powersource)
+        self.layout.addWidget(QtWidgets.QLabel("Regulator"))
+        self.regulator = QIComboBox(self)
+        self.regulator.addItems(regulators.keys())
+        self.layout.addWidget(self.regulator)
+        self.caps = QtWidgets.QGroupBox("Regulator bypass capasitors")
+        self.caps.layout = QtWidgets.QHBoxLayout()
+        self.caps.setLayout(self.caps.layout)
+        self.layout.addWidget(self.caps)
+        self.caps.layout.addWidget(QtWidgets.QLabel("Vin"))
+        self.vin_bypass_cap = QtWidgets.QLineEdit()
+        self.caps.layout.addWidget(self.vin_bypass_cap)
+        self.caps.layout.addWidget(QtWidgets.QLabel("Vout"))
+        self.vout_bypass_cap = QtWidgets.QLineEdit()
+        self.caps.layout.addWidget(self.vout_bypass_cap)
+        self.layout.addWidget(QtWidgets.QLabel('Battery management'))
+        self.battery_management = QIComboBox(self)
+        self.battery_management.addItems(battery_management_ics)
+        self.layout.addWidget(self.battery_management)
+        self.layout.addWidget(QtWidgets.QLabel("MCU power rail"))
+        self.mcurail = QIComboBox(self)
+        self.mcurail.addItems(mcu_rails)
+        self.layout.addWidget(self.mcurail)
+        self.layout.addWidget(QtWidgets.QLabel("Fuse"))
+        self.fuse = QIComboBox(self)
+        self.fuse.addItems(fuse_footprints.keys())
+        self.layout.addWidget(self.fuse)
+        self.switch = QtWidgets.QCheckBox("Add power switch")
+        self.layout.addWidget(self.switch)
+        self.autoselect = QtWidgets.QCheckBox("+5V/USB Auto Selector")
+        self.layout.addWidget(self.autoselect)
+        self.setLayout(self.layout)
+        self.registerField("mcurail", self.mcurail, "currentText")
+        self.registerField("powersource", self.powersource, "currentText")
+        self.registerField("regulator", self.regulator, "currentText")
+        self.registerField("regulator_vin_bypass_cap", self.vin_bypass_cap)
+        self.registerField("regulator_vout_bypass_cap", self.vout_bypass_cap)
+        self.registerField("battery_management", self.battery_management, "currentText")
+        self.registerField("fuse", self.fuse, "currentText")
+        self.registerField("switch", self.switch)
+        self.registerField("autoselect", self.autoselect)
+
+
+class FootprintsPage(QtWidgets.QWizardPage):
+    """Wizard page for configuring default footprints for classes of devices and board footprint"""
+
+    def __init__(self, parent=None):
+        super(FootprintsPage, self).__init__(parent)
+        self.setTitle("Footprints")
+        self.common_footprint_label = QtWidgets.QLabel()
+        self.common_footprint = QIComboBox(self)
+        self.common_footprint.addItems(resistor_footprints.keys())
+        self.registerField('common_footprint', self.common_footprint, 'currentText')
+
+        self.transistor_footprint_label = QtWidgets.QLabel()
+        self.transistor_footprint_label.setText("Transistor footprint")
+        self.transistor_footprint = QIComboBox(self)
+        self.transistor_footprint.addItems(transistor_footprints)
+        self.registerField('transistor_footprint', self.transistor_footprint, 'currentText')
+
+        self.crystal_footprint_label = QtWidgets.QLabel()
+        self.crystal_footprint_label.setText("Crystal footprint")
+        self.crystal_footprint = QIComboBox(self)
+        self.crystal_footprint.addItems(crystal_footprints)
+        self.registerField('crystal_footprint', self.crystal_footprint, 'currentText')
+
+        self.button_footprint_label = QtWidgets.QLabel()
+        self.button_footprint_label.setText("Tactile button footprint")
+        self.button_footprint = QIComboBox(self)
+        self.button_footprint.addItem("b3u-1000")
+        self.registerField('button_footprint', self.button_footprint, 'currentText')
+        self.board_footprint_label = QtWidgets.QLabel()
+        self.board_footprint = QIComboBox(self)
+        self.board_footprint.addItems(board_footprints)
+        self.registerField('board_footprint', self.board_footprint, 'currentText')
+        layout = QtWidgets.QVBoxLayout()
+        layout.addWidget(self.common_footprint_label)
+        layout.addWidget(self.common_footprint)
+        layout.addWidget(self.transistor_footprint_label)
+        layout.addWidget(self.transistor_footprint)
+        layout.addWidget(self.crystal_footprint_label)
+        layout.addWidget(self.crystal_footprint)
+        layout.addWidget(self.button_footprint_label)
+        layout.addWidget(self.button_footprint)
+        layout.addWidget(self.board_footprint_label)
+        layout.addWidget(self.board_footprint)
+        self.setLayout(layout)
+
+    def initializePage(self):
+        self.common_footprint_label.setText("Capasitor, resistor and diode form factor")
+        self.board_footprint_label.setText("Board outline footprint")
+
+
+class PeripheralsPage(QtWidgets.QWizardPage):
+    def __init__(self, parent=None):
+        super(PeripheralsPage, self).__init__(parent)
+        self.setTitle("Peripherals")
+        self.peripherals = {}
+        self.usb_uart_label = QtWidgets.QLabel()
+        self.usb_uart_label.setText("USB Uart")
+        self.usb_uart = QIComboBox(self)
+        self.usb_uart.addItems(usb_uarts)
+        self.registerField("usb_uart", self.usb_uart, "currentText")
+        self.usb_connector_label = QtWidgets.QLabel()
+        self.usb_connector_label.setText("USB Connector")
+        self.usb_connector = QIComboBox(self)
+        self.usb_connector.addItems(usb_connector_footprints.keys())
+        self.registerField("usb_connector", self.usb_connector, "currentText")
+        self.adc_label = QtWidgets.QLabel()
+        self.adc_label.setText("ADC pin")
+        self.adc_voltage_divider = QtWidgets.QComboBox()
+        self.adc_voltage_divider.addItems(['1.0V', '3.0V', '3V3', '4.5V', '5V', '6V', '9V', '12V', '24V'])
+        self.onewire_label = QtWidgets.QLabel()
+        self.onewire_label.setText("Onewire")
+        self.peripherals["DS18B20"] = QtWidgets.QCheckBox("DS18B20")
+        self.registerField("DS18B20", self.peripherals["DS18B20"])
+        self.peripherals["DS18B20U"] = QtWidgets.QCheckBox("DS18B20U")
+        self.registerField("DS18B20U", self.peripherals["DS18B20U"])
+        self.onewire_connector_label = QtWidgets.QLabel()
+        self.onewire_connector_label.setText("Onewire connector")
+        self.onewire_connector = QtWidgets.QComboBox()
+        self.onewire_connector.addItems(onewire_connector_footprints.keys())
+        self.registerField("onewire_connector", self.onewire_connector, "currentText")
+        layout = QtWidgets.QVBoxLayout()
+        layout.addWidget(self.usb_uart_label)
+        layout.addWidget(self.usb_uart)
+        layout.addWidget(self.usb_connector_label)
+        layout.addWidget(self.usb_connector)
+        layout.addWidget(self.adc_label)
+        layout.addWidget(self.adc_voltage_divider)
+        layout.addWidget(self.onewire_label)
+        layout.addWidget(self.peripherals["DS18B20"])
+        layout.addWidget(self.peripherals["DS18B20U"])
+        layout.addWidget(self.onewire_connector_label)
+        layout.addWidget(self.onewire_connector)
+        self.setLayout(layout)
+
+
+class SerialSettingsPage(QtWidgets.QWizardPage):
+    """Wizard page for configuring serial bus connected peripherals"""
+    def __init__(self, parent=None):
+        super(SerialSettingsPage, self).__init__(parent)
+        self.setTitle("Serial devices")
+        self.layout = QtWidgets.QVBoxLayout()
+        self.setLayout(self.layout)
+        self.hc12_group = QtWidgets.QGroupBox("")
+        self.hc12 = QtWidgets.QCheckBox("HC-12")
+        self.registerField('hc12', self.hc12)
+        self.hc12_group.layout = QtWidgets.QHBoxLayout()
+        self.hc12_group.layout.addWidget(self.hc12)
+        self.hc12_group.setLayout(self.hc12_group.layout)
+        self.hc12_label = QtWidgets.QLabel('Bus:')
+        self.hc12_group.layout.addWidget(self.hc12_label)
+        self.hc12_label.setAlignment(QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter)
+        self.hc12_serial = QIComboBox(self)
+        self.hc12_serial.addItem("TXD/RXD")
+        self.hc12_serial.addItem("TXD2/RXD2")
+        self.registerField("hc12_serial", self.hc12_serial, "currentText")
+        self.hc12_group.layout.addWidget(self.hc12_serial)
+        self.layout.addWidget(self.hc12_group)
+
+
+class SpiSettingsPage(QtWidgets.QWizardPage):
+    """Wizard page for configuring SPI bus connected peripherals"""
+    def __init__(self, parent=None):
+        super(SpiSettingsPage, self).__init__(parent)
+        self.setTitle("SPI devices")
+        self.layout = QtWidgets.QVBoxLayout()
+        self.setLayout(self.layout)
+        self.addDeviceGroupBox("sh1106", "sh1106")
+        self.addDeviceGroupBox("si4463", "Si4463")
+
+    def addDeviceGroupBox(self, name, title):
+        gp = QtWidgets.QGroupBox("")
+        checkbox = QtWidgets.QCheckBox(title)
+        self.registerField(name, checkbox)
+        gp.layout = QtWidgets.QHBoxLayout()
+        gp.layout.addWidget(checkbox)
+        gp.setLayout(gp.layout)
+        label = QtWidgets.QLabel('CS:')
+        gp.layout.addWidget(label)
+        label.setAlignment(QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter)
+        combobox = QIComboBox(self)
+        combobox.addItem("GPIO1")
+        combobox.addItem("GPIO2")
+        self.registerField(f"{name}_cs", combobox, "currentText")
+        gp.layout.addWidget(combobox)
+        self.layout.addWidget(gp)
+
+
+class I2CSettingsPage(QtWidgets.QWizardPage):
+    """Wizard page for configuring SPI bus connected peripherals"""
+    def __init__(self, parent=None):
+        super(I2CSettingsPage, self).__init__(parent)
+        self.setTitle("I2C devices")
+        self.layout = QtWidgets.QVBoxLayout()
+        self.setLayout(self.layout)
+        self.addDeviceGroupBox("ina219", "INA219")
+        self.addDeviceGroupBox("si5351", "Si5351A")
+
+    def addDeviceGroupBox(self, name, title):
+        gp = QtWidgets.QGroupBox("")
+        checkbox = QtWidgets.QCheckBox(title)
+        self.registerField(name, checkbox)
+        gp.layout = QtWidgets.QHBoxLayout()
+        gp.layout.addWidget(checkbox)
+        gp.setLayout(gp.layout)
+        self.layout.addWidget(gp)
+
+
+class FinalPage(QtWidgets.QWizardPage):
+    """Wizard page for generating SKiDL source code"""
+    def __init__(self, parent=None):
+        super(FinalPage, self).__init__(parent)
+        self.setTitle("Generate Skidl")
+        self.filename_label = QtWidgets.QLabel("Filename")
+        self.filename = QtWidgets.QLineEdit()
+        self.filename.setText("mcu.py")
+        self.pcb_title_label = QtWidgets.QLabel("Title")
+        self.pcb_title = QtWidgets.QLineEdit()
+        self.author_label = QtWidgets.QLabel("Author")
+        self.author = QtWidgets.QLineEdit()
+        self.generate_labels = QtWidgets.QCheckBox("Generate subcircuit labels")
+        self.registerField("filename", self.filename)
+        self.registerField("generate_labels", self.generate_labels)
+        self.registerField("title", self.pcb_title)
+        self.registerField("author", self.author)
+        self.generate = QtWidgets.QPushButton("&Generate")
+        self.status = QtWidgets.QLabel("")
+        self.requests = BackgroundRequests()
+        layout = QtWidgets.QVBoxLayout()
+        layout.addWidget(self.filename_label)
+        layout.addWidget(self.filename)
+        layout.addWidget(self.pcb_title_label)
+        layout.addWidget(self.pcb_title)
+        layout.addWidget(self.author_label)
+        layout.addWidget(self.author)
+        layout.addWidget(self.generate_labels)
+        layout.addWidget(self.generate)
+        layout.addWidget(self.status)
+        self.generate.clicked.connect(self.generate_handler)
+        self.setLayout(layout)
+
+    def generate_handler(self):
+        """Generate SKiDL code and save settings in the background from a snapshot of the fields"""
+        self.generate.setEnabled(False)
+        self.status.setText("Generating...")
+        worker = self.requests.start(lambda number: Worker(number, write_skidl, snapshot_fields(self)))
+        worker.signals.finished.connect(self.generated)
+        worker.signals.failed.connect(self.generation_failed)
+        QtCore.QThreadPool.globalInstance().start(worker)
+
+    def generated(self, number, filename):
+        """Report the written SKiDL file"""
+        self.requests.finish(number)
+        self.generate.setEnabled(True)
+        self.status.setText(f"Wrote {filename}")
+
+    def generation_failed(self, number, message):
+        """Report why generation failed"""
+        self.requests.finish(number)
+        self.generate.setEnabled(True)
+        self.status.setText(f"Generation failed: {message}")
+
+
+def run_wizard(settings_file):
+    """Show the wizard initialized from settings file and return exit code of Qt event loop"""
+    app = QtWidgets.QApplication(sys.argv)
+    wizard = Skimibowi()
+    wizard.show()
+    load_settings(wizard, settings_file)
+    return app.exec_()